@@ -10,7 +10,6 @@ from app.error import (
 	AccountException, AuthorizationException, BrokerException, 
 	OrderException
 )
-import uwsgidecorators
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -152,6 +151,7 @@ def create_app(test_config=None):
 			status=500, content_type='application/json'
 		)
 
+	import uwsgidecorators
 	from app import controller
 	controller.initController(app)
 
@@ -182,6 +182,3 @@ def create_app(test_config=None):
 
 
 	return app
-
-app = create_app()
-
@@ -162,7 +162,7 @@ class Account(object):
 		if strategy_info is None:
 			raise AccountException('Strategy not found.')
 
-		self.ctrl._send_queue.append({
+		self.ctrl.sendZmqMessage({
 			"type": "start_strategy", 
 			"message": {
 				"user_id": self.userId,
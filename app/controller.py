@@ -7,12 +7,19 @@ import time
 import traceback
 import zmq
 import jwt
-from copy import copy
+from collections import deque
+from queue import Queue
 from urllib.request import urlopen
-from flask import abort
-from threading import Thread
+from flask import abort, g, has_request_context
+from threading import Thread, Lock, Condition, BoundedSemaphore
+from concurrent.futures import Future, TimeoutError, CancelledError, ThreadPoolExecutor
 from redis import Redis
 
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
 
 STREAM_URL = 'http://nginx:3001'
 
@@ -23,22 +30,187 @@ def initController(app):
 
 
 class DictQueue(dict):
+	'''Runs calls one at a time per key, calls for different keys run in parallel.
+
+	Maps each key with queued calls to its [lock, waiting count] pair.
+	'''
 
-	def generateReference(self):
-		return shortuuid.uuid()
+	def __init__(self):
+		super().__init__()
+		self._lock = Lock()
 
 	def handle(self, key, func, *args, **kwargs):
-		_id = self.generateReference()
+		with self._lock:
+			entry = self.get(key)
+			if entry is None:
+				entry = self[key] = [Lock(), 0]
+			entry[1] += 1
+
+		try:
+			with entry[0]:
+				return func(*args, **kwargs)
+		finally:
+			with self._lock:
+				entry[1] -= 1
+				if entry[1] == 0:
+					del self[key]
+
+
+class SingleFlight(object):
+	'''Runs one call per key at a time and shares its result with concurrent callers.
+
+	The first caller for a key runs `func`, callers arriving while it runs wait on
+	its Future and receive the same result or exception. Calls for different keys
+	run in parallel.
+	'''
+
+	def __init__(self):
+		# Maps key to the Future of its running call
+		self._calls = {}
+		self._lock = Lock()
+
+		self.calls = 0
+		self.shared = 0
 
-		if key not in self:
-			self[key] = []
-		self[key].append(_id)
-		while self[key].index(_id) != 0:
-			time.sleep(0.1)
 
-		result = func(*args, **kwargs)
-		del self[key][0]
-		return result
+	def handle(self, key, func, *args, **kwargs):
+		with self._lock:
+			future = self._calls.get(key)
+			if future is None:
+				future = self._calls[key] = Future()
+				self.calls += 1
+				owner = True
+			else:
+				self.shared += 1
+				owner = False
+
+		if not owner:
+			return future.result()
+
+		try:
+			result = func(*args, **kwargs)
+		except BaseException as e:
+			future.set_exception(e)
+			raise
+		else:
+			future.set_result(result)
+			return result
+		finally:
+			with self._lock:
+				del self._calls[key]
+
+
+	def getStats(self):
+		with self._lock:
+			return {
+				'running': len(self._calls),
+				'calls': self.calls,
+				'shared': self.shared
+			}
+
+
+class KeyedExecutor(object):
+	'''Runs work in order per key on a fixed pool of worker threads.
+
+	Each key has its own bounded queue and is handed to the workers at most once
+	at a time, so its work stays in order and never runs concurrently. Work that
+	blocks, such as a listener waiting on a broker request, only holds the worker
+	running it, the other workers keep serving other keys. When a key's queue is
+	full, submitting blocks for up to `block_timeout` seconds before the work
+	is dropped and counted.
+	'''
+
+	def __init__(self, workers=8, queue_size=1000, block_timeout=1.0, name='executor'):
+		self.queue_size = queue_size
+		self.block_timeout = block_timeout
+
+		# Maps key to its deque of pending work
+		self._pending = {}
+		self._ready = Queue()
+		self._lock = Lock()
+		self._not_full = Condition(self._lock)
+
+		self.running = 0
+		self.submitted = 0
+		self.completed = 0
+		self.dropped = 0
+		self.errors = 0
+		self.blocked = 0
+
+		self._workers = [
+			Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+			for i in range(workers)
+		]
+		for t in self._workers:
+			t.start()
+
+
+	def submit(self, key, func, *args, **kwargs):
+		''' Queue `func` behind earlier work for `key`, returns False if dropped '''
+
+		item = (func, args, kwargs)
+		with self._lock:
+			pending = self._pending.get(key)
+			if pending is not None and len(pending) >= self.queue_size:
+				self.blocked += 1
+				deadline = time.time() + self.block_timeout
+				while pending is not None and len(pending) >= self.queue_size:
+					remaining = deadline - time.time()
+					if remaining <= 0:
+						self.dropped += 1
+						return False
+					self._not_full.wait(remaining)
+					pending = self._pending.get(key)
+
+			self.submitted += 1
+			if pending is None:
+				self._pending[key] = deque([item])
+				self._ready.put(key)
+			else:
+				pending.append(item)
+
+		return True
+
+
+	def _run(self):
+		while True:
+			key = self._ready.get()
+			with self._lock:
+				func, args, kwargs = self._pending[key].popleft()
+				self.running += 1
+				self._not_full.notify_all()
+
+			failed = False
+			try:
+				func(*args, **kwargs)
+			except Exception:
+				failed = True
+				print(traceback.format_exc(), flush=True)
+
+			# Requeue the key behind the others so one busy key doesn't starve them
+			with self._lock:
+				self.running -= 1
+				self.completed += 1
+				self.errors += failed
+				if len(self._pending[key]):
+					self._ready.put(key)
+				else:
+					del self._pending[key]
+
+
+	def getStats(self):
+		with self._lock:
+			return {
+				'workers': len(self._workers),
+				'running': self.running,
+				'keys': len(self._pending),
+				'pending': sum(len(x) for x in self._pending.values()),
+				'submitted': self.submitted,
+				'completed': self.completed,
+				'blocked': self.blocked,
+				'dropped': self.dropped,
+				'errors': self.errors
+			}
 
 
 class Controller(object):
@@ -59,6 +231,8 @@ class Controller(object):
 		brokers: A dict that maps parent Broker objects to a broker provider
 				 string name.
 		spots: A dict that maps currencies to their daily spot rate.
+		price_cache: Worker's PriceCache of historical price windows.
+		tick_broadcaster: TickBroadcaster of socket.io chart ticks (primary worker only).
 		zmq_context: ZMQ Context object.
 		zmq_req_socket: ZMQ Request socket.
 		zmq_pull_socket: ZMQ Pull socket.
@@ -66,10 +240,14 @@ class Controller(object):
 		zmq_poller: ZMQ Poller object.
 		connection_id: An int denoting the worker's connection ID.
 		redis_client: Redis object.
-		_msg_queue: A dict that maps socket JSON messages to their msg ID string.
+		_requests: A dict that maps pending broker request Futures and their send
+				   time to their msg ID string.
+		_request_slots: A semaphore capping the number of pending broker requests.
 		_listeners: A dict that maps a function to the msg ID that triggers 
 					the function call.
-		_send_queue: A list that queues JSON socket messages to be handled.
+		_send_queue: A deque of encoded messages waiting for the DEALER socket.
+		_send_wakeup: A pipe read/write fd pair waking the send loop.
+		message_executor: KeyedExecutor running inbound ZMQ message handlers.
 
 	'''
 
@@ -81,10 +259,21 @@ class Controller(object):
 		'''
 
 		self.app = app
-		self._msg_queue = {}
+		self._requests = {}
+		self._requests_lock = Lock()
+		self._request_slots = BoundedSemaphore(app.config.get('MAX_BROKER_REQUESTS', 256))
 		self._listeners = {}
 		self._emit_queue = []
-		self._send_queue = []
+		self._send_queue = deque()
+		self._send_wakeup = os.pipe()
+		os.set_blocking(self._send_wakeup[0], False)
+		os.set_blocking(self._send_wakeup[1], False)
+		self._use_msgpack = app.config.get('ZMQ_ENCODING') == 'msgpack' and msgpack is not None
+		self.message_executor = KeyedExecutor(
+			workers=app.config.get('ZMQ_HANDLER_WORKERS', 8),
+			queue_size=app.config.get('ZMQ_HANDLER_QUEUE_SIZE', 1000),
+			name='zmq-handler'
+		)
 
 		# self.sio = self.setupSio(self.app.config['STREAM_URL'])
 		# self.sio.on('broker_res', handler=self.onCommand, namespace='/admin')
@@ -207,8 +396,8 @@ class Controller(object):
 		'''Handles incoming socket messages.
 
 		The msg_id is first checked if its contained in the _listeners dict whos
-		function is scalled if True. Else the message is added to the _msg_queue
-		to be processed.
+		function is scalled if True. Else the pending request with that msg_id
+		is completed.
 
 		Args:
 			data: A JSON dict containing the received socket data package.
@@ -219,39 +408,88 @@ class Controller(object):
 				result = data['result']
 				self._listeners[data['msg_id']](*result.get('args'), **result.get('kwargs'))
 			else:
-				self._msg_queue[data['msg_id']] = (data, time.time())
+				self._complete_broker_request(data)
+
+
+	def _create_broker_request(self, msg_id, timeout=60):
+		'''Registers a Future completed when the response to msg_id arrives.
+
+		Blocks up to `timeout` seconds for a free request slot, if none frees up
+		the Future is completed with an error response.
+		'''
+
+		future = Future()
+		if not self._request_slots.acquire(timeout=timeout):
+			future.set_result({ 'error': 'Too many pending requests.' })
+			return future
+
+		with self._requests_lock:
+			self._requests[msg_id] = (future, time.time())
+		future.add_done_callback(lambda _: self._release_broker_request(msg_id))
+		return future
+
 
+	def _release_broker_request(self, msg_id):
+		with self._requests_lock:
+			if self._requests.pop(msg_id, None) is not None:
+				self._request_slots.release()
 
-	def _wait_broker_response(self, msg_id, timeout=60):
-		'''Waits for expected incoming socket message by msg_id
+
+	def _complete_broker_request(self, message):
+		# Only the caller that pops the request completes it
+		with self._requests_lock:
+			request = self._requests.pop(message['msg_id'], None)
+			if request is not None:
+				self._request_slots.release()
+
+		# Fails if the waiter cancelled first and stops it cancelling afterwards
+		if request is not None and request[0].set_running_or_notify_cancel():
+			request[0].set_result(message.get('result'))
+
+
+	def _wait_broker_response(self, future, timeout=60):
+		'''Waits for a broker request Future to complete.
 
 		Args:
-			msg_id: A string containing a message ID.
+			future: A Future returned by brokerRequestAsync.
 			timeout: An integer used as the timeout period.
 		'''
 
-		start = time.time()
+		try:
+			return future.result(timeout)
+		except (TimeoutError, CancelledError):
+			future.cancel()
+			return {
+				'error': 'No response.'
+			}
+
 
-		while time.time() - start < timeout:
-			if msg_id in copy(list(self._msg_queue.keys())):
-				res = self._msg_queue[msg_id][0]
-				del self._msg_queue[msg_id]
-				print('WAIT RECV', flush=True)
-				return res.get('result')
-			time.sleep(0.01)
+	def gatherBrokerRequests(self, futures, timeout=60):
+		'''Waits for several broker requests sent with brokerRequestAsync.
 
-		return {
-			'error': 'No response.'
-		}
+		Returns:
+			A list of results in the order of `futures`, requests not answered
+			within `timeout` seconds in total hold an error response.
+		'''
+
+		deadline = time.time() + timeout
+		return [
+			self._wait_broker_response(future, max(deadline - time.time(), 0))
+			for future in futures
+		]
 
 	
-	def _clean_msg_queue(self):
-		''' Removes messages from _msg_queue older than 120 seconds. '''
+	def _clean_broker_requests(self):
+		''' Cancels broker requests pending for longer than 120 seconds. '''
 
 		try:
-			for msg_id in copy(list(self._msg_queue.keys())):
-				if time.time() - self._msg_queue[msg_id][1] > 120:
-					del self._msg_queue[msg_id]
+			with self._requests_lock:
+				expired = [
+					request[0] for request in self._requests.values()
+					if time.time() - request[1] > 120
+				]
+			for future in expired:
+				future.cancel()
 		except Exception:
 			print(traceback.format_exc())
 
@@ -288,8 +526,8 @@ class Controller(object):
 	# 		return result
 
 	
-	def brokerRequest(self, broker, broker_id, func, *args, **kwargs):
-		'''Sends socket message to broker and waits for response.
+	def brokerRequestAsync(self, broker, broker_id, func, *args, **kwargs):
+		'''Sends socket message to broker without waiting for the response.
 
 		Args:
 			broker: A string containing the name of the broker, recognised
@@ -298,33 +536,48 @@ class Controller(object):
 			func: A string containing the command to be performed on the
 				  broker application.
 		Returns:
-			A dict containing the resulting message response or error response.
+			A Future completed with the resulting message response by the
+			ZMQ message loop, wait on it with gatherBrokerRequests.
 		'''
 
 		msg_id = shortuuid.uuid()
+		future = self._create_broker_request(msg_id)
+		if future.done():
+			return future
 
-		try:
-			data = {
-				"type": broker,
-				"message": {
-					'msg_id': msg_id,
-					'broker': broker,
-					'broker_id': broker_id,
-					'cmd': func,
-					'args': list(args),
-					'kwargs': kwargs
-				}
+		data = {
+			"type": broker,
+			"message": {
+				'msg_id': msg_id,
+				'broker': broker,
+				'broker_id': broker_id,
+				'cmd': func,
+				'args': list(args),
+				'kwargs': kwargs
 			}
-			print(f"[brokerRequest] Send: ({msg_id}) {time.time()}, {data}")
-			# self.sio.emit('broker_cmd', data=data, namespace='/admin')
-			# result = self._wait_broker_response(msg_id)
+		}
+		print(f"[brokerRequest] Send: ({msg_id}) {time.time()}, {data}")
+		self.sendZmqMessage(data)
+		return future
 
-			# self.zmq_dealer_socket.send_json(data, zmq.NOBLOCK)
-			self._send_queue.append(data)
-			result = self._wait_broker_response(msg_id)
-			
-			# result = self.zmq_dealer_socket.recv_json()
-			print(f"[brokerRequest] Result: ({msg_id}) {time.time()}, {result} | MSGs {len(self._msg_queue)}")
+
+	def brokerRequest(self, broker, broker_id, func, *args, **kwargs):
+		'''Sends socket message to broker and waits for response.
+
+		Args:
+			broker: A string containing the name of the broker, recognised
+					by the broker application the message is sent to.
+			broker_id: A string containing the ID of the user broker.
+			func: A string containing the command to be performed on the
+				  broker application.
+		Returns:
+			A dict containing the resulting message response or error response.
+		'''
+
+		try:
+			future = self.brokerRequestAsync(broker, broker_id, func, *args, **kwargs)
+			result = self._wait_broker_response(future)
+			print(f"[brokerRequest] Result: {time.time()}, {result} | Pending {len(self._requests)}")
 			
 		except Exception:
 			print(f"[brokerRequest] {traceback.format_exc()}")
@@ -367,8 +620,9 @@ class Controller(object):
 				'args': list(args),
 				'kwargs': kwargs
 			}
+			future = self._create_broker_request(msg_id)
 			self.main_sio.emit('broker_cmd', data=data, namespace='/admin')
-			result = self._wait_broker_response(msg_id)
+			result = self._wait_broker_response(future)
 		except Exception:
 			print(f"[mainBrokerRequest] {traceback.format_exc()}")
 			result = {
@@ -463,8 +717,9 @@ class Controller(object):
 	def handleListenerMessage(self, message):
 		'''Checks if message msg_id is handled by a listener.
 
-		If the msg_id is not handled by a listener it is added to the _msg_queue.
-		Listener functions are threaded to avoid blocking.
+		If the msg_id is not handled by a listener the pending request with that
+		msg_id is completed.
+		Listener functions run on the message executor, in order per msg_id.
 
 		Args:
 			message: A dict containing a received socket message.
@@ -473,9 +728,12 @@ class Controller(object):
 		if "msg_id" in message:
 			if message["msg_id"] in self._listeners:
 				result = message['result']
-				Thread(target=self._listeners[message['msg_id']], args=result.get('args'), kwargs=result.get('kwargs')).start()
+				self.message_executor.submit(
+					message['msg_id'], self._listeners[message['msg_id']],
+					*(result.get('args') or []), **(result.get('kwargs') or {})
+				)
 			else:
-				self._msg_queue[message['msg_id']] = (message, time.time())
+				self._complete_broker_request(message)
 
 	
 	def handleRequestMessage(self, message):
@@ -504,7 +762,7 @@ class Controller(object):
 				strategy = account.getStrategyByBrokerId(strategy_id, broker_id)
 				print(f"[handleRequestMessage] {strategy}", flush=True)
 
-				self._send_queue.append({
+				self.sendZmqMessage({
 					"type": "response",
 					"message": {
 						"msg_id": msg_id,
@@ -514,7 +772,7 @@ class Controller(object):
 			
 			else:
 				print(f"[handleRequestMessage] NOPE", flush=True)
-				self._send_queue.append({
+				self.sendZmqMessage({
 					"type": "response",
 					"message": {
 						"msg_id": msg_id,
@@ -547,7 +805,9 @@ class Controller(object):
 					print(f"[zmq_message_loop] {message}", flush=True)
 
 					if message.get("type") == "request":
-						Thread(target=self.handleRequestMessage, args=(message["message"],)).start()
+						self.message_executor.submit(
+							message["message"].get("msg_id"), self.handleRequestMessage, message["message"]
+						)
 					else:
 						print(f"[handleListenerMessage] {time.time()} {message}", flush=True)
 						self.handleListenerMessage(message)
@@ -569,29 +829,85 @@ class Controller(object):
 
 				if time.time() - clean_check > 30:
 					clean_check = time.time()
-					self._clean_msg_queue()
+					self._clean_broker_requests()
 
 			except Exception:
 				print(traceback.format_exc())
 	
+	def _encode_zmq_message(self, item):
+		if self._use_msgpack:
+			return msgpack.packb(item, use_bin_type=True)
+		return json.dumps(item).encode('utf8')
+
+
+	def sendZmqMessage(self, item):
+		'''Queues a message for the DEALER socket and wakes the send loop.
+
+		Safe to call from any thread, the message is encoded by the caller.
+		'''
+
+		try:
+			self._send_queue.append(self._encode_zmq_message(item))
+		except Exception:
+			print(traceback.format_exc())
+			return
+
+		try:
+			os.write(self._send_wakeup[1], b'\0')
+		except BlockingIOError:
+			# Pipe already holds a wakeup
+			pass
+
+
 	def zmq_send_loop(self):
-		''' Loop handling messages stored in _send_queue. '''
+		'''Loop sending messages queued by sendZmqMessage.
+
+		Sleeps in the poller until woken by the pipe, then drains the queue. Up
+		to `ZMQ_BATCH_SIZE` messages are sent per multipart message. If the
+		socket would block, unsent messages are kept and the socket is polled
+		for writability instead of dropping them.
+		'''
 
 		self.zmq_dealer_socket = self.zmq_context.socket(zmq.DEALER)
 		self.zmq_dealer_socket.connect("tcp://zmq_broker:5557")
+
+		# Batches go out as one multipart message with a frame per request, and
+		# the zmq_broker service on the ROUTER side reads a single frame per
+		# message. Batching (and msgpack) stay opt-in until it handles both.
+		batch_size = self.app.config.get('ZMQ_BATCH_SIZE', 1)
+		poller = zmq.Poller()
+		poller.register(self._send_wakeup[0], zmq.POLLIN)
 		
 		while True:
 			try:
-				if len(self._send_queue):
-					item = self._send_queue[0]
-					del self._send_queue[0]
-
-					self.zmq_dealer_socket.send_json(item, zmq.NOBLOCK)
+				socks = dict(poller.poll())
+				if self._send_wakeup[0] in socks:
+					try:
+						os.read(self._send_wakeup[0], 4096)
+					except BlockingIOError:
+						pass
+
+				blocked = False
+				while len(self._send_queue):
+					frames = [
+						self._send_queue.popleft()
+						for _ in range(min(batch_size, len(self._send_queue)))
+					]
+					try:
+						self.zmq_dealer_socket.send_multipart(frames, zmq.NOBLOCK)
+					except zmq.Again:
+						self._send_queue.extendleft(reversed(frames))
+						blocked = True
+						break
+
+				# Wake on writability while messages are held back
+				if blocked:
+					poller.register(self.zmq_dealer_socket, zmq.POLLOUT)
+				elif self.zmq_dealer_socket in socks:
+					poller.unregister(self.zmq_dealer_socket)
 
 			except Exception:
 				print(traceback.format_exc())
-			
-			time.sleep(0.01)
 
 
 	def startModules(self):
@@ -601,8 +917,13 @@ class Controller(object):
 		Spots.
 		'''
 
+		self.price_cache = tl.PriceCache(
+			max_bytes=self.app.config.get('PRICE_CACHE_MAX_BYTES', 256*1024*1024),
+			ttl=self.app.config.get('PRICE_CACHE_TTL', 60*60)
+		)
+
 		self.redis_client = Redis(host='redis', port=6379, password="dev")
-		
+
 		self.sio = self.setupSio(self.app.config['STREAM_URL'])
 		self.sio.on('broker_res', handler=self.onCommand, namespace='/admin')
 
@@ -614,6 +935,9 @@ class Controller(object):
 
 		if self.connection_id == 0:
 			self.redis_client.set("workers_complete", 0)
+			self.tick_broadcaster = tl.TickBroadcaster(
+				self, rate=self.app.config.get('TICK_BROADCAST_RATE', 10)
+			)
 
 		self.redis_client.set("strategies_" + str(self.connection_id), json.dumps({}))
 		all_handled_keys = list(self.redis_client.hgetall("handled").keys())
@@ -853,12 +1177,17 @@ class Charts(dict):
 
 	Attributes:
 		ctrl: A reference to the Controller object.
-		queue: A queue to enforce synchronous Chart initialization.
+		queue: A SingleFlight sharing one Chart initialization between concurrent callers.
 	'''
 
 	def __init__(self, ctrl):
 		self.ctrl = ctrl
-		self.queue = DictQueue()
+		self.queue = SingleFlight()
+		# Bounded pool bootstrapping new charts concurrently
+		self._load_pool = ThreadPoolExecutor(
+			max_workers=ctrl.app.config.get('CHART_LOAD_WORKERS', 8),
+			thread_name_prefix='chart-load'
+		)
 		# self._generate_broker_keys()
 
 
@@ -901,13 +1230,15 @@ class Charts(dict):
 			return self[broker.name][product]
 
 
-	def getChart(self, broker, product, await_completion):
+	def getChart(self, broker, product, await_completion=False):
 		'''Retrieves the Chart object mapped to broker name and instrument (product).
 
-		If the Chart object does not exists it is initialized.
+		If the Chart object does not exists it is initialized. Unless `await_completion`
+		is set the Chart is returned straight away and loads in the background, its
+		progress is reported by `Chart.getLoadProgress` and `Chart.waitReady`.
 
 		Args:
-			broker: A string containing the name of the broker provider.
+			broker: A Broker object.
 			product: A string containing the financial instrument name.
 			await_completion: A bool passed to the Chart object on initialization.
 		Returns:
@@ -929,6 +1260,12 @@ class Charts(dict):
 		raise abort(404, 'Broker does not exist.')
 
 
+	def submitLoad(self, func):
+		''' Run a Chart's bootstrap on the loader pool '''
+
+		return self._load_pool.submit(func)
+
+
 	def deleteChart(self, broker_name, product):
 		'''Deletes Chart object mapping.
 
@@ -945,15 +1282,33 @@ class Charts(dict):
 
 class Accounts(dict):
 	'''A dict mapping user ID to Account object.
-	
+
+	Accounts unused for `ACCOUNT_IDLE_TIMEOUT` seconds are evicted and reinitialized
+	on next access. Accounts with started strategies or brokers, or held by a request
+	still in progress, are never evicted.
+
 	Attributes:
 		ctrl: A reference to the Controller object.
-		queue: A queue to enforce synchronous Chart initialization.
+		queue: A SingleFlight sharing one Account initialization between concurrent callers.
+		idle_timeout: Seconds after which an unused Account may be evicted, None to disable.
+		_lock: A Lock taken by both getAccount and evictIdle.
+		_last_access: A dict mapping user ID to the time its Account was last retrieved.
+		_refs: A dict mapping user ID to the number of requests holding its Account.
 	'''
 
 	def __init__(self, ctrl):
 		self.ctrl = ctrl
-		self.queue = DictQueue()
+		self.queue = SingleFlight()
+		self.idle_timeout = ctrl.app.config.get('ACCOUNT_IDLE_TIMEOUT', 60*60)
+		self._lock = Lock()
+		self._last_access = {}
+		self._refs = {}
+
+		# Requests hold the Accounts they retrieve until they are torn down
+		ctrl.app.teardown_request(self._release_request)
+
+		if self.idle_timeout:
+			Thread(target=self._evict_loop, name='account-evict', daemon=True).start()
 
 	def initAccount(self, user_id):
 		'''Initializes Account object and maps to user_id.
@@ -969,6 +1324,7 @@ class Accounts(dict):
 		if user_id not in self:
 			try:
 				acc = Account(self.ctrl, user_id)
+				self._last_access[user_id] = time.time()
 				self[user_id] = acc
 					
 			except AccountException:
@@ -984,22 +1340,46 @@ class Accounts(dict):
 			account: An Account object.
 		'''
 
+		self._last_access[account.user_id] = time.time()
 		self[account.user_id] = account
 
 	def getAccount(self, user_id):
 		'''Retrieves Account object mapped to user_id.
 
-		If mapping does not exists, Account object is initialized.
+		If mapping does not exists, Account object is initialized. Concurrent
+		callers for the same user_id share a single initialization.
 
 		Args:
 			user_id: A string containing user ID.
 		'''
 
-		acc = self.get(user_id)
-		if acc is None:
-			return self.queue.handle(user_id, self.initAccount, user_id)
-		else:
-			return acc
+		with self._lock:
+			acc = self.get(user_id)
+			if acc is not None:
+				self._last_access[user_id] = time.time()
+				self._hold(user_id)
+				return acc
+
+		acc = self.queue.handle(user_id, self.initAccount, user_id)
+		if acc is not None:
+			with self._lock:
+				self._hold(user_id)
+		return acc
+
+
+	def _hold(self, user_id):
+		# Only requests have a point at which to release the Account
+		if has_request_context():
+			self._refs[user_id] = self._refs.get(user_id, 0) + 1
+			g.setdefault('held_accounts', []).append(user_id)
+
+
+	def _release_request(self, exc=None):
+		with self._lock:
+			for user_id in g.pop('held_accounts', []):
+				self._refs[user_id] -= 1
+				if self._refs[user_id] <= 0:
+					del self._refs[user_id]
 
 	def deleteAccount(self, user_id):
 		'''Deletes user_id mapping.
@@ -1008,10 +1388,53 @@ class Accounts(dict):
 			user_id: A string containing user ID.
 		'''
 
+		self._last_access.pop(user_id, None)
 		if user_id in self:
 			del self[user_id]
 
 
+	def _is_evictable(self, user_id, acc):
+		if self._refs.get(user_id):
+			return False
+		return not len(acc.brokers) and not len(acc.strategies)
+
+
+	def evictIdle(self, max_idle=None):
+		'''Deletes Accounts not retrieved within `max_idle` seconds.
+
+		Returns:
+			The list of evicted user IDs.
+		'''
+
+		if max_idle is None:
+			max_idle = self.idle_timeout
+
+		evicted = []
+		with self._lock:
+			now = time.time()
+			for user_id, acc in list(self.items()):
+				if now - self._last_access.get(user_id, now) < max_idle:
+					continue
+				if not self._is_evictable(user_id, acc):
+					continue
+
+				self.deleteAccount(user_id)
+				evicted.append(user_id)
+
+		return evicted
+
+
+	def _evict_loop(self):
+		while True:
+			time.sleep(max(self.idle_timeout / 4, 1))
+			try:
+				evicted = self.evictIdle()
+				if len(evicted):
+					print(f'[Accounts] Evicted {len(evicted)} idle accounts.', flush=True)
+			except Exception:
+				print(traceback.format_exc(), flush=True)
+
+
 class Spots(dict):
 	'''A dict mapping currencies to their base USD spot rate wrapped by Spot object.
 
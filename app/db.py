@@ -6,16 +6,18 @@ import string, random
 import jwt
 import pandas as pd
 import dateutil.parser
+import os
 import time
 import traceback
 from copy import copy
-from datetime import datetime
+from datetime import datetime, timedelta
 from app import tradelib as tl
 from app.error import BrokerException
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
 
 class Database(object):
 	'''Class wrapper for all AWS Dynamo DB and S3 Storage functionality.
@@ -40,6 +42,7 @@ class Database(object):
 		analyticsTable: A Dynamo DB Table object.
 		emailsTable: A Dynamo DB Table object.
 		priceDataBucketName: A string containing price data Bucket name.
+		_price_pool: A bounded thread pool fetching price archive chunks.
 	'''
 
 	def __init__(self, ctrl, env):
@@ -80,6 +83,9 @@ class Database(object):
 		self.analyticsTable = self._generate_table('algowolf-analytics')
 		self.emailsTable = self._generate_table('algowolf-emails')
 		self.priceDataBucketName = 'brokerlib-prices'
+		self._price_pool = ThreadPoolExecutor(max_workers=8)
+		self._price_locks = {}
+		self._price_locks_lock = Lock()
 
 		Thread(target=self._handle_jobs).start()
 
@@ -1566,6 +1572,52 @@ class Database(object):
 		return True
 
 
+	def getStrategyTransactionObject(self, user_id, strategy_id, name):
+		'''Retrieves a transaction ledger object (segment or manifest).
+
+		Args:
+			user_id: A string containing the user's user ID.
+			strategy_id: A string containing the user's strategy ID.
+			name: A string containing the object's path under `transactions/`.
+		Returns:
+			The object's bytes, or None if it doesn't exist. Other errors are
+			raised so a failed read is never mistaken for an empty ledger.
+		'''
+
+		try:
+			res = self._s3_client.get_object(
+				Bucket=self.strategyBucketName,
+				Key=f'{user_id}/{strategy_id}/transactions/{name}'
+			)
+			return res['Body'].read()
+
+		except ClientError as e:
+			if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+				return None
+			raise
+
+
+	def updateStrategyTransactionObject(self, user_id, strategy_id, name, body):
+		transactions_object = self._s3_res.Object(
+			self.strategyBucketName,
+			f'{user_id}/{strategy_id}/transactions/{name}'
+		)
+		transactions_object.put(Body=body)
+		return True
+
+
+	def deleteStrategyTransactionObjects(self, user_id, strategy_id, names):
+		self._s3_res.meta.client.delete_objects(
+			Bucket=self.strategyBucketName,
+			Delete={
+				'Objects': [
+					{ 'Key': f'{user_id}/{strategy_id}/transactions/{name}' } for name in names
+				]
+			}
+		)
+		return True
+
+
 	def updateStrategyInputVariables(self, user_id, strategy_id, script_id, obj):
 		gui_object = self._s3_res.Object(
 			self.strategyBucketName,
@@ -1887,10 +1939,265 @@ class Database(object):
 	Prices Storage Functions
 	'''
 
+	def _get_price_prefix(self, broker, product, period):
+		return f'archive/{broker}/{product}/{period}'
+
+
+	def _split_price_chunks(self, period, df):
+		if tl.period.getPeriodOffsetSeconds(period) >= tl.period.getPeriodOffsetSeconds(tl.period.DAILY):
+			fmt = '%Y'
+		else:
+			fmt = '%Y-%m'
+		return df.groupby(pd.to_datetime(df.index.values, unit='s').strftime(fmt).values)
+
+
+	def _get_price_lock(self, broker, product, period):
+		with self._price_locks_lock:
+			key = (broker, product, period)
+			if key not in self._price_locks:
+				self._price_locks[key] = Lock()
+			return self._price_locks[key]
+
+
+	def _get_price_cache_path(self, broker, product, period, chunk, version):
+		return os.path.join(
+			self.ctrl.app.config['DATA_DIR'], 'prices',
+			broker, product, period, f'{chunk}.{version}.csv.gz'
+		)
+
+
+	def _write_price_cache(self, path, f_obj):
+		directory = os.path.dirname(path)
+		os.makedirs(directory, exist_ok=True)
+
+		# Replace atomically, older versions of the chunk are stale
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as f:
+			f.write(f_obj)
+		os.replace(tmp_path, path)
+
+		chunk = os.path.basename(path).split('.')[0]
+		for i in os.listdir(directory):
+			if i.split('.')[0] == chunk and os.path.join(directory, i) != path:
+				try:
+					os.remove(os.path.join(directory, i))
+				except OSError:
+					pass
+
+
+	def _read_price_chunk(self, broker, product, period, chunk, version):
+		path = self._get_price_cache_path(broker, product, period, chunk, version)
+		if os.path.exists(path):
+			with open(path, 'rb') as f:
+				f_obj = f.read()
+		else:
+			res = self._s3_client.get_object(
+				Bucket=self.priceDataBucketName,
+				Key=f'{self._get_price_prefix(broker, product, period)}/{chunk}.csv.gz'
+			)
+			f_obj = res['Body'].read()
+			self._write_price_cache(path, f_obj)
+
+		return pd.read_csv(io.BytesIO(gzip.decompress(f_obj)), sep=' ').set_index('timestamp')
+
+
+	def _write_price_chunk(self, broker, product, period, chunk, version, df):
+		# df to csv in memory
+		s_buf = io.StringIO()
+		df.to_csv(s_buf, sep=' ', header=True)
+		s_buf.seek(0)
+		f_obj = gzip.compress(s_buf.read().encode('utf8'))
+
+		self._s3_client.put_object(
+			Bucket=self.priceDataBucketName,
+			Key=f'{self._get_price_prefix(broker, product, period)}/{chunk}.csv.gz',
+			Body=f_obj
+		)
+		self._write_price_cache(
+			self._get_price_cache_path(broker, product, period, chunk, version), f_obj
+		)
+
+
+	def getPriceIndex(self, broker, product, period):
+		'''Retrieves the archive index of a price series.
+
+		Returns:
+			A dict mapping each chunk name to its `start`, `end`, `rows` and `version`
+			or None if the series has not been archived.
+		'''
+
+		try:
+			res = self._s3_client.get_object(
+				Bucket=self.priceDataBucketName,
+				Key=f'{self._get_price_prefix(broker, product, period)}/index.json'
+			)
+			return json.loads(res['Body'].read())
+
+		except Exception:
+			return None
+
+
+	def _update_price_index(self, broker, product, period, index):
+		self._s3_client.put_object(
+			Bucket=self.priceDataBucketName,
+			Key=f'{self._get_price_prefix(broker, product, period)}/index.json',
+			Body=json.dumps(index, sort_keys=True).encode('utf8')
+		)
+
+
+	def getLastPriceTimestamp(self, broker, product, period):
+		index = self.getPriceIndex(broker, product, period)
+		if not index:
+			return None
+		return max(i['end'] for i in index.values())
+
+
+	def getPrices(self, broker, product, period, start, end):
+		'''Retrieves archived prices between `start` and `end` inclusive.
+
+		Only the chunks overlapping the range are fetched, concurrently and through
+		the local disk cache. Series without an archive index are read from the
+		legacy daily/yearly objects.
+		'''
+
+		ts_start = tl.utils.convertTimeToTimestamp(start)
+		ts_end = tl.utils.convertTimeToTimestamp(end)
+
+		index = self.getPriceIndex(broker, product, period)
+		if index is None:
+			return self._get_legacy_prices(broker, product, period, start, end)
+
+		chunks = [
+			k for k, v in sorted(index.items())
+			if v['start'] <= ts_end and v['end'] >= ts_start
+		]
+		if not len(chunks):
+			return None
+
+		try:
+			frags = list(self._price_pool.map(
+				lambda x: self._read_price_chunk(broker, product, period, x, index[x]['version']),
+				chunks
+			))
+		except Exception:
+			print(traceback.format_exc(), flush=True)
+			return None
+
+		df = pd.concat(frags).sort_index()
+		return df.loc[(ts_start <= df.index) & (df.index <= ts_end)]
+
+
+	def updatePrices(self, broker, product, period, df):
+		'''Merges `df` into the archived chunks it overlaps and updates the index.
+
+		Previously saved rows take precedence over `df`.
+		'''
+
+		if df.size == 0:
+			return True
+
+		with self._get_price_lock(broker, product, period):
+			index = self.getPriceIndex(broker, product, period)
+			if index is None:
+				index = self.migratePrices(broker, product, period)
+
+			def write_chunk(item):
+				chunk, c_df = item
+				info = index.get(chunk)
+				version = 1
+				if info is not None:
+					old_df = self._read_price_chunk(broker, product, period, chunk, info['version'])
+					c_df = pd.concat((old_df, c_df))
+					c_df = c_df[~c_df.index.duplicated(keep='first')].sort_index()
+					version = info['version'] + 1
+
+				self._write_price_chunk(broker, product, period, chunk, version, c_df)
+				return chunk, {
+					'start': int(c_df.index.values[0]),
+					'end': int(c_df.index.values[-1]),
+					'rows': int(c_df.shape[0]),
+					'version': version
+				}
+
+			index.update(self._price_pool.map(write_chunk, self._split_price_chunks(period, df)))
+			self._update_price_index(broker, product, period, index)
+
+		return True
+
+
+	def migratePrices(self, broker, product, period):
+		'''Copies a series stored as legacy daily/yearly objects into archive chunks.
+
+		Returns:
+			The new archive index.
+		'''
+
+		if tl.period.getPeriodOffsetSeconds(period) >= tl.period.getPeriodOffsetSeconds(tl.period.DAILY):
+			dates = self.getPriceYearlyDateList(broker, product, period)
+			get_prices = self._get_legacy_yearly_prices
+		else:
+			dates = self.getPriceDailyDateList(broker, product, period)
+			get_prices = self._get_legacy_daily_prices
+
+		index = {}
+		frags = [
+			i for i in self._price_pool.map(
+				lambda x: get_prices(broker, product, period, x), sorted(dates)
+			)
+			if isinstance(i, pd.DataFrame) and i.size > 0
+		]
+		if not len(frags):
+			return index
+
+		df = pd.concat(frags).sort_index()
+		df = df[~df.index.duplicated(keep='first')]
+		for chunk, c_df in self._split_price_chunks(period, df):
+			self._write_price_chunk(broker, product, period, chunk, 1, c_df)
+			index[chunk] = {
+				'start': int(c_df.index.values[0]),
+				'end': int(c_df.index.values[-1]),
+				'rows': int(c_df.shape[0]),
+				'version': 1
+			}
+
+		self._update_price_index(broker, product, period, index)
+		return index
+
+
+	def _get_legacy_prices(self, broker, product, period, start, end):
+		ts_start = tl.utils.convertTimeToTimestamp(start)
+		ts_end = tl.utils.convertTimeToTimestamp(end)
+		start = tl.utils.convertTimestampToTime(ts_start)
+		end = tl.utils.convertTimestampToTime(ts_end)
+
+		if tl.period.getPeriodOffsetSeconds(period) >= tl.period.getPeriodOffsetSeconds(tl.period.DAILY):
+			dates = [datetime(year=y, month=1, day=1) for y in range(start.year, end.year+1)]
+			get_prices = self._get_legacy_yearly_prices
+		else:
+			start_day = datetime(year=start.year, month=start.month, day=start.day)
+			dates = [
+				start_day + timedelta(days=i)
+				for i in range((end.replace(tzinfo=None) - start_day).days + 1)
+			]
+			get_prices = self._get_legacy_daily_prices
+
+		frags = [
+			i for i in self._price_pool.map(
+				lambda x: get_prices(broker, product, period, x), dates
+			)
+			if isinstance(i, pd.DataFrame) and i.size > 0
+		]
+		if not len(frags):
+			return None
+
+		df = pd.concat(frags).sort_index()
+		return df.loc[(ts_start <= df.index) & (df.index <= ts_end)]
+
+
 	def getPriceYearlyDateList(self, broker, product, period):
 		bucket = self._s3_res.Bucket(self.priceDataBucketName)
 		result = []
-		for i in bucket.objects.filter(Prefix=f'{broker}/{product}/{period}'):
+		for i in bucket.objects.filter(Prefix=f'{broker}/{product}/{period}/'):
 			result.append(datetime.strptime(
 				i.key.split('/')[-1].split('-')[0], '%Y'
 			))
@@ -1899,14 +2206,14 @@ class Database(object):
 	def getPriceDailyDateList(self, broker, product, period):
 		bucket = self._s3_res.Bucket(self.priceDataBucketName)
 		result = []
-		for i in bucket.objects.filter(Prefix=f'{broker}/{product}/{period}'):
+		for i in bucket.objects.filter(Prefix=f'{broker}/{product}/{period}/'):
 			result.append(datetime.strptime(
 				i.key.split('/')[-1].replace('.csv.gz', ''), '%Y-%m-%d'
 			))
 		return result
 
 
-	def getYearlyPrices(self, broekr, product, period, dt):
+	def _get_legacy_yearly_prices(self, broker, product, period, dt):
 		try:
 			res = self._s3_client.get_object(
 				Bucket=self.priceDataBucketName,
@@ -1919,7 +2226,7 @@ class Database(object):
 			return None
 
 	
-	def getDailyPrices(self, broker, product, period, dt):
+	def _get_legacy_daily_prices(self, broker, product, period, dt):
 		try:
 			res = self._s3_client.get_object(
 				Bucket=self.priceDataBucketName,
@@ -1932,34 +2239,28 @@ class Database(object):
 			return None
 
 
-	def updateYearlyPrices(self, broker, product, period, dt, df):
-		# df to csv in memory
-		s_buf = io.StringIO()
-		df.to_csv(s_buf, sep=' ', header=True)
-		s_buf.seek(0)
-		f_obj = s_buf.read().encode('utf8')
+	def getYearlyPrices(self, broker, product, period, dt):
+		return self.getPrices(
+			broker, product, period,
+			datetime(year=dt.year, month=1, day=1),
+			datetime(year=dt.year+1, month=1, day=1) - timedelta(seconds=1)
+		)
 
-		prices_object = self._s3_res.Object(
-			self.priceDataBucketName,
-			f'{broker}/{product}/{period}/{dt.year}-{dt.year+1}.csv.gz'
+	
+	def getDailyPrices(self, broker, product, period, dt):
+		start = datetime(year=dt.year, month=dt.month, day=dt.day)
+		return self.getPrices(
+			broker, product, period,
+			start, start + timedelta(days=1) - timedelta(seconds=1)
 		)
-		prices_object.put(Body=gzip.compress(f_obj))
-		return True
 
 
-	def updateDailyPrices(self, broker, product, period, dt, df):
-		# df to csv in memory
-		s_buf = io.StringIO()
-		df.to_csv(s_buf, sep=' ', header=True)
-		s_buf.seek(0)
-		f_obj = s_buf.read().encode('utf8')
+	def updateYearlyPrices(self, broker, product, period, dt, df):
+		return self.updatePrices(broker, product, period, df)
 
-		prices_object = self._s3_res.Object(
-			self.priceDataBucketName,
-			f'{broker}/{product}/{period}/{dt.strftime("%Y-%m-%d")}.csv.gz'
-		)
-		prices_object.put(Body=gzip.compress(f_obj))
-		return True
+
+	def updateDailyPrices(self, broker, product, period, dt, df):
+		return self.updatePrices(broker, product, period, df)
 
 	def deletePrices(self, broker, product, period):
 		self._s3_res.meta.client.delete_objects(
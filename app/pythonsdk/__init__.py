@@ -1,5 +1,7 @@
 from .constants import *
 from .utils import *
+from .trading_calendar import TradingCalendar
+from .barseries import BarSeries
 from .app import App
 from .strategy import Strategy
 from .position import Position, BacktestPosition
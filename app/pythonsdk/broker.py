@@ -728,7 +728,7 @@ class Broker(object):
 		last_date = start
 		data = None
 		while not self._is_last_candle_found(period, last_date, end, 1):
-			result = broker._download_historical_data(
+			result = broker.getHistoricalData(
 				product, period, start=last_date, end=end, count=count
 			)
 			if result is not None:
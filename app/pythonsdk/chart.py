@@ -5,6 +5,8 @@ import time
 from copy import copy
 from datetime import datetime, timedelta
 
+# Live bars held per period
+BAR_CAPACITY = 1000
 
 class ChartItem(dict):
 
@@ -69,6 +71,7 @@ class Chart(object):
 		self._data_path = data_path
 		self._idx = {p:0 for p in self.periods}
 		self._data = {p:self._create_empty_df() for p in self.periods}
+		self._bars = {p:None for p in self.periods}
 		self._next = {p:None for p in self.periods}
 		self._subscriptions = {p:[] for p in self.periods}
 
@@ -171,16 +174,32 @@ class Chart(object):
 		return df.loc[(ts_start <= df.index) & (df.index < ts_end)]
 
 
+	def _get_data(self, period):
+		''' Live bars once ticks are handled, otherwise the loaded DataFrame '''
+		if self._bars[period] is not None:
+			return self._bars[period]
+		return self._data[period]
+
+
+	def _get_bars(self, period):
+		if self._bars[period] is None:
+			self._bars[period] = tl.BarSeries.fromDataFrame(
+				self._data[period], capacity=BAR_CAPACITY
+			)
+			self._limit_indicators(period, len(self._bars[period]))
+		return self._bars[period]
+
+
 	def _handle_indicators(self, period):
 		for ind in self.indicators.values():
 			if ind.period == period:
-				ind.calculate(self._data[period], self._idx[period])
+				ind.calculate(self._get_data(period), self._idx[period])
 
 
-	def _limit_indicators(self, period):
+	def _limit_indicators(self, period, size=BAR_CAPACITY):
 		for ind in self.indicators.values():
 			if ind.period == period:
-				ind.limit()
+				ind.limit(size)
 
 
 	def _on_tick(self, item):
@@ -196,7 +215,8 @@ class Chart(object):
 		# Update current ask/bid prices
 		ohlc = item['item']['ask'] + item['item']['bid']
 
-		last_ts = self._data[item['period']].index.values[-1]
+		bars = self._get_bars(item['period'])
+		last_ts = bars.timestamps[-1]
 
 		if item['timestamp'] < last_ts - tl.period.getPeriodOffsetSeconds(item['period']):
 			# Skip tick
@@ -205,24 +225,22 @@ class Chart(object):
 
 		elif not item['bar_end'] and item['timestamp'] >= last_ts:
 			new_ts = item['timestamp'] + tl.period.getPeriodOffsetSeconds(item['period'])
-			self._idx[item['period']] += 1
-			self._data[item['period']].loc[new_ts] = ohlc
+			# Make room for the new bar in the indicators
+			if bars.isFull():
+				self._limit_indicators(item['period'], bars.capacity-1)
+			bars.append(new_ts, ohlc)
 
 		else:
-			self._data[item['period']].iloc[-1] = ohlc
+			bars.update(ohlc)
 
 		# Handle Indicators
+		self._idx[item['period']] = len(bars)-1
 		self._handle_indicators(item['period'])
+		self._set_idx(item['period'], self._idx[item['period']])
 
-		# Limit Data
-		self._data[item['period']] = self._data[item['period']].iloc[-1000:]
-		self._idx[item['period']] = self._data[item['period']].shape[0]-1
-		self._limit_indicators(item['period'])
-
-		idx = self._idx[item['period']]
-		self.timestamps[item['period']] = self._data[item['period']].index.values[:idx+1][::-1]
-		self.asks[item['period']] = self._data[item['period']].values[:idx+1,:4][::-1]
-		self.bids[item['period']] = self._data[item['period']].values[:idx+1,4:][::-1]
+		self.timestamps[item['period']] = bars.getReversed()
+		self.asks[item['period']] = bars.getReversed(slice(0, 4))
+		self.bids[item['period']] = bars.getReversed(slice(4, None))
 
 		# Send to subscribed functions
 		if self.strategy.getBroker().isLive() and item['period'] in self._subscriptions:
@@ -249,6 +267,8 @@ class Chart(object):
 		'''Store data in memory'''
 		if df.size == 0:
 			return
+		# Live bars are rebuilt from the new data
+		self._bars[period] = None
 		# if tl.utils.isCurrentBar(period, df.index.values[-1]):
 		# 	self._next[period] = df.values[-1]
 		# 	df.drop(df.tail(1).index, inplace=True)
@@ -274,24 +294,22 @@ class Chart(object):
 
 
 	def getNextTimestamp(self, period, ts, now=None):
-		new_ts = ts + tl.period.getPeriodOffsetSeconds(period)
-		dt = tl.convertTimestampToTime(new_ts)
-		if tl.isWeekend(dt):
-			new_ts = tl.convertTimeToTimestamp(tl.getWeekstartDate(dt))
-
-		if now is not None:
-			while new_ts + tl.period.getPeriodOffsetSeconds(period) <= now:
-				new_ts += tl.period.getPeriodOffsetSeconds(period)
-				dt = tl.convertTimestampToTime(new_ts)
-				if tl.isWeekend(dt):
-					new_ts = tl.convertTimeToTimestamp(tl.getWeekstartDate(dt))
-			
+		calendar = tl.utils.getTradingCalendar()
+		if now is None:
+			return calendar.getNextTimestamp(period, ts)
+
+		# Step to the bar containing `now`
+		off = tl.period.getPeriodOffsetSeconds(period)
+		new_ts = calendar.getNextTimestamp(period, ts, now=now - off)
+		if new_ts + off <= now:
+			new_ts = calendar.getNextTimestamp(period, new_ts)
 		return new_ts
 
 
 	def prepareLive(self):
 		for period in self.periods:
-			self._idx[period] = self._data[period].index.size-1
+			self._bars[period] = None
+			self._idx[period] = self._get_bars(period).timestamps.size-1
 
 
 	def addPeriods(self, *periods):
@@ -300,6 +318,7 @@ class Chart(object):
 				self.periods.append(period)
 				self._idx[period] = 0
 				self._data[period] = self._create_empty_df()
+				self._bars[period] = None
 				self._next[period] = None
 				self._subscriptions[period] = []
 
@@ -458,14 +477,17 @@ class Chart(object):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 		
-		return self._data[period].index.values[self._idx[period]]
+		data = self._get_data(period)
+		if isinstance(data, tl.BarSeries):
+			return data.timestamps[self._idx[period]]
+		return data.index.values[self._idx[period]]
 
 
 	def getOHLC(self, period, offset, amount):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 		
-		return self._data[period].values[
+		return self._get_data(period).values[
 			(self._idx[period]+1)-offset-amount:(self._idx[period]+1)-offset
 		]
 
@@ -474,7 +496,7 @@ class Chart(object):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 		
-		return self._data[period].values[
+		return self._get_data(period).values[
 			(self._idx[period]+1)-offset-amount:(self._idx[period]+1)-offset
 		][:4]
 
@@ -483,7 +505,7 @@ class Chart(object):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 		
-		return self._data[period].values[
+		return self._get_data(period).values[
 			(self._idx[period]+1)-offset-amount:(self._idx[period]+1)-offset
 		][4:]
 
@@ -492,21 +514,21 @@ class Chart(object):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 		
-		return self._data[period].values[self._idx[period]]
+		return self._get_data(period).values[self._idx[period]]
 
 
 	def getLastAskOHLC(self, period):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 
-		return self._data[period].values[self._idx[period]][:4]
+		return self._get_data(period).values[self._idx[period]][:4]
 
 
 	def getLastBidOHLC(self, period):
 		if not period in self.periods:
 			raise TradelibException('Period not found in chart.')
 
-		return self._data[period].values[self._idx[period]][4:]
+		return self._get_data(period).values[self._idx[period]][4:]
 
 
 	def isChart(self, broker, product):
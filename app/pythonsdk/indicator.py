@@ -17,7 +17,10 @@ class Indicator(object):
 		self._bids = None
 
 	def _preprocessing(self, data):
-		timestamps = data.index.values
+		if isinstance(data, tl.BarSeries):
+			timestamps = data.timestamps
+		else:
+			timestamps = data.index.values
 		asks = data.values[:,:4]
 		bids = data.values[:,4:]
 		
@@ -32,9 +35,12 @@ class Indicator(object):
 		self.bids = self._bids[:self.idx+1][::-1]
 
 
-	def limit(self):
-		self._asks = self._asks[-1000:]
-		self._bids = self._bids[-1000:]
+	def limit(self, size=1000):
+		if self._asks is None:
+			return
+
+		self._asks = self._asks[-size:]
+		self._bids = self._bids[-size:]
 		self.idx = self._asks.shape[0]-1
 
 		self.asks = self._asks[:self.idx+1][::-1]
@@ -8,6 +8,8 @@ Utilities
 
 TS_START_DATE = datetime(year=2000, month=1, day=1)
 
+_calendar = None
+
 def convertToPips(x):
 	return round(x * 10000, 1)
 
@@ -36,6 +38,12 @@ def convertTimeToTimestamp(dt):
 def convertTimestampToTime(ts):
 	return setTimezone(datetime.utcfromtimestamp(ts), 'UTC')
 
+def getTradingCalendar():
+	global _calendar
+	if _calendar is None:
+		_calendar = tl.TradingCalendar()
+	return _calendar
+
 def isWeekend(dt):
 	FRI = 4
 	SAT = 5
@@ -68,22 +76,22 @@ def getWeekstartDate(dt):
 def getWeekendSecondsOffset(start, end):
 	ONE_MINUTE = 60.0
 	# Get weekend seconds offset
-	return sum(
-		ONE_MINUTE for x in range(int((end-start).total_seconds()/ONE_MINUTE)) 
-		if isWeekend(start + timedelta(seconds=x*ONE_MINUTE))
+	start_ts = convertTimeToTimestamp(start)
+	count = int((end-start).total_seconds()/ONE_MINUTE)
+	return count * ONE_MINUTE - getTradingCalendar().getTradingSeconds(
+		start_ts, start_ts + count * ONE_MINUTE, step=ONE_MINUTE
 	)
 
 def getWeeklySecondsOffset(start, end):
 	ONE_MINUTE = 60.0
-	# Get weekend seconds offset
-	return sum(
-		ONE_MINUTE for x in range(int((end-start).total_seconds()/ONE_MINUTE)) 
-		if not isWeekend(start + timedelta(seconds=x*ONE_MINUTE))
+	# Get weekly seconds offset
+	start_ts = convertTimeToTimestamp(start)
+	count = int((end-start).total_seconds()/ONE_MINUTE)
+	return getTradingCalendar().getTradingSeconds(
+		start_ts, start_ts + count * ONE_MINUTE, step=ONE_MINUTE
 	)
 
 def getCountDate(period, count, start=None, end=None):
-		off = tl.period.getPeriodOffsetSeconds(period)
-
 		if start:
 			date = start
 			direction = 1
@@ -94,13 +102,9 @@ def getCountDate(period, count, start=None, end=None):
 			date = datetime.utcnow()
 			direction = -1
 
-		i = x = 0
-		while x < count:
-			if not isWeekend(date + timedelta(seconds=off*i*direction)):
-				x += 1
-			i += 1
-
-		return date + timedelta(seconds=off*i*direction)
+		ts = convertTimeToTimestamp(date)
+		new_ts = getTradingCalendar().getCountTimestamp(period, count, ts, direction=direction)
+		return date + timedelta(seconds=new_ts-ts)
 
 def getDateCount(period, start, end):
 		off = tl.period.getPeriodOffsetSeconds(period)
@@ -1,15 +1,27 @@
 from .constants import *
 from .utils import *
+from .trading_calendar import TradingCalendar
 from .position import Position
 from .position_manager import PositionManager
 from .order import Order
 from .order_manager import OrderManager
+from .tradestore import TradeStore
+from .accountstate import AccountState
+from .ledger import TransactionLedger
+from .triggerbook import TriggerBook
 from .backtester import IGBacktester, OandaBacktester
+from .dispatcher import TickDispatcher
+from .broadcaster import TickBroadcaster
+from .livebars import LiveBars
 from .chart import Chart
 from .spot import Spot
 from .dataloader import DataLoader
 from .datasaver import DataSaver
-from . import broker, period, product
+from .pricestore import PriceStore
+from .pricecache import PriceCache
+from .barseries import BarSeries
+from .subscription import Subscription
+from . import broker, period, product, resampler, triggerbook, ledger
 
 
 
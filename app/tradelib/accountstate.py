@@ -0,0 +1,602 @@
+import time
+import json
+import uuid
+import traceback
+from threading import Thread, Lock, Condition
+from app import tradelib as tl
+
+NAMES = ('positions', 'orders')
+
+# Extends the owner lease only while it is still ours
+REFRESH_SCRIPT = '''
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+	return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+'''
+
+# Deletes the owner lease only while it is still ours
+RELEASE_SCRIPT = '''
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+	return redis.call('DEL', KEYS[1])
+end
+return 0
+'''
+
+# States written by the shared writer thread
+_states = []
+_states_lock = Lock()
+_writer = None
+
+
+def _run_writer(interval):
+	while True:
+		start = time.time()
+		with _states_lock:
+			states = list(_states)
+		for state in states:
+			try:
+				state._write()
+			except Exception:
+				print(traceback.format_exc(), flush=True)
+		time.sleep(max(interval - (time.time() - start), 0.001))
+
+
+def _register(state, interval):
+	global _writer
+	with _states_lock:
+		if state not in _states:
+			_states.append(state)
+		if _writer is None:
+			_writer = Thread(target=_run_writer, args=(interval,), name='account-state-writer', daemon=True)
+			_writer.start()
+
+
+def _unregister(state):
+	with _states_lock:
+		if state in _states:
+			_states.remove(state)
+
+
+class AccountState(object):
+	'''Paper trading positions and orders held in memory by the worker that owns them.
+
+	One worker at a time owns a broker's state, through the `<key>:owner` lease
+	in Redis. The owner serves every read from memory, so tick checks never wait
+	on Redis. Each write gets the next sequence number and is pushed to the
+	`<key>:journal` list before it returns, so a write that returned survives
+	a crash. If the push fails the write raises, and stays queued for the
+	writer thread to push again.
+
+	A shared writer thread, waking every `flush_interval`, takes a snapshot every
+	`snapshot_interval`. It writes the items changed since the last snapshot
+	into the `TradeStore` layout (`<key>:positions`, `<key>:orders`), which the
+	other workers keep reading. In the same transaction it records the
+	snapshot's sequence number and empties the journal. A new owner, or a restart, loads the snapshot and
+	replays the journal entries past it.
+
+	Guarantees are relaxed for the other workers:
+
+	- They read the `TradeStore`, so they see the owner's writes up to
+	  `snapshot_interval` late.
+	- Their own writes, such as API requests they serve, go to the `TradeStore`
+	  directly and are pulled into the owner's memory after its next snapshot.
+	- Items the `TradeStore` already holds are snapshotted at the version last
+	  seen there. If another worker changed or deleted one since, the other
+	  write wins and the owner's change is dropped.
+	'''
+
+	def __init__(self, redis_client, key, owner_id,
+		flush_interval=0.05, snapshot_interval=1.0, lease=30
+	):
+		self.redis_client = redis_client
+		self.key = key
+		# Unique per instance, so a second instance in the same worker defers too
+		self.owner_id = f'{owner_id}:{uuid.uuid4().hex}'
+		self.flush_interval = flush_interval
+		self.snapshot_interval = snapshot_interval
+		self.lease = lease
+
+		self.owner_key = f'{key}:owner'
+		self.journal_key = f'{key}:journal'
+		self.snapshot_key = f'{key}:snapshot_seq'
+		self.views = { name: tl.TradeStore(redis_client, f'{key}:{name}') for name in NAMES }
+
+		self._refresh_script = redis_client.register_script(REFRESH_SCRIPT)
+		self._release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+		# Maps name to { order_id: item JSON } in insertion order
+		self._items = { name: {} for name in NAMES }
+		# Maps name to { order_id: sequence number of its last write }
+		self._versions = { name: {} for name in NAMES }
+		# Maps name to the ids written since the last snapshot
+		self._dirty = { name: set() for name in NAMES }
+		# Maps name to the sequence number of its last change
+		self._changed = { name: 0 for name in NAMES }
+		# Maps name to (changed, items, { order_id: (version, converted item) }) for `getCached`
+		self._cache = { name: (None, [], {}) for name in NAMES }
+		# Maps name to the TradeStore sequence number after our last snapshot
+		self._view_seq = { name: None for name in NAMES }
+		# Maps name to { order_id: TradeStore version } as last seen
+		self._view_versions = { name: {} for name in NAMES }
+
+		self.seq = 0
+		# Pending (seq, entry JSON) for the journal
+		self._journal = []
+		self._lock = Lock()
+		self._write_lock = Lock()
+		self._flushed = Condition(self._lock)
+		self._written_seq = 0
+		self._is_owner = False
+		self._last_snapshot = 0
+		self._last_refresh = 0
+		self._last_acquire = 0
+
+		self.writes = 0
+		self.snapshots = 0
+		self.pulled = 0
+
+
+	'''
+	Ownership
+	'''
+
+	def acquire(self, min_interval=0):
+		'''Take ownership if no other worker holds the lease, loading the saved state.
+
+		Attempts are skipped for `min_interval` seconds after the last one.
+
+		Returns:
+			True if this worker owns the state.
+		'''
+
+		if self._is_owner:
+			return True
+		if time.time() - self._last_acquire < min_interval:
+			return False
+		self._last_acquire = time.time()
+
+		if not self.redis_client.set(self.owner_key, self.owner_id, nx=True, ex=self.lease):
+			owner = self.redis_client.get(self.owner_key)
+			if owner is None or owner.decode() != self.owner_id:
+				return False
+
+		self.load()
+		self._is_owner = True
+		self._last_refresh = time.time()
+		_register(self, self.flush_interval)
+		return True
+
+
+	def isOwner(self):
+		return self._is_owner
+
+
+	def close(self):
+		''' Write everything out and give up ownership '''
+
+		if not self._is_owner:
+			return
+
+		_unregister(self)
+		with self._write_lock:
+			self._snapshot()
+		self._release_script(keys=[self.owner_key], args=[self.owner_id])
+		self._is_owner = False
+
+
+	'''
+	Recovery
+	'''
+
+	def load(self):
+		''' Rebuild memory from the last snapshot and the journal written after it '''
+
+		pipe = self.redis_client.pipeline()
+		pipe.get(self.snapshot_key)
+		pipe.lrange(self.journal_key, 0, -1)
+		snapshot_seq, journal = pipe.execute()
+		snapshot_seq = int(snapshot_seq or 0)
+		views = [self.views[name].getAllVersioned() for name in NAMES]
+
+		with self._lock:
+			for name, (view_seq, items, view_versions) in zip(NAMES, views):
+				self._items[name] = { i['order_id']: json.dumps(i) for i in items }
+				self._versions[name] = { i: snapshot_seq for i in self._items[name] }
+				self._dirty[name] = set()
+				self._cache[name] = (None, [], {})
+				self._view_seq[name] = view_seq
+				self._view_versions[name] = view_versions
+
+			self.seq = snapshot_seq
+			for entry in journal:
+				entry = json.loads(entry)
+				if entry['seq'] > snapshot_seq:
+					self.seq = entry['seq']
+					self._apply(entry)
+
+			self._journal = []
+			self._written_seq = self.seq
+			for name in NAMES:
+				self._changed[name] = self.seq
+
+
+	def _apply(self, entry):
+		name = entry['name']
+		items = self._items[name]
+		versions = self._versions[name]
+		dirty = self._dirty[name]
+		op = entry['op']
+
+		if op == 'put':
+			order_id = entry['item']['order_id']
+			items[order_id] = json.dumps(entry['item'])
+			versions[order_id] = entry['seq']
+			dirty.add(order_id)
+
+		elif op == 'delete':
+			items.pop(entry['order_id'], None)
+			versions.pop(entry['order_id'], None)
+			dirty.add(entry['order_id'])
+
+		elif op == 'set':
+			dirty.update(items.keys())
+			items.clear()
+			versions.clear()
+			for item in entry['items']:
+				items[item['order_id']] = json.dumps(item)
+				versions[item['order_id']] = entry['seq']
+			dirty.update(items.keys())
+
+		self._changed[name] = entry['seq']
+
+
+	def _record(self, entry):
+		''' Apply a write to memory and queue it for the journal, must hold the lock '''
+
+		self.seq += 1
+		entry['seq'] = self.seq
+		self._apply(entry)
+		# Serialised now, the caller may change the item afterwards
+		self._journal.append((self.seq, json.dumps(entry)))
+		self.writes += 1
+		return self.seq
+
+
+	'''
+	Writes
+	'''
+
+	def append(self, name, item):
+		with self._lock:
+			seq = self._record({ 'name': name, 'op': 'put', 'item': item })
+		self._push(seq)
+		return seq
+
+
+	def replace(self, name, item, version=None):
+		'''Overwrite the item with the same `order_id`, as `TradeStore.replace`.
+
+		Returns:
+			The new version, 0 if the item does not exist or -1 on a version conflict.
+		'''
+
+		with self._lock:
+			current = self._versions[name].get(item['order_id'])
+			if current is None:
+				return 0
+			if version is not None and version != current:
+				return -1
+			seq = self._record({ 'name': name, 'op': 'put', 'item': item })
+		self._push(seq)
+		return seq
+
+
+	def delete(self, name, order_id):
+		with self._lock:
+			if order_id not in self._items[name]:
+				return False
+			seq = self._record({ 'name': name, 'op': 'delete', 'order_id': order_id })
+		self._push(seq)
+		return True
+
+
+	def setAll(self, name, items):
+		with self._lock:
+			seq = self._record({ 'name': name, 'op': 'set', 'items': list(items) })
+		self._push(seq)
+
+
+	'''
+	Reads
+	'''
+
+	def get(self, name, order_id):
+		item = self._items[name].get(order_id)
+		if item is None:
+			return None
+		return json.loads(item)
+
+
+	def getVersion(self, name, order_id):
+		return self._versions[name].get(order_id)
+
+
+	def getAll(self, name, account_id=None):
+		with self._lock:
+			items = list(self._items[name].values())
+
+		items = [json.loads(item) for item in items]
+		if account_id is not None:
+			items = [item for item in items if item.get('account_id') == account_id]
+		return items
+
+
+	def getCached(self, name, convert=None):
+		'''Items passed through `convert` once per version, as `TradeStore.getCached`.
+
+		The same list is returned until the collection changes, so it must not be
+		modified.
+		'''
+
+		with self._lock:
+			changed, items, cache = self._cache[name]
+			if changed == self._changed[name]:
+				return items
+
+			versions = self._versions[name]
+			new_cache = {}
+			for order_id, item in self._items[name].items():
+				entry = cache.get(order_id)
+				if entry is None or entry[0] != versions[order_id]:
+					item = json.loads(item)
+					entry = (versions[order_id], convert(item) if convert else item)
+				new_cache[order_id] = entry
+
+			items = [item for _, item in new_cache.values()]
+			self._cache[name] = (self._changed[name], items, new_cache)
+			return items
+
+
+	def getStore(self, name):
+		''' A TradeStore-like view of the `name` collection '''
+		return StateCollection(self, name)
+
+
+	'''
+	Writer
+	'''
+
+	def flush(self, timeout=None):
+		''' Block until every write so far is in the journal '''
+
+		with self._lock:
+			seq = self.seq
+			return self._flushed.wait_for(lambda: self._written_seq >= seq, timeout)
+
+
+	def _write(self):
+		with self._write_lock:
+			if self._is_owner:
+				self._write_locked()
+
+
+	def _write_locked(self):
+		now = time.time()
+		if now - self._last_refresh >= self.lease / 3:
+			self._last_refresh = now
+			if not self._refresh_script(keys=[self.owner_key], args=[self.owner_id, self.lease]):
+				print(f'[AccountState] {self.key} ownership lost.', flush=True)
+				self._is_owner = False
+				_unregister(self)
+				return
+
+		if now - self._last_snapshot >= self.snapshot_interval:
+			self._snapshot()
+			self._pull()
+		else:
+			# Writes whose push failed
+			self._push_locked()
+
+
+	def _push(self, seq):
+		''' Push queued journal entries to Redis, returns once `seq` is written '''
+
+		with self._write_lock:
+			with self._lock:
+				if self._written_seq >= seq:
+					return
+			self._push_locked()
+
+
+	def _push_locked(self):
+		with self._lock:
+			journal = self._journal
+			self._journal = []
+		if not len(journal):
+			return
+
+		try:
+			self.redis_client.rpush(self.journal_key, *[entry for _, entry in journal])
+		except Exception:
+			with self._lock:
+				self._journal = journal + self._journal
+			raise
+
+		with self._lock:
+			self._written_seq = max(self._written_seq, journal[-1][0])
+			self._flushed.notify_all()
+
+
+	def _snapshot(self):
+		'''Write changed items to the TradeStore layout and reset the journal.
+
+		Redis still runs the rest of a transaction when one command fails, so the
+		snapshot's sequence number is recorded and the journal emptied in a
+		second transaction once every write succeeded. If either fails, the
+		changes stay pending for the next attempt.
+		'''
+
+		self._last_snapshot = time.time()
+		with self._lock:
+			seq = self.seq
+			changes = {}
+			taken = dict(self._dirty)
+			journal = self._journal
+			for name in NAMES:
+				dirty = self._dirty[name]
+				items = self._items[name]
+				view_versions = self._view_versions[name]
+				# In memory order, so new items keep their place in the TradeStore
+				changes[name] = (
+					[json.loads(item) for i, item in items.items() if i in dirty],
+					[i for i in dirty if i not in items],
+					{ i: view_versions[i] for i in dirty if i in items and i in view_versions }
+				)
+				self._dirty[name] = set()
+			self._journal = []
+
+		if not any(len(put) or len(deleted) for put, deleted, _ in changes.values()):
+			# Nothing changed, the journal is already covered by the snapshot
+			with self._lock:
+				self._written_seq = max(self._written_seq, seq)
+				self._flushed.notify_all()
+			return
+
+		pipe = self.redis_client.pipeline(transaction=True)
+		for name in NAMES:
+			pipe.get(self.views[name].seq_key)
+		for name in NAMES:
+			self.views[name].writeMany(pipe, *changes[name])
+		for name in NAMES:
+			pipe.get(self.views[name].seq_key)
+		try:
+			results = pipe.execute(raise_on_error=False)
+			errors = [x for x in results if isinstance(x, Exception)]
+			if len(errors):
+				raise errors[0]
+
+			# Only once every write is in, the journal still covers them until then
+			pipe.set(self.snapshot_key, seq)
+			pipe.delete(self.journal_key)
+			pipe.execute()
+		except Exception:
+			# Put the changes back, so the next flush and snapshot write them again
+			with self._lock:
+				for name in NAMES:
+					self._dirty[name].update(taken[name])
+				self._journal = journal + self._journal
+			raise
+
+		with self._lock:
+			before = results[:len(NAMES)]
+			after = results[-len(NAMES):]
+			written = iter(results[len(NAMES):])
+			for name, start, view_seq in zip(NAMES, before, after):
+				put, deleted, _ = changes[name]
+				view_versions = self._view_versions[name]
+				rejected = False
+				for item, version in zip(put, written):
+					if version > 0:
+						view_versions[item['order_id']] = version
+					else:
+						# Changed or deleted by another worker, `_pull` takes its write
+						rejected = True
+				for order_id, _ in zip(deleted, written):
+					view_versions.pop(order_id, None)
+
+				if rejected:
+					self._view_seq[name] = None
+				# Otherwise another worker wrote since, leave it for `_pull`
+				elif start == self._view_seq[name]:
+					self._view_seq[name] = view_seq
+			self._written_seq = max(self._written_seq, seq)
+			self._flushed.notify_all()
+		self.snapshots += 1
+
+
+	def _pull(self):
+		''' Merge in writes other workers made to the TradeStore since our last snapshot '''
+
+		for name in NAMES:
+			view = self.views[name]
+			view_seq = self.redis_client.get(view.seq_key)
+			if view_seq == self._view_seq[name]:
+				continue
+
+			view_seq, items, versions = view.getAllVersioned()
+			items = { i['order_id']: json.dumps(i) for i in items }
+			with self._lock:
+				current = self._items[name]
+				dirty = self._dirty[name]
+				view_versions = self._view_versions[name]
+				changed = False
+				for order_id, item in items.items():
+					if order_id not in dirty and current.get(order_id) != item:
+						self._record({ 'name': name, 'op': 'put', 'item': json.loads(item) })
+						changed = True
+				for order_id in [i for i in current if i not in items and i not in dirty]:
+					self._record({ 'name': name, 'op': 'delete', 'order_id': order_id })
+					changed = True
+
+				# Already in the TradeStore
+				for order_id in list(dirty):
+					if current.get(order_id) == items.get(order_id):
+						dirty.discard(order_id)
+
+				# Dirty items keep the version they were changed from, so the
+				# snapshot does not overwrite what other workers wrote since
+				for order_id in [i for i in view_versions if i not in items and i not in dirty]:
+					del view_versions[order_id]
+				for order_id, version in versions.items():
+					if order_id not in dirty:
+						view_versions[order_id] = version
+				self._view_seq[name] = view_seq
+				self.pulled += changed
+
+
+	def getStats(self):
+		with self._lock:
+			return {
+				'owner': self._is_owner,
+				'seq': self.seq,
+				'written_seq': self._written_seq,
+				'pending': len(self._journal),
+				'positions': len(self._items['positions']),
+				'orders': len(self._items['orders']),
+				'writes': self.writes,
+				'snapshots': self.snapshots,
+				'pulled': self.pulled
+			}
+
+
+class StateCollection(object):
+	''' One collection of an AccountState with the TradeStore interface '''
+
+	def __init__(self, state, name):
+		self.state = state
+		self.name = name
+
+	def append(self, item):
+		return self.state.append(self.name, item)
+
+	def replace(self, item, version=None):
+		return self.state.replace(self.name, item, version=version)
+
+	def delete(self, order_id):
+		return self.state.delete(self.name, order_id)
+
+	def setAll(self, items):
+		self.state.setAll(self.name, items)
+
+	def get(self, order_id):
+		return self.state.get(self.name, order_id)
+
+	def getVersion(self, order_id):
+		return self.state.getVersion(self.name, order_id)
+
+	def getAll(self, account_id=None):
+		return self.state.getAll(self.name, account_id=account_id)
+
+	def getCached(self, convert=None):
+		return self.state.getCached(self.name, convert)
@@ -13,6 +13,11 @@ class Backtester(object):
 	def __init__(self, broker):
 		self.broker = broker
 
+		# Paper trading trigger prices, checked against each tick
+		self._entry_book = tl.TriggerBook(tl.triggerbook.getEntryTrigger, tl.broker.PAPERTRADER_NAME)
+		self._sl_book = tl.TriggerBook(tl.triggerbook.getStopLossTrigger, tl.broker.PAPERTRADER_NAME)
+		self._tp_book = tl.TriggerBook(tl.triggerbook.getTakeProfitTrigger, tl.broker.PAPERTRADER_NAME)
+
 
 	def createPosition(self,
 		product, lotsize, direction,
@@ -258,8 +263,8 @@ class Backtester(object):
 		ask = ohlc[:4]
 		bid = ohlc[4:]
 
-		for order in self.broker.getAllOrders():
-			order = tl.Order.fromDict(self.broker, order)
+		self._entry_book.sync(self.broker.getCachedOrders())
+		for order in self._entry_book.getTriggered(product, ask, bid):
 			if order.product != product or order.account_id != tl.broker.PAPERTRADER_NAME:
 				continue
 
@@ -269,9 +274,10 @@ class Backtester(object):
 						# Enter Order Position LONG
 						pos, res = self.createOrderPosition(order)
 
-						# Close Order
-						order.close_price = order.entry_price
-						order.close_time = timestamp
+						# Close Order, cached orders are shared so close a copy
+						cpy = tl.Order.fromDict(self.broker, order)
+						cpy.close_price = order.entry_price
+						cpy.close_time = timestamp
 
 						# Delete Order
 						# del self.broker.orders[self.broker.orders.index(order)]
@@ -292,7 +298,7 @@ class Backtester(object):
 									'timestamp': math.floor(time.time()),
 									'type': tl.ORDER_CANCEL,
 									'accepted': True,
-									'item': order
+									'item': cpy
 								}
 							})
 							self.broker.handleOnTrade(order.account_id, res)
@@ -305,9 +311,10 @@ class Backtester(object):
 						# Enter Order Position SHORT
 						pos, res = self.createOrderPosition(order)
 
-						# Close Order
-						order.close_price = order.entry_price
-						order.close_time = timestamp
+						# Close Order, cached orders are shared so close a copy
+						cpy = tl.Order.fromDict(self.broker, order)
+						cpy.close_price = order.entry_price
+						cpy.close_time = timestamp
 						
 						# Delete Order
 						# del self.broker.orders[self.broker.orders.index(order)]		
@@ -328,7 +335,7 @@ class Backtester(object):
 									'timestamp': math.floor(time.time()),
 									'type': tl.ORDER_CANCEL,
 									'accepted': True,
-									'item': order
+									'item': cpy
 								}
 							})
 							self.broker.handleOnTrade(order.account_id, res)
@@ -344,9 +351,10 @@ class Backtester(object):
 						# Enter Order Position SHORT
 						pos, res = self.createOrderPosition(order)
 
-						# Close Order
-						order.close_price = order.entry_price
-						order.close_time = timestamp
+						# Close Order, cached orders are shared so close a copy
+						cpy = tl.Order.fromDict(self.broker, order)
+						cpy.close_price = order.entry_price
+						cpy.close_time = timestamp
 
 						# Delete Order
 						# del self.broker.orders[self.broker.orders.index(order)]
@@ -367,7 +375,7 @@ class Backtester(object):
 									'timestamp': math.floor(time.time()),
 									'type': tl.ORDER_CANCEL,
 									'accepted': True,
-									'item': order
+									'item': cpy
 								}
 							})
 							self.broker.handleOnTrade(order.account_id, res)
@@ -380,9 +388,10 @@ class Backtester(object):
 						# Enter Order Position SHORT
 						pos, res = self.createOrderPosition(order)
 
-						# Close Order
-						order.close_price = order.entry_price
-						order.close_time = timestamp
+						# Close Order, cached orders are shared so close a copy
+						cpy = tl.Order.fromDict(self.broker, order)
+						cpy.close_price = order.entry_price
+						cpy.close_time = timestamp
 
 						# Delete Order
 						# del self.broker.orders[self.broker.orders.index(order)]
@@ -403,7 +412,7 @@ class Backtester(object):
 									'timestamp': math.floor(time.time()),
 									'type': tl.ORDER_CANCEL,
 									'accepted': True,
-									'item': order
+									'item': cpy
 								}
 							})
 							self.broker.handleOnTrade(order.account_id, res)
@@ -419,17 +428,18 @@ class Backtester(object):
 
 		ask = ohlc[:4]
 		bid = ohlc[4:]
-		for pos in self.broker.getAllPositions():
-			pos = tl.Position.fromDict(self.broker, pos)
+		self._sl_book.sync(self.broker.getCachedPositions())
+		for pos in self._sl_book.getTriggered(product, ask, bid):
 			if pos.product != product or not pos.sl or pos.account_id != tl.broker.PAPERTRADER_NAME:
 				continue
 
 			if ((pos.direction == tl.LONG and bid[2] <= pos.sl) or
 				(pos.direction == tl.SHORT and ask[1] >= pos.sl)):
 				
-				# Close Position
-				pos.close_price = pos.sl
-				pos.close_time = timestamp
+				# Close Position, cached positions are shared so close a copy
+				cpy = tl.Position.fromDict(self.broker, pos)
+				cpy.close_price = pos.sl
+				cpy.close_time = timestamp
 
 				# Delete Position
 				# del self.broker.positions[self.broker.positions.index(pos)]
@@ -440,7 +450,7 @@ class Backtester(object):
 						'timestamp': math.floor(time.time()),
 						'type': tl.STOP_LOSS,
 						'accepted': True,
-						'item': pos
+						'item': cpy
 					}
 				}
 
@@ -458,17 +468,18 @@ class Backtester(object):
 		ask = ohlc[:4]
 		bid = ohlc[4:]
 
-		for pos in self.broker.positions:
-			pos = tl.Position.fromDict(self.broker, pos)
+		self._tp_book.sync(self.broker.getCachedPositions())
+		for pos in self._tp_book.getTriggered(product, ask, bid):
 			if pos.product != product or not pos.tp or pos.account_id != tl.broker.PAPERTRADER_NAME:
 				continue
 
 			if ((pos.direction == tl.LONG and bid[1] >= pos.tp) or
 				(pos.direction == tl.SHORT and ask[2] <= pos.tp)):
 				
-				# Close Position
-				pos.close_price = pos.tp
-				pos.close_time = timestamp
+				# Close Position, cached positions are shared so close a copy
+				cpy = tl.Position.fromDict(self.broker, pos)
+				cpy.close_price = pos.tp
+				cpy.close_time = timestamp
 
 				# Delete Position
 				# del self.broker.positions[self.broker.positions.index(pos)]
@@ -479,7 +490,7 @@ class Backtester(object):
 						'timestamp': math.floor(time.time()),
 						'type': tl.TAKE_PROFIT,
 						'accepted': True,
-						'item': pos
+						'item': cpy
 					}
 				}
 
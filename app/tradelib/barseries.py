@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from threading import Lock
+
+COLUMNS = [
+	'ask_open', 'ask_high', 'ask_low', 'ask_close',
+	'mid_open', 'mid_high', 'mid_low', 'mid_close',
+	'bid_open', 'bid_high', 'bid_low', 'bid_close'
+]
+
+class BarSeries(object):
+	'''Preallocated ring buffer of bars, a timestamp column plus an OHLC block.
+
+	Rows live in a buffer twice `capacity` long. Appends write past the current
+	end and, once the buffer runs out, the newest `capacity` rows are copied back
+	to the front. Appending is amortised O(1) and the held rows are always
+	contiguous, so `timestamps`, `values` and their reversed views are
+	zero-copy. Views are invalidated by the next append.
+	'''
+
+	def __init__(self, capacity=1000, columns=COLUMNS):
+		self.capacity = capacity
+		self.columns = list(columns)
+
+		self._timestamps = np.zeros((capacity * 2,), dtype=np.float64)
+		self._values = np.zeros((capacity * 2, len(self.columns)), dtype=np.float64)
+		self._start = 0
+		self._end = 0
+		self._lock = Lock()
+
+
+	@classmethod
+	def fromDataFrame(cls, df, capacity=1000):
+		bars = cls(capacity=capacity, columns=df.columns)
+		bars.extend(df.index.values, df.values)
+		return bars
+
+
+	def __len__(self):
+		return self._end - self._start
+
+
+	def _reserve(self):
+		if self._end == self._timestamps.size:
+			size = min(len(self), self.capacity - 1)
+			self._timestamps[:size] = self._timestamps[self._end-size:self._end]
+			self._values[:size] = self._values[self._end-size:self._end]
+			self._start = 0
+			self._end = size
+
+		elif len(self) == self.capacity:
+			self._start += 1
+
+
+	def isFull(self):
+		return len(self) == self.capacity
+
+
+	def append(self, ts, ohlc):
+		''' Add a new last bar, dropping the oldest bar when full '''
+
+		with self._lock:
+			self._reserve()
+			self._timestamps[self._end] = ts
+			self._values[self._end] = ohlc
+			self._end += 1
+
+
+	def update(self, ohlc):
+		''' Replace the OHLC values of the last bar '''
+
+		with self._lock:
+			self._values[self._end-1] = ohlc
+
+
+	def extend(self, timestamps, values):
+		''' Append sorted rows in bulk, keeping the newest `capacity` rows '''
+
+		with self._lock:
+			timestamps = timestamps[-self.capacity:]
+			values = values[-self.capacity:]
+			keep = min(len(self), self.capacity - timestamps.size)
+
+			self._timestamps[:keep] = self._timestamps[self._end-keep:self._end]
+			self._values[:keep] = self._values[self._end-keep:self._end]
+			self._timestamps[keep:keep+timestamps.size] = timestamps
+			self._values[keep:keep+timestamps.size] = values
+			self._start = 0
+			self._end = keep + timestamps.size
+
+
+	def discard(self, ts):
+		''' Drop bars at or before `ts` from the front '''
+
+		with self._lock:
+			self._start += int(np.searchsorted(self.timestamps, ts, side='right'))
+
+
+	def clear(self):
+		with self._lock:
+			self._start = 0
+			self._end = 0
+
+
+	@property
+	def timestamps(self):
+		return self._timestamps[self._start:self._end]
+
+
+	@property
+	def values(self):
+		return self._values[self._start:self._end]
+
+
+	def getReversed(self, columns=None):
+		''' Newest first view of the timestamps, or of `columns` of the OHLC block '''
+
+		if columns is None:
+			return self.timestamps[::-1]
+		return self.values[::-1, columns]
+
+
+	def toDataFrame(self, start_ts=None, end_ts=None):
+		''' Copy bars in [`start_ts`, `end_ts`) out for saving '''
+
+		with self._lock:
+			timestamps = self.timestamps
+			values = self.values
+			lo = 0 if start_ts is None else np.searchsorted(timestamps, start_ts, side='left')
+			hi = timestamps.size if end_ts is None else np.searchsorted(timestamps, end_ts, side='left')
+
+			return pd.DataFrame(
+				index=pd.Index(data=timestamps[lo:hi].copy(), name='timestamp'),
+				data=values[lo:hi].copy(), columns=self.columns
+			)
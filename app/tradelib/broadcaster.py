@@ -0,0 +1,136 @@
+import time
+import traceback
+from threading import Thread, Lock
+
+class TickBroadcaster(object):
+	'''Coalesces chart ticks into socket.io `ontick` frames sent at a fixed rate.
+
+	Ticks are collected per room (`broker:product:period`, as joined in `stream.py`).
+	Between frames a new tick replaces the pending tick for its room unless either
+	one ends a bar, so completed bars are always sent. Each frame emits one `all`
+	batch per chart and one `ontick` per pending item, for the rooms that changed
+	since the last frame. A tick whose bar is identical to the last one sent for
+	its room is not sent again.
+	'''
+
+	def __init__(self, ctrl, rate=10, namespace='/admin'):
+		self.ctrl = ctrl
+		self.interval = 1.0 / rate
+		self.namespace = namespace
+
+		# Maps room to its pending items, oldest first
+		self._pending = {}
+		# Maps room to the (timestamp, item) last sent
+		self._last = {}
+		self._lock = Lock()
+
+		self.received = 0
+		self.coalesced = 0
+		self.unchanged = 0
+		self.frames = 0
+		self.rooms_sent = 0
+		self.emits = 0
+
+		Thread(target=self._run, name='tick-broadcaster', daemon=True).start()
+
+
+	def _get_room(self, res):
+		return f"{res.get('broker')}:{res.get('product')}:{res.get('period')}"
+
+
+	def update(self, result):
+		''' Queue a chart's tick result for the next frame '''
+
+		with self._lock:
+			for res in result:
+				self.received += 1
+				room = self._get_room(res)
+				pending = self._pending.get(room)
+				if pending is None:
+					last = self._last.get(room)
+					if (
+						not res.get('bar_end') and last is not None and
+						last == (res.get('timestamp'), res.get('item'))
+					):
+						self.unchanged += 1
+						continue
+
+					self._pending[room] = [res]
+
+				elif not pending[-1].get('bar_end') and not res.get('bar_end'):
+					pending[-1] = res
+					self.coalesced += 1
+
+				else:
+					pending.append(res)
+
+
+	def flush(self):
+		''' Emit everything pending as one frame '''
+
+		with self._lock:
+			if not len(self._pending):
+				return
+			frame = self._pending
+			self._pending = {}
+			for room, pending in frame.items():
+				self._last[room] = (pending[-1].get('timestamp'), pending[-1].get('item'))
+
+		# Group rooms by chart for the `all` batch
+		charts = {}
+		for pending in frame.values():
+			res = pending[0]
+			charts.setdefault((res.get('broker'), res.get('product')), []).extend(pending)
+
+		emits = 0
+		for (broker, product), items in charts.items():
+			self.ctrl.emit(
+				'ontick',
+				{
+					'broker': broker,
+					'product': product,
+					'period': 'all',
+					'items': items
+				},
+				namespace=self.namespace
+			)
+			for res in items:
+				self.ctrl.emit('ontick', res, namespace=self.namespace)
+			emits += len(items) + 1
+
+		with self._lock:
+			self.frames += 1
+			self.rooms_sent += len(frame)
+			self.emits += emits
+
+
+	def _run(self):
+		next_frame = time.time()
+		while True:
+			next_frame += self.interval
+			try:
+				self.flush()
+			except Exception:
+				print(traceback.format_exc(), flush=True)
+
+			delay = next_frame - time.time()
+			if delay > 0:
+				time.sleep(delay)
+			else:
+				# Running behind, start the next frame now
+				next_frame = time.time()
+
+
+	def getStats(self):
+		with self._lock:
+			return {
+				'rate': 1.0 / self.interval,
+				'rooms': len(self._last),
+				'pending': sum(len(i) for i in self._pending.values()),
+				'received': self.received,
+				'coalesced': self.coalesced,
+				'unchanged': self.unchanged,
+				'frames': self.frames,
+				'rooms_sent': self.rooms_sent,
+				'emits': self.emits
+			}
@@ -76,7 +76,12 @@ class Broker(object):
 
 		self.charts = []
 		self.ontrade_subs = {}
-		self.transactions = self._create_empty_transaction_df()
+		# Maps "positions"/"orders" to their TradeStore
+		self._stores = {}
+		self._legacy_migrated = False
+		# Paper trading state, served from memory by the worker owning it
+		self._state = None
+		self.transactions = self._create_transaction_ledger()
 		# if self.strategyId is not None:
 		# 	self.resetHandled()
 		# self._handled = {}
@@ -106,19 +111,23 @@ class Broker(object):
 	def _handle_papertrader_setup(self):
 
 		if tl.broker.PAPERTRADER_NAME in self.accounts:
-			# Get transaction history
-			transactions = self.ctrl.getDb().getStrategyTransactions(self.userAccount.userId, self.brokerId)
-			from_ts = None
-			if transactions is not None and transactions.size > 0:
-				from_ts = transactions[['timestamp']].values[-1][0]
-			# Handle saved strategy positions
-			earliest_trade_ts = self._retrieve_strategy_trades()
-			if from_ts is None:
-				from_ts = earliest_trade_ts
-
-			# Do backtest from last transaction timestamp
-			if from_ts is not None:
-				self._run_backtest(from_ts)
+			self._migrate_legacy_trades()
+			self._state = tl.AccountState(
+				self.ctrl.redis_client, self.getBrokerKey(), self.ctrl.connection_id,
+				snapshot_interval=self.ctrl.app.config.get('ACCOUNT_SNAPSHOT_INTERVAL', 1.0)
+			)
+			# Only the owner restores trades, the others read what it writes
+			if self._state.acquire():
+				# Get last transaction timestamp
+				from_ts = self.transactions.getLastTimestamp()
+				# Handle saved strategy positions
+				earliest_trade_ts = self._retrieve_strategy_trades()
+				if from_ts is None:
+					from_ts = earliest_trade_ts
+
+				# Do backtest from last transaction timestamp
+				if from_ts is not None:
+					self._run_backtest(from_ts)
 
 			self.acceptLive = True
 			print('ACCEPT LIVE')
@@ -221,16 +230,21 @@ class Broker(object):
 		return item
 
 
-	def _create_empty_transaction_df(self):
-		df = pd.DataFrame(columns=[
-			'reference_id', 'timestamp', 'type', 'accepted',
-			'order_id', 'account_id', 'product', 'order_type',
-			'direction', 'lotsize', 'entry_price', 'close_price', 'sl', 'tp',
-			'open_time', 'close_time'
-		])
-		return df.set_index('reference_id')
+	def _create_transaction_ledger(self):
+		storage = lock = None
+		if self.userAccount:
+			storage = tl.ledger.DbStorage(self.ctrl.getDb(), self.userAccount.userId, self.brokerId)
+			lock = self.ctrl.redis_client.lock(f'ledger:{self.userAccount.userId}:{self.brokerId}', timeout=60)
+		return tl.TransactionLedger(storage, lock=lock)
 	
 
+	def getHistoricalData(self, product, period, start=None, end=None, count=None, force_download=False):
+		''' Retrieve historical prices through the worker's price cache '''
+		return self.ctrl.price_cache.get(
+			self.name, product, period, self._download_historical_data,
+			start=start, end=end, count=count, force_download=force_download
+		)
+
 	def save_data(self, df, product, period):
 		return
 
@@ -246,6 +260,8 @@ class Broker(object):
 
 	def stop(self):
 		self.is_running = False
+		if self._state is not None:
+			self._state.close()
 
 	def getAccounts(self):
 		return self.accounts
@@ -281,103 +297,88 @@ class Broker(object):
 	def getLotSize(self, bank, risk, stop_range):
 		return round(bank * (risk / 100) / stop_range, 2)
 
-	def getDbPositions(self):
-		positions = self.ctrl.redis_client.hget(self.getBrokerKey(), "positions")
-		if positions is None:
-			positions = []
+	def _migrate_legacy_trades(self):
+		''' Move positions and orders saved as JSON lists in the broker hash into their stores '''
+		self._legacy_migrated = True
+		for name in ('positions', 'orders'):
+			store = tl.TradeStore(self.ctrl.redis_client, f'{self.getBrokerKey()}:{name}')
+			count = store.migrate(self.getBrokerKey(), name)
+			if count:
+				print(f'[Broker] Migrated {count} {name} for {self.getBrokerKey()}', flush=True)
+
+	def _get_store(self, name):
+		if not self._legacy_migrated:
+			self._migrate_legacy_trades()
+
+		if self._state is not None and self._state.isOwner():
+			key = 'state:' + name
 		else:
-			positions = json.loads(positions)
-		return positions
+			key = name
+
+		store = self._stores.get(key)
+		if store is None:
+			if key == name:
+				store = tl.TradeStore(self.ctrl.redis_client, f'{self.getBrokerKey()}:{name}')
+			else:
+				store = self._state.getStore(name)
+			self._stores[key] = store
+		return store
+
+	def getDbPositions(self):
+		return self._get_store('positions').getAll()
 
 	def setDbPositions(self, positions):
-		self.ctrl.redis_client.hset(self.getBrokerKey(), "positions", json.dumps(positions))
+		self._get_store('positions').setAll(positions)
 
 	def appendDbPosition(self, new_position):
-		positions = self.getDbPositions()
-		positions.append(new_position)
-		self.setDbPositions(positions)
+		self._get_store('positions').append(new_position)
 
 	def deleteDbPosition(self, order_id):
-		positions = self.getDbPositions()
-		for i in range(len(positions)):
-			if positions[i]["order_id"] == order_id:
-				del positions[i]
-				break
-		self.setDbPositions(positions)
+		self._get_store('positions').delete(order_id)
 
 	def replaceDbPosition(self, position):
-		positions = self.getDbPositions()
-		for i in range(len(positions)):
-			if positions[i]["order_id"] == position["order_id"]:
-				positions[i] = position
-				break
-		self.setDbPositions(positions)
+		self._get_store('positions').replace(position)
 
 	def convertJSONToPositions(self, positions):
 		return [tl.Position.fromDict(self, i) for i in positions]
 
+	def getCachedPositions(self):
+		''' Position objects for per-tick checks, only rebuilt when they change '''
+		return self._get_store('positions').getCached(lambda x: tl.Position.fromDict(self, x))
+
 	def getAllPositions(self, account_id=None):
-		result = []
-		for pos in self.positions:
-			# Return specified account positions
-			if not account_id or pos["account_id"] == account_id:
-				result.append(pos)
-		return result
+		return self._get_store('positions').getAll(account_id=account_id)
 
 	def getPositionByID(self, order_id):
-		for pos in self.getDbPositions():
-			if pos["order_id"] == order_id:
-				return pos
-		return None
+		return self._get_store('positions').get(order_id)
 
 	def getDbOrders(self):
-		orders = self.ctrl.redis_client.hget(self.getBrokerKey(), "orders")
-		if orders is None:
-			orders = []
-		else:
-			orders = json.loads(orders)
-		return orders
+		return self._get_store('orders').getAll()
 
 	def setDbOrders(self, orders):
-		self.ctrl.redis_client.hset(self.getBrokerKey(), "orders", json.dumps(orders))
+		self._get_store('orders').setAll(orders)
 
 	def appendDbOrder(self, new_order):
-		orders = self.getDbOrders()
-		orders.append(new_order)
-		self.setDbOrders(orders)
+		self._get_store('orders').append(new_order)
 
 	def deleteDbOrder(self, order_id):
-		orders = self.getDbOrders()
-		for i in range(len(orders)):
-			if orders[i]["order_id"] == order_id:
-				del orders[i]
-				break
-		self.setDbOrders(orders)
+		self._get_store('orders').delete(order_id)
 
 	def replaceDbOrder(self, order):
-		orders = self.getDbOrders()
-		for i in range(len(orders)):
-			if orders[i]["order_id"] == order["order_id"]:
-				orders[i] = order
-				break
-		self.setDbOrders(orders)
+		self._get_store('orders').replace(order)
 
 	def convertJSONToOrders(self, orders):
 		return [tl.Order.fromDict(self, i) for i in orders]
 
+	def getCachedOrders(self):
+		''' Order objects for per-tick checks, only rebuilt when they change '''
+		return self._get_store('orders').getCached(lambda x: tl.Order.fromDict(self, x))
+
 	def getAllOrders(self, account_id=None):
-		result = []
-		for order in self.orders:
-			# Return specified account positions
-			if not account_id or order["account_id"] == account_id:
-				result.append(order)
-		return result
+		return self._get_store('orders').getAll(account_id=account_id)
 
 	def getOrderByID(self, order_id):
-		for order in self.getDbOrders():
-			if order["order_id"] == order_id:
-				return order
-		return None
+		return self._get_store('orders').get(order_id)
 
 	# def resetHandled(self):
 	# 	self.ctrl.redis_client.hset("handled", self.strategyId, json.dumps({}))
@@ -583,7 +584,7 @@ class Broker(object):
 					is_update = True
 
 			# Handle stream subscriptions
-			for func in self.ontrade_subs.values():
+			for func in list(self.ontrade_subs.values()):
 				func(res)
 
 			print(f'on trade: {res}')
@@ -592,7 +593,7 @@ class Broker(object):
 			# 	{ "type": "ontrade", "broker_id": self.brokerId, "message": res }, 
 			# 	zmq.NOBLOCK
 			# )
-			self.ctrl._send_queue.append(
+			self.ctrl.sendZmqMessage(
 				{ "type": "ontrade", "broker_id": self.brokerId, "message": res }
 			)
 
@@ -644,18 +645,16 @@ class Broker(object):
 				if item is not None:
 					del v['item']
 					v.update(item)
-				self.transactions.loc[k] = v
+				self.transactions.append(k, v)
 
 		if self.acceptLive:
 			Thread(target=self.saveTransactions).start()
 
 
 	def saveTransactions(self):
+		''' Write transactions buffered since the last save as new ledger segments '''
 		if tl.broker.PAPERTRADER_NAME in self.accounts:
-			transactions = self.ctrl.getDb().getStrategyTransactions(self.userAccount.userId, self.brokerId)
-			transactions = pd.concat((transactions, self.transactions))
-			self.transactions = self._create_empty_transaction_df()
-			self.ctrl.getDb().updateStrategyTransactions(self.userAccount.userId, self.brokerId, transactions)
+			self.transactions.flush()
 
 
 	def orderValidation(self, order, min_dist=0):
@@ -756,6 +755,10 @@ class Broker(object):
 	'''
 
 	def _handle_tick_checks(self, item):
+		# Paper trades are checked by the worker owning their state, take it over if free
+		if self._state is not None and not self._state.acquire(min_interval=1):
+			return
+
 		product = item['product']
 		timestamp = int(item['timestamp'])
 		# ohlc = np.array([item['item']['ask'][3]]*4 + [item['item']['bid'][3]]*4, dtype=np.float64)
@@ -171,12 +171,29 @@ class Dukascopy(Broker):
 		return result
 
 
-	def _get_all_positions(self, account_id):
-		result = self.ctrl.brokerRequest(
-			self.name, self.brokerId, '_get_all_positions',
-			account_id
-		)
-
+	def _handle_live_strategy_setup(self):
+		# Request every account's positions and all orders at once
+		accounts = [acc for acc in self.getAccounts() if acc != tl.broker.PAPERTRADER_NAME]
+		futures = [
+			self.ctrl.brokerRequestAsync(self.name, self.brokerId, '_get_all_positions', acc)
+			for acc in accounts
+		]
+		futures.append(self.ctrl.brokerRequestAsync(self.name, self.brokerId, '_get_all_orders'))
+		results = self.ctrl.gatherBrokerRequests(futures)
+
+		positions = [i for i in self.getDbPositions() if i["account_id"] == tl.broker.PAPERTRADER_NAME]
+		for acc, result in zip(accounts, results[:-1]):
+			positions += self._parse_all_positions(result)[acc]
+		self.setDbPositions(positions)
+
+		orders = [i for i in self.getDbOrders() if i["account_id"] == tl.broker.PAPERTRADER_NAME]
+		all_orders = self._parse_all_orders(results[-1])
+		for acc in accounts:
+			orders += all_orders.get(acc, [])
+		self.setDbOrders(orders)
+
+
+	def _parse_all_positions(self, result):
 		print(f'[_get_all_positions] {result}', flush=True)
 
 		for account_id in result:
@@ -186,6 +203,13 @@ class Dukascopy(Broker):
 		return result
 
 
+	def _get_all_positions(self, account_id):
+		return self._parse_all_positions(self.ctrl.brokerRequest(
+			self.name, self.brokerId, '_get_all_positions',
+			account_id
+		))
+
+
 	def createPosition(self,
 		product, lotsize, direction,
 		account_id, entry_range, entry_price,
@@ -285,11 +309,7 @@ class Dukascopy(Broker):
 		return result
 
 
-	def _get_all_orders(self, account_id):
-		result = self.ctrl.brokerRequest(
-			self.name, self.brokerId, '_get_all_orders'
-		)
-
+	def _parse_all_orders(self, result):
 		print(f'[_get_all_orders] {result}', flush=True)
 		for account_id in result:
 			for i in range(len(result[account_id])):
@@ -298,6 +318,12 @@ class Dukascopy(Broker):
 		return result
 
 
+	def _get_all_orders(self, account_id):
+		return self._parse_all_orders(self.ctrl.brokerRequest(
+			self.name, self.brokerId, '_get_all_orders'
+		))
+
+
 	def getAllAccounts(self):
 		account_res = self.ctrl.brokerRequest(
 			self.name, self.brokerId, 'getAllAccounts'
@@ -740,98 +766,7 @@ class Dukascopy(Broker):
 				bid = update.get('bid')
 				bar_end = update.get('bar_end')
 
-				for period in chart.getActivePeriods():
-					if (isinstance(chart.bid.get(period), np.ndarray) and 
-						isinstance(chart.ask.get(period), np.ndarray)):
-
-						# Handle period bar end
-						if period != tl.period.TICK:
-							is_new_bar = chart.isNewBar(period, timestamp)
-							if is_new_bar:
-								if chart.volume[period] > 0:
-									chart.volume[period] = 0
-									result.append({
-										'broker': self.name,
-										'product': chart.product,
-										'period': period,
-										'bar_end': True,
-										'timestamp': chart.lastTs[period],
-										'item': {
-											'ask': chart.ask[period].tolist(),
-											'mid': chart.mid[period].tolist(),
-											'bid': chart.bid[period].tolist()
-										}
-									})
-
-								chart.lastTs[period] = tl.getNextTimestamp(period, chart.lastTs[period], now=timestamp - tl.period.getPeriodOffsetSeconds(period))
-								print(f'[Dukascopy] ({period}) Prev: {chart.lastTs[period]}, Next: {chart.lastTs[period]}')
-								chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
-								chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
-								chart.mid[period] = np.array(
-									[np.around(
-										(chart.ask[period][3] + chart.bid[period][3])/2,
-										decimals=5
-									)]*4, 
-								dtype=np.float64)
-
-						chart.volume[period] += 1
-
-						# Ask
-						if ask is not None:
-							chart.ask[period][1] = ask if ask > chart.ask[period][1] else chart.ask[period][1]
-							chart.ask[period][2] = ask if ask < chart.ask[period][2] else chart.ask[period][2]
-							chart.ask[period][3] = ask
-
-						# Bid
-						if bid is not None:
-							chart.bid[period][1] = bid if bid > chart.bid[period][1] else chart.bid[period][1]
-							chart.bid[period][2] = bid if bid < chart.bid[period][2] else chart.bid[period][2]
-							chart.bid[period][3] = bid
-
-						# Mid
-						new_high = np.around((chart.ask[period][1] + chart.bid[period][1])/2, decimals=5)
-						new_low = np.around((chart.ask[period][2] + chart.bid[period][2])/2, decimals=5)
-						new_close = np.around((chart.ask[period][3] + chart.bid[period][3])/2, decimals=5)
-
-						chart.mid[period][1] = new_high if new_high > chart.mid[period][1] else chart.mid[period][1]
-						chart.mid[period][2] = new_low if new_low < chart.mid[period][2] else chart.mid[period][2]
-						chart.mid[period][3] = new_close
-
-						# Handle period bar info
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': False,
-							'timestamp': max(timestamp, chart.lastTs[period]),
-							'item': {
-								'ask': chart.ask[period].tolist(),
-								'mid': chart.mid[period].tolist(),
-								'bid': chart.bid[period].tolist()
-							}
-						})
-
-					elif period == tl.period.TICK:
-						if ask is not None:
-							chart.ask[period] = ask
-						if bid is not None:
-							chart.bid[period] = bid
-						if bid is not None and ask is not None:
-							chart.mid[period] = np.around((ask + bid)/2, decimals=5)
-
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': False,
-							'timestamp': timestamp,
-							'item': {
-								'ask': chart.ask[period],
-								'mid': chart.mid[period],
-								'bid': chart.bid[period]
-							}
-						})
-
+				result = chart.bars.tick(timestamp, ask, bid, skip_empty=True)
 				if len(result):
 					chart.handleTick(result)
 
@@ -174,7 +174,7 @@ class FXCM(Broker):
 		if include_current:
 			chart = self.getChart(product)
 
-			if period in chart.lastTs:
+			if chart.waitReady(period) and not np.isnan(chart.lastTs[period]):
 				timestamp = chart.lastTs[period]
 
 				if tl.convertTimeToTimestamp(end) >= timestamp:
@@ -358,140 +358,13 @@ class FXCM(Broker):
 				del self._price_queue[0]
 
 				if update_time is not None:
-					# Convert time to datetime
-					c_ts = update_time
-
-					# Iterate periods
-					for period in chart.getActivePeriods():
-						if (isinstance(chart.bid.get(period), np.ndarray) and 
-							isinstance(chart.ask.get(period), np.ndarray)):
-
-							# Handle period bar end
-							if period != tl.period.TICK:
-								is_new_bar = chart.isNewBar(period, c_ts)
-								if is_new_bar:
-									print(f'NEW BAR: {chart.volume[period]}', flush=True)
-									if chart.volume[period] > 0:
-										print(f'ADD NEW BAR 1: {period}', flush=True)
-										chart.volume[period] = 0
-										result.append({
-											'broker': self.name,
-											'product': chart.product,
-											'period': period,
-											'bar_end': True,
-											'timestamp': chart.lastTs[period],
-											'item': {
-												'ask': chart.ask[period].tolist(),
-												'mid': chart.mid[period].tolist(),
-												'bid': chart.bid[period].tolist()
-											}
-										})
-
-									chart.lastTs[period] = tl.getNextTimestamp(period, chart.lastTs[period], now=c_ts - tl.period.getPeriodOffsetSeconds(period))
-									print(f'[FXCM] ({period}) Prev: {chart.lastTs[period]}, Next: {chart.lastTs[period]}')
-									chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
-									chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
-									chart.mid[period] = np.array(
-										[np.around(
-											(chart.ask[period][3] + chart.bid[period][3])/2,
-											decimals=5
-										)]*4, 
-									dtype=np.float64)
-
-							chart.volume[period] += 1
-
-							# Ask
-							if ask is not None:
-								chart.ask[period][1] = ask if ask > chart.ask[period][1] else chart.ask[period][1]
-								chart.ask[period][2] = ask if ask < chart.ask[period][2] else chart.ask[period][2]
-								chart.ask[period][3] = ask
-
-							# Bid
-							if bid is not None:
-								chart.bid[period][1] = bid if bid > chart.bid[period][1] else chart.bid[period][1]
-								chart.bid[period][2] = bid if bid < chart.bid[period][2] else chart.bid[period][2]
-								chart.bid[period][3] = bid
-
-							# Mid
-							new_high = np.around((chart.ask[period][1] + chart.bid[period][1])/2, decimals=5)
-							new_low = np.around((chart.ask[period][2] + chart.bid[period][2])/2, decimals=5)
-							new_close = np.around((chart.ask[period][3] + chart.bid[period][3])/2, decimals=5)
-
-							chart.mid[period][1] = new_high if new_high > chart.mid[period][1] else chart.mid[period][1]
-							chart.mid[period][2] = new_low if new_low < chart.mid[period][2] else chart.mid[period][2]
-							chart.mid[period][3] = new_close
-
-							# Handle period bar info
-							result.append({
-								'broker': self.name,
-								'product': chart.product,
-								'period': period,
-								'bar_end': False,
-								'timestamp': max(c_ts, chart.lastTs[period]),
-								'item': {
-									'ask': chart.ask[period].tolist(),
-									'mid': chart.mid[period].tolist(),
-									'bid': chart.bid[period].tolist()
-								}
-							})
-
-						elif period == tl.period.TICK:
-							if ask is not None:
-								chart.ask[period] = ask
-							if bid is not None:
-								chart.bid[period] = bid
-							if bid is not None and ask is not None:
-								chart.mid[period] = np.around((ask + bid)/2, decimals=5)
-
-							result.append({
-								'broker': self.name,
-								'product': chart.product,
-								'period': period,
-								'bar_end': False,
-								'timestamp': c_ts,
-								'item': {
-									'ask': chart.ask[period],
-									'mid': chart.mid[period],
-									'bid': chart.bid[period]
-								}
-							})
-
-				if len(result):
-					chart.handleTick(result)
+					result = chart.bars.tick(update_time, ask, bid, skip_empty=True)
+					if len(result):
+						chart.handleTick(result)
 
 			else:
 				for chart in self.charts:
-					c_ts = time.time()+self.time_off-1
-					for period in chart.getActivePeriods():
-						if period != tl.period.TICK and chart.volume[period] > 0:
-							# Handle period bar end
-							is_new_bar = chart.isNewBar(period, c_ts)
-							if is_new_bar:
-								print(f'ADD NEW BAR 2: {period}', flush=True)
-								chart.volume[period] = 0
-								result.append({
-									'broker': self.name,
-									'product': chart.product,
-									'period': period,
-									'bar_end': True,
-									'timestamp': chart.lastTs[period],
-									'item': {
-										'ask': chart.ask[period].tolist(),
-										'mid': chart.mid[period].tolist(),
-										'bid': chart.bid[period].tolist()
-									}
-								})
-								chart.lastTs[period] = tl.getNextTimestamp(period, chart.lastTs[period], now=c_ts - tl.period.getPeriodOffsetSeconds(period))
-								print(f'[FXCM] ({period}) Prev: {chart.lastTs[period]}, Next: {chart.lastTs[period]}')
-								chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
-								chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
-								chart.mid[period] = np.array(
-									[np.around(
-										(chart.ask[period][3] + chart.bid[period][3])/2,
-										decimals=5
-									)]*4, 
-								dtype=np.float64)
-
+					result = chart.bars.close(time.time()+self.time_off-1)
 					if len(result):
 						chart.handleTick(result)
 
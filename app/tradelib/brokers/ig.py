@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
 import json
 import time
@@ -389,66 +389,12 @@ class IG(Broker):
 		return df
 
 	def _load_data(self, product, period, start, end):
-		frags = []
-
 		start = tl.utils.convertTimezone(start, 'UTC')
 		end = tl.utils.convertTimezone(end, 'UTC')
 
-		rounded_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-		rounded_end = end.replace(hour=0, minute=0, second=0, microsecond=0)
-
-		# Loop through each year
-		if tl.period.getPeriodOffsetSeconds(period) >= tl.period.getPeriodOffsetSeconds(tl.period.DAILY):
-			for y in range(start.year, end.year+1):
-				dt = datetime(year=y, month=1, day=1)
-				if y == start.year:
-					ts_start = tl.utils.convertTimeToTimestamp(start)
-				else:
-					ts_start = tl.utils.convertTimeToTimestamp(dt)
-
-				if y == end.year:
-					ts_end = tl.utils.convertTimeToTimestamp(start)
-				else:
-					ts_end = tl.utils.convertTimeToTimestamp(datetime(year=y+1, month=1, day=1))
-
-				df = self.ctrl.getDb().getYearlyPrices(self.name, product, period, dt)
-				if isinstance(df, pd.DataFrame):
-					# Get correct time range
-					df = df.loc[(ts_start <= df.index) & (df.index < ts_end)]
-					if df.size == 0: continue
-
-					frags.append(df)
-
-		# Loop through each day
-		else:
-			ONE_DAY = 60 * 60 * 24
-			days = math.ceil((rounded_end - rounded_start).total_seconds() / ONE_DAY)
-			for i in range(days+1):
-				dt = rounded_start + timedelta(days=i)
-				if i == 0:
-					ts_start = tl.utils.convertTimeToTimestamp(start)
-				else:
-					ts_start = tl.utils.convertTimeToTimestamp(dt)
-
-				if i == days:
-					ts_end = tl.utils.convertTimeToTimestamp(end)
-				else:
-					ts_end = tl.utils.convertTimeToTimestamp(
-						rounded_start + timedelta(days=i+1)
-					)
-
-				df = self.ctrl.getDb().getDailyPrices(self.name, product, period, dt)
-				if isinstance(df, pd.DataFrame):
-					# Get correct time range
-					t_data = df.loc[(ts_start <= df.index) & (df.index <= ts_end)]
-					if t_data.size == 0: continue
-
-					frags.append(t_data)
-
-		if len(frags):
-			# Concatenate loaded data
-			result = pd.concat(frags).sort_index()
-			return self._process_df(result)
+		df = self.ctrl.getDb().getPrices(self.name, product, period, start, end)
+		if isinstance(df, pd.DataFrame) and df.size > 0:
+			return self._process_df(df.sort_index())
 		else:
 			return self._create_empty_df()
 
@@ -466,76 +412,27 @@ class IG(Broker):
 			df.drop(df.tail(1).index, inplace=True)
 			if df.size == 0: return
 
-		if period == tl.period.DAILY:
-			prev_dates_l = self.ctrl.getDb().getPriceYearlyDateList(self.name, product, period)
-		else:
-			prev_dates_l = self.ctrl.getDb().getPriceDailyDateList(self.name, product, period)
-
-		if len(prev_dates_l):
-			last_dt = max(prev_dates_l)
-		else:
-			last_dt = start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-		# Load saved prices
-		if period == tl.period.DAILY:
-			old_df = self.ctrl.getDb().getYearlyPrices(self.name, product, period, last_dt)
-		else:
-			old_df = self.ctrl.getDb().getDailyPrices(self.name, product, period, last_dt)
-		
-		if isinstance(old_df, pd.DataFrame) and old_df.size > 0:
-			old_df_end = tl.utils.convertTimestampToTime(old_df.index.values[-1])
+		# Fill the gap since the last saved bar
+		last_ts = self.ctrl.getDb().getLastPriceTimestamp(self.name, product, period)
+		if last_ts is not None and last_ts < df.index.values[0]:
+			old_df_end = tl.utils.convertTimestampToTime(last_ts)
 	
 			# Check if missing data doesn't exceed MAX_DOWNLOAD
 			date_count = tl.utils.getDateCount(period, old_df_end, start)
-			missing_df = self._create_empty_df()
 			if date_count > 1 and date_count <= MAX_DOWNLOAD:
 				# Get missing prices
 				missing_df = self._download_historical_data(product, period, start=old_df_end, end=start, force_download=True)
-
-			# Concatenate new data with old data
-			df = pd.concat((old_df, missing_df, df)).sort_index()
-
+				df = pd.concat((missing_df, df)).sort_index()
 
 		# Process DataFrame
 		df = self._process_df(df)
-		start = tl.utils.convertTimestampToTime(df.index.values[0]).replace(hour=0, minute=0, second=0, microsecond=0)
-		end = tl.utils.convertTimestampToTime(df.index.values[-1]).replace(hour=0, minute=0, second=0, microsecond=0)
-
-		# Loop through each year
-		if tl.period.getPeriodOffsetSeconds(period) >= tl.period.getPeriodOffsetSeconds(tl.period.DAILY):
-			for y in range(start.year, end.year+1):
-				dt = datetime(year=y, month=1, day=1)
-				ts_start = tl.utils.convertTimeToTimestamp(dt)
-				ts_end = tl.utils.convertTimeToTimestamp(datetime(year=y+1, month=1, day=1))
-
-				# Get correct time range
-				t_data = df.loc[(ts_start <= df.index) & (df.index < ts_end)]
-				if t_data.size == 0: continue
-
-				# Set data types
-				t_data.index = t_data.index.map(int)
-				
-				# Upload prices
-				self.ctrl.getDb().updateYearlyPrices(self.name, product, period, dt, t_data)
+		if df.size == 0: return
 
-		# Loop through each day
-		else:
-			ONE_DAY = 60*60*24
-			days = math.ceil((end - start).total_seconds() / ONE_DAY)
-			for i in range(days+1):
-				dt = start.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=i)
-				ts_start = tl.utils.convertTimeToTimestamp(dt)
-				ts_end = tl.utils.convertTimeToTimestamp(dt + timedelta(days=1))
-
-				# Get correct time range
-				t_data = df.loc[(ts_start <= df.index) & (df.index < ts_end)]
-				if t_data.size == 0: continue
-
-				# Set data types
-				t_data.index = t_data.index.map(int)
-				
-				# Upload prices
-				self.ctrl.getDb().updateDailyPrices(self.name, product, period, dt, t_data)
+		# Set data types
+		df.index = df.index.map(int)
+
+		# Upload prices
+		self.ctrl.getDb().updatePrices(self.name, product, period, df)
 
 
 	def handle_live_data_save(self, res):
@@ -1669,85 +1566,9 @@ class IG(Broker):
 			# Get candle end
 			candle_end = values['CONS_END']
 
-			result = []
-
-			for period in chart.getActivePeriods():
-				if period == tl.period.TICK:
-					chart.ask[tl.period.TICK] = ask[3]
-					chart.bid[tl.period.TICK] = bid[3]
-					chart.mid[tl.period.TICK] = np.around((ask[3] + bid[3])/2, decimals=5)
-					result.append({
-						'broker': self.name,
-						'product': chart.product,
-						'period': tl.period.TICK,
-						'timestamp': new_ts,
-						'item': {
-							'ask': chart.ask[tl.period.TICK],
-							'mid': chart.mid[tl.period.TICK],
-							'bid': chart.bid[tl.period.TICK]
-						}
-					})
-
-				elif (isinstance(chart.bid.get(period), np.ndarray) and 
-					isinstance(chart.ask.get(period), np.ndarray)):
-					
-					# Find if new bar
-					is_new_bar = (
-						candle_end and int(candle_end) == 1 and
-						chart.isNewBar(
-							period, new_ts + tl.period.getPeriodOffsetSeconds(period)
-						)
-					)
-
-					# Ask
-					ask = np.array(ask, dtype=np.float64)
-					if chart.barReset[period]:
-						# Apply all new values on new bar
-						chart.ask[period] = ask
-					else:
-						chart.ask[period][1] = ask[1] if ask[1] > chart.ask[period][1] else chart.ask[period][1]
-						chart.ask[period][2] = ask[2] if ask[2] < chart.ask[period][2] else chart.ask[period][2]
-						chart.ask[period][3] = ask[3]
-
-					# Bid
-					bid = np.array(bid, dtype=np.float64)
-					if chart.barReset[period]:
-						# Apply all new values on new bar
-						chart.bid[period] = bid
-					else:
-						chart.bid[period][1] = bid[1] if bid[1] > chart.bid[period][1] else chart.bid[period][1]
-						chart.bid[period][2] = bid[2] if bid[2] < chart.bid[period][2] else chart.bid[period][2]
-						chart.bid[period][3] = bid[3]
-
-					# Mid
-					mid = np.around((ask + bid)/2, decimals=5)
-					if chart.barReset[period]:
-						chart.mid[period] = mid
-					else:
-						chart.mid[period][1] = mid[1] if mid[1] > chart.mid[period][1] else chart.mid[period][1]
-						chart.mid[period][2] = mid[2] if mid[2] < chart.mid[period][2] else chart.mid[period][2]
-						chart.mid[period][3] = mid[3]
-
-					if chart.barReset[period]:
-						chart.barReset[period] = False
-
-					if is_new_bar:
-						chart.lastTs[period] = new_ts
-						chart.barReset[period] = True
-
-					# Add period result
-					result.append({
-						'broker': self.name,
-						'product': chart.product,
-						'period': period,
-						'bar_end': is_new_bar,
-						'timestamp': chart.lastTs[period],
-						'item': {
-							'ask': chart.ask[period].tolist(),
-							'mid': chart.mid[period].tolist(),
-							'bid': chart.bid[period].tolist()
-						}
-					})
+			result = chart.bars.candle(
+				new_ts, ask, bid, bar_end=bool(candle_end and int(candle_end) == 1)
+			)
 
 			# Call chart tick handler
 			if len(result):
@@ -1180,99 +1180,9 @@ class Oanda(Broker):
 			if update_time is not None:
 				# Convert time to datetime
 				c_ts = tl.convertTimeToTimestamp(dateutil.parser.isoparse(update_time))
-				result = []
-				# Iterate periods
-				for period in chart.getActivePeriods():
-					if (isinstance(chart.bid.get(period), np.ndarray) and 
-						isinstance(chart.ask.get(period), np.ndarray)):
-
-						# Handle period bar end
-						if period != tl.period.TICK:
-							is_new_bar = chart.isNewBar(period, c_ts)
-							if is_new_bar:
-								bar_ts = chart.lastTs[period]
-								result.append({
-									'broker': self.name,
-									'product': chart.product,
-									'period': period,
-									'bar_end': True,
-									'timestamp': chart.lastTs[period],
-									'item': {
-										'ask': chart.ask[period].tolist(),
-										'mid': chart.mid[period].tolist(),
-										'bid': chart.bid[period].tolist()
-									}
-								})
-								chart.lastTs[period] = tl.getNextTimestamp(period, chart.lastTs[period], now=c_ts - tl.period.getPeriodOffsetSeconds(period))
-								print(f'[{period}] Prev: {bar_ts}, Next: {chart.lastTs[period]}')
-								chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
-								chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
-								chart.mid[period] = np.array(
-									[np.around(
-										(chart.ask[period][3] + chart.bid[period][3])/2,
-										decimals=5
-									)]*4, 
-								dtype=np.float64)
-
-						# Ask
-						if ask is not None:
-							chart.ask[period][1] = ask if ask > chart.ask[period][1] else chart.ask[period][1]
-							chart.ask[period][2] = ask if ask < chart.ask[period][2] else chart.ask[period][2]
-							chart.ask[period][3] = ask
-
-						# Bid
-						if bid is not None:
-							chart.bid[period][1] = bid if bid > chart.bid[period][1] else chart.bid[period][1]
-							chart.bid[period][2] = bid if bid < chart.bid[period][2] else chart.bid[period][2]
-							chart.bid[period][3] = bid
-
-						# Mid
-						if ask is not None and bid is not None:
-							new_high = np.around((chart.ask[period][1] + chart.bid[period][1])/2, decimals=5)
-							new_low = np.around((chart.ask[period][2] + chart.bid[period][2])/2, decimals=5)
-							new_close = np.around((chart.ask[period][3] + chart.bid[period][3])/2, decimals=5)
-
-							chart.mid[period][1] = new_high if new_high > chart.mid[period][1] else chart.mid[period][1]
-							chart.mid[period][2] = new_low if new_low < chart.mid[period][2] else chart.mid[period][2]
-							chart.mid[period][3] = new_close
-
-						# Handle period bar info
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': False,
-							'timestamp': c_ts,
-							'item': {
-								'ask': chart.ask[period].tolist(),
-								'mid': chart.mid[period].tolist(),
-								'bid': chart.bid[period].tolist()
-							}
-						})
-
-					elif period == tl.period.TICK:
-						if ask is not None:
-							chart.ask[period] = ask
-						if bid is not None:
-							chart.bid[period] = bid
-						if bid is not None and ask is not None:
-							chart.mid[period] = np.around((ask + bid)/2, decimals=5)
-
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': False,
-							'timestamp': c_ts,
-							'item': {
-								'ask': chart.ask[period],
-								'mid': chart.mid[period],
-								'bid': chart.bid[period]
-							}
-						})
-
-			if len(result):
-				chart.handleTick(result)
+				result = chart.bars.tick(c_ts, ask, bid)
+				if len(result):
+					chart.handleTick(result)
 
 
 	def update_positions(self):
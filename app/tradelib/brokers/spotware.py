@@ -1,6 +1,5 @@
 import time
 import traceback
-import numpy as np
 import pandas as pd
 import json
 import ntplib
@@ -759,6 +758,7 @@ class Spotware(Broker):
 
 			# Get range from current price for temp sl
 			chart = self.ctrl.brokers['fxcm'].getChart(product)
+			chart.waitReady(tl.period.ONE_MINUTE)
 			if direction == tl.LONG:
 				sl_tp_ranges['relativeStopLoss'] = int((chart.ask[tl.period.ONE_MINUTE][3] - sl_price) * 100000)
 			else:
@@ -771,6 +771,7 @@ class Spotware(Broker):
 			sl_tp_prices['takeProfit'] = tp_price
 			# Get range from current price for temp tp
 			chart = self.ctrl.brokers['fxcm'].getChart(product)
+			chart.waitReady(tl.period.ONE_MINUTE)
 			if direction == tl.LONG:
 				sl_tp_ranges['relativeTakeProfit'] = int((tp_price - chart.ask[tl.period.ONE_MINUTE][3]) * 100000)
 			else:
@@ -1584,8 +1585,6 @@ class Spotware(Broker):
 
 
 	def _handle_chart_update(self, chart, payload):
-		result = []
-
 		if 'ask' in payload:
 			ask = float(payload['ask']) / 100000
 		else:
@@ -1596,80 +1595,19 @@ class Spotware(Broker):
 		else:
 			bid = None
 
-		volume = None
-		c_ts = time.time()+self.time_off
-		# Iterate periods
-		if tl.period.TICK in chart.getActivePeriods():
-			if ask:
-				chart.ask[tl.period.TICK] = ask
-			if bid:
-				chart.bid[tl.period.TICK] = bid
-			if chart.bid[tl.period.TICK] is not None and chart.ask[tl.period.TICK] is not None:
-				chart.mid[tl.period.TICK] = np.around((chart.ask[tl.period.TICK] + chart.bid[tl.period.TICK])/2, decimals=5)
-
-			result.append({
-				'broker': self.name,
-				'product': chart.product,
-				'period': tl.period.TICK,
-				'bar_end': False,
-				'timestamp': time.time()+self.time_off,
-				'item': {
-					'ask': chart.ask[tl.period.TICK],
-					'mid': chart.mid[tl.period.TICK],
-					'bid': chart.bid[tl.period.TICK]
-				}
-			})
+		result = chart.bars.setTick(time.time()+self.time_off, ask or None, bid or None)
 
 		if 'trendbar' in payload:
 			for i in payload['trendbar']:
 				period = self._convert_sw_period(i['period'])
-				if period in chart.getActivePeriods():
-					if (isinstance(chart.bid.get(period), np.ndarray) and 
-						isinstance(chart.ask.get(period), np.ndarray)):
-
-						bar_ts = float(i['utcTimestampInMinutes'])*60
-						# Handle period bar end
-						if chart.lastTs[period] is None:
-							chart.lastTs[period] = bar_ts
-						elif bar_ts > chart.lastTs[period]:
-							result.append({
-								'broker': self.name,
-								'product': chart.product,
-								'period': period,
-								'bar_end': True,
-								'timestamp': chart.lastTs[period],
-								'item': {
-									'ask': chart.ask[period].tolist(),
-									'mid': chart.mid[period].tolist(),
-									'bid': chart.bid[period].tolist()
-								}
-							})
-
-							chart.lastTs[period] = bar_ts
-							print(f'[SW] ({period}) Next: {chart.lastTs[period]}')
-
-						new_low = float(i['low']) / 100000
-						new_open = (float(i['low']) + float(i['deltaOpen'])) / 100000
-						new_high = (float(i['low']) + float(i['deltaHigh'])) / 100000
-						new_close = chart.mid[tl.period.TICK]
-						new_ohlc = np.array([new_open, new_high, new_low, new_close], dtype=np.float64)
-
-						chart.ask[period] = new_ohlc
-						chart.mid[period] = new_ohlc
-						chart.bid[period] = new_ohlc
-
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': False,
-							'timestamp': chart.lastTs[period],
-							'item': {
-								'ask': chart.ask[period].tolist(),
-								'mid': chart.mid[period].tolist(),
-								'bid': chart.bid[period].tolist()
-							}
-						})
+				bar_ts = float(i['utcTimestampInMinutes'])*60
+				new_low = float(i['low']) / 100000
+				new_open = (float(i['low']) + float(i['deltaOpen'])) / 100000
+				new_high = (float(i['low']) + float(i['deltaHigh'])) / 100000
+				new_close = chart.mid[tl.period.TICK]
+				new_ohlc = [new_open, new_high, new_low, new_close]
+
+				result += chart.bars.setCandle(period, bar_ts, new_ohlc)
 
 		if len(result):
 			chart.handleTick(result)
@@ -1677,37 +1615,7 @@ class Spotware(Broker):
 
 	def _handle_chart_auto_bar_end(self):
 		for chart in self.charts:
-			result = []
-			c_ts = time.time()+self.time_off-1
-			for period in chart.getActivePeriods():
-				if period != tl.period.TICK and chart.volume[period] > 0:
-					# Handle period bar end
-					is_new_bar = chart.isNewBar(period, c_ts)
-					if is_new_bar:
-						chart.volume[period] = 0
-						result.append({
-							'broker': self.name,
-							'product': chart.product,
-							'period': period,
-							'bar_end': True,
-							'timestamp': chart.lastTs[period],
-							'item': {
-								'ask': chart.ask[period].tolist(),
-								'mid': chart.mid[period].tolist(),
-								'bid': chart.bid[period].tolist()
-							}
-						})
-						chart.lastTs[period] = tl.getNextTimestamp(period, chart.lastTs[period], now=c_ts - tl.period.getPeriodOffsetSeconds(period))
-						print(f'[SW] ({period}) Next: {chart.lastTs[period]}')
-						chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
-						chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
-						chart.mid[period] = np.array(
-							[np.around(
-								(chart.ask[period][3] + chart.bid[period][3])/2,
-								decimals=5
-							)]*4, 
-						dtype=np.float64)
-
+			result = chart.bars.close(time.time()+self.time_off-1)
 			if len(result):
 				chart.handleTick(result)
 
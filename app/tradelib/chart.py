@@ -3,17 +3,19 @@ import numpy as np
 import datetime
 import time
 import traceback
-import json
-import zmq
-from threading import Thread
+from threading import Lock, Event
 from app import tradelib as tl
 from copy import copy
 
+# Seconds readers wait for a period to load
+READY_TIMEOUT = 60
+
 class Chart(object):
 
 	__slots__ = (
-		'ctrl', 'broker', 'product', 'ask', 'mid', 'bid', 'volume', 'barReset',
-		'lastTs', '_subscriptions', '_unsubscriptions', '_tick_queue'
+		'ctrl', 'broker', 'product', 'bars', 'ask', 'mid', 'bid',
+		'lastTs', '_subscriptions', '_unsubscriptions', '_dispatcher', '_tick_lock',
+		'_ready', '_pending_subscriptions', '_sub_lock'
 	)
 	def __init__(self, ctrl, broker, product, await_completion=False):
 		print(f'[Chart] {broker.name} {product}')
@@ -22,15 +24,23 @@ class Chart(object):
 		self.broker = broker
 		self.product = product
 
-		self.ask = self._generate_period_dict()
-		self.mid = self._generate_period_dict()
-		self.bid = self._generate_period_dict()
-		self.volume = { period:0 for period in self._generate_period_dict() }
-		self.barReset = self._generate_period_dict()
-		self.lastTs = self._generate_period_dict()
+		self.bars = tl.LiveBars(broker.name, product, self._generate_period_dict())
+		self.ask = self.bars.ask
+		self.mid = self.bars.mid
+		self.bid = self.bars.bid
+		self.lastTs = self.bars.last_ts
 		self._subscriptions = self._generate_period_dict()
 		self._unsubscriptions = []
-		self._tick_queue = []
+		# Subscriptions made before their period has loaded
+		self._pending_subscriptions = []
+		self._sub_lock = Lock()
+		self._ready = { period: Event() for period in self._subscriptions }
+		self._ready[tl.period.TICK] = Event()
+		self._dispatcher = tl.TickDispatcher(
+			workers=ctrl.app.config.get('TICK_DISPATCH_WORKERS', 2),
+			name=f'{broker.name}-{product}'
+		)
+		self._tick_lock = Lock()
 
 		self.start(await_completion)
 
@@ -41,125 +51,89 @@ class Chart(object):
 		# Handle live connection
 		self.broker._subscribe_chart_updates(self.product, self._on_chart_update)
 
-		# Quickstart
-		self._load_current_bars([tl.period.ONE_MINUTE])
-
-		# Generate Tick
-		self.ask[tl.period.TICK] = self.ask[tl.period.ONE_MINUTE][3]
-		self.bid[tl.period.TICK] = self.bid[tl.period.ONE_MINUTE][3]
-		self.mid[tl.period.TICK] = np.around(
-			(self.ask[tl.period.TICK] + self.bid[tl.period.TICK])/2,
-			decimals=5
-		)
-		self._subscriptions[tl.period.TICK] = {}
-
-		# Finish other bars
-		if not await_completion:
-			Thread(
-				target=self._load_current_bars,
-				args=([period for period in self.ask if period != tl.period.TICK],)
-			).start()
+		if await_completion:
+			self._load()
 		else:
-			self._load_current_bars([period for period in self.ask if period != tl.period.TICK])
+			self.ctrl.charts.submitLoad(self._load)
 
 
-	def getActivePeriods(self):
-		return list(self.ask.keys())
+	def _load(self):
+		try:
+			self._load_current_bars(self.bars.periods)
+		except Exception:
+			print(traceback.format_exc(), flush=True)
 
-	
-	def getAllData(self):
-		data = self.ctrl.redis_client.hget(self.broker, self.product)
-		if data is None:
-			data = {}
-		else:
-			data = json.loads(data)
-		return data
 
+	def _set_ready(self, period):
+		''' Open `period` for ticks and replay subscriptions queued while it loaded '''
 
-	def setAllData(self, data):
-		self.ctrl.redis_client.hset(self.broker, self.product, json.dumps(data))
-		
+		with self._sub_lock:
+			if self._ready[period].is_set():
+				return
 
-	def getAsk(self, period):
-		data = self.getAllData()
-		if "asks" in data and period in data["asks"]:
-			return data["asks"][period]
-		else:
-			return None
+			self._subscriptions[period] = {}
+			pending = self._pending_subscriptions
+			self._pending_subscriptions = [i for i in pending if i[0] != period]
+			for i in pending:
+				if i[0] == period:
+					self._add_subscription(*i)
 
+			self._ready[period].set()
 
-	def setAsk(self, period, value):
-		data = self.getAllData()
-		if not "asks" in data:
-			data["asks"] = {}
-		data["asks"][period] = value
-		self.setAllData(data)
+		# Generate Tick
+		if period == tl.period.ONE_MINUTE:
+			self.ask[tl.period.TICK] = self.ask[tl.period.ONE_MINUTE][3]
+			self.bid[tl.period.TICK] = self.bid[tl.period.ONE_MINUTE][3]
+			self.mid[tl.period.TICK] = np.around(
+				(self.ask[tl.period.TICK] + self.bid[tl.period.TICK])/2,
+				decimals=5
+			)
+			self._set_ready(tl.period.TICK)
 
 
-	def getMid(self, period):
-		data = self.getAllData()
-		if "mids" in data and period in data["mids"]:
-			return data["mids"][period]
-		else:
-			return None
+	def isReady(self, period=None):
+		''' Whether `period` has loaded, or every period if None '''
 
-	
-	def setMid(self, period, value):
-		data = self.getAllData()
-		if not "mids" in data:
-			data["mids"] = {}
-		data["mids"][period] = value
-		self.setAllData(data)
-
-
-	def getBid(self, period):
-		data = self.getAllData()
-		if "bids" in data and period in data["bids"]:
-			return data["bids"][period]
-		else:
-			return None
+		if period is None:
+			return all(event.is_set() for event in self._ready.values())
+		return period in self._ready and self._ready[period].is_set()
 
-	
-	def setBid(self, period, value):
-		data = self.getAllData()
-		if not "bids" in data:
-			data["bids"] = {}
-		data["bids"][period] = value
-		self.setAllData(data)
-
-
-	def getVolume(self, period):
-		data = self.getAllData()
-		if "volume" in data and period in data["volume"]:
-			return data["volume"][period]
-		else:
-			return None
 
-	
-	def setVolume(self, period, value):
-		data = self.getAllData()
-		if not "volume" in data:
-			data["volume"] = {}
-		data["volume"][period] = value
-		self.setAllData(data)
-
-
-	def getLastTs(self, period):
-		data = self.getAllData()
-		if "last_ts" in data and period in data["last_ts"]:
-			return data["last_ts"][period]
+	def waitReady(self, period=None, timeout=READY_TIMEOUT):
+		'''Block until `period` has loaded, or every period if None.
+
+		Returns:
+			False if `timeout` seconds passed first.
+		'''
+
+		if period is None:
+			events = list(self._ready.values())
+		elif period in self._ready:
+			events = [self._ready[period]]
 		else:
-			return None
+			return False
+
+		end = None if timeout is None else time.time() + timeout
+		for event in events:
+			if not event.wait(None if end is None else max(end - time.time(), 0)):
+				return False
+		return True
+
+
+	def getLoadProgress(self):
+		loaded = [period for period, event in self._ready.items() if event.is_set()]
+		return {
+			'loaded': loaded,
+			'pending': [period for period in self._ready if period not in loaded],
+			'progress': len(loaded) / len(self._ready),
+			'queued_subscriptions': len(self._pending_subscriptions)
+		}
 
-	
-	def setLastTs(self, period, value):
-		data = self.getAllData()
-		if not "last_ts" in data:
-			data["last_ts"] = {}
-		data["last_ts"][period] = value
-		self.setAllData(data)
 
+	def getActivePeriods(self):
+		return list(self.ask.keys())
 
+	
 	def _generate_period_dict(self):
 		PERIODS = [
 			tl.period.ONE_MINUTE,
@@ -177,44 +151,107 @@ class Chart(object):
 
 	def _load_current_bars(self, periods):
 		print(f'[_load_current_bars] {periods}')
-		# Use _load_data to load current bar
+
+		try:
+			self._derive_current_bars(periods)
+		except Exception:
+			print(traceback.format_exc(), flush=True)
+
+		# Use _load_data to load any current bar left over
 		for period in periods:
+			if self.isReady(period):
+				continue
+
 			df = self._load_data(period, count=2, force_download=True)
 			if df.size > 0:
-				if not self.lastTs.get(period):
-					self.lastTs[period] = int(df.index.values[-1])
-					self.barReset[period] = False
-					self.ask[period] = df.values[-1][:4]
-					self.mid[period] = df.values[-1][4:8]
-					self.bid[period] = df.values[-1][8:]
-
-					self._subscriptions[period] = {}
+				self._set_current_bar(period, int(df.index.values[-1]), df.values[-1])
 
 				if period == tl.period.ONE_MINUTE:
 					self.broker.save_data(df.iloc[:1], self.product, period)
 			else:
 				if not self.lastTs.get(period):
 					self.lastTs[period] = np.nan
-					self.barReset[period] = False
 					self.ask[period] = [np.nan]*4
 					self.mid[period] = [np.nan]*4
 					self.bid[period] = [np.nan]*4
 
-					self._subscriptions[period] = {}
+					self._set_ready(period)
 					
 
+	def _derive_current_bars(self, periods):
+		'''Build current bars locally from recent M1 and daily prices.
+
+		Every period up to daily is resampled from one download of the current
+		day's M1 bars and the weekly bar from this week's daily bars, instead of
+		downloading each period's bar separately.
+		'''
+
+		calendar = tl.utils.getTradingCalendar()
+		now = time.time()
+		week_start = calendar.getPrevWeekstart(now)
+		last_ts = min(now, calendar.getWeekend(week_start) - 1)
+		day_off = tl.period.getPeriodOffsetSeconds(tl.period.DAILY)
+
+		intraday = [
+			period for period in periods
+			if tl.period.getPeriodOffsetSeconds(period) <= day_off
+		]
+		if len(intraday):
+			day_start = calendar.getBarStarts(tl.period.DAILY, week_start, last_ts)[-1]
+			df = self._load_data(
+				tl.period.ONE_MINUTE,
+				start=tl.convertTimestampToTime(day_start),
+				end=tl.convertTimestampToTime(now),
+				force_download=True
+			)
+			df = df.loc[df.index >= day_start]
+			if df.size > 0:
+				timestamps = df.index.values.astype(np.float64)
+				for period in intraday:
+					if period == tl.period.ONE_MINUTE:
+						self._set_current_bar(period, int(timestamps[-1]), df.values[-1])
+						if df.shape[0] > 1:
+							self.broker.save_data(df.iloc[-2:-1], self.product, period)
+					else:
+						bar_ts, bars = tl.resampler.constructBars(
+							period, timestamps, df.values,
+							starts=calendar.getBarStarts(period, day_start, timestamps[-1])
+						)
+						self._set_current_bar(period, int(bar_ts[-1]), bars[-1])
+
+		if tl.period.WEEKLY in periods:
+			df = self._load_data(
+				tl.period.DAILY,
+				start=tl.convertTimestampToTime(week_start),
+				end=tl.convertTimestampToTime(now),
+				force_download=True
+			)
+			df = df.loc[df.index >= week_start]
+			if df.size > 0:
+				bar_ts, bars = tl.resampler.constructBars(
+					tl.period.WEEKLY, df.index.values.astype(np.float64), df.values,
+					starts=np.array([week_start])
+				)
+				self._set_current_bar(tl.period.WEEKLY, int(bar_ts[-1]), bars[-1])
+
+
+	def _set_current_bar(self, period, ts, values):
+		if not self.lastTs.get(period):
+			self.bars.setBar(period, ts, values[:4], values[4:8], values[8:])
+			self._set_ready(period)
+
+
 	def _load_data(self, period, start=None, end=None, count=None, force_download=False):
 		print(f'[_load_data] {period}, {start}, {end}, {count}')
 		if self.broker.name == 'fxcm':
-			df = self.broker._download_historical_data_broker(
-				self.product, period, start=start, end=end,
-				count=count, force_download=force_download
-			)
+			download = self.broker._download_historical_data_broker
 		else:
-			df = self.broker._download_historical_data(
-				self.product, period, start=start, end=end,
-				count=count, force_download=force_download
-			)
+			download = self.broker._download_historical_data
+
+		df = self.ctrl.price_cache.get(
+			self.broker.name, self.product, period, download,
+			start=start, end=end, count=count, force_download=force_download
+		)
 		df = df[~df.index.duplicated(keep='first')]
 		return df
 
@@ -249,16 +286,10 @@ class Chart(object):
 
 
 	def handleTick(self, result):
-		queue_id = self.broker.generateReference()
-		self._tick_queue.append(queue_id)
-		queue_idx = self._tick_queue.index(queue_id)
-		while queue_idx != 0:
-			queue_idx = self._tick_queue.index(queue_id)
-			time.sleep(0.01)
-
+		self._tick_lock.acquire()
 		try:
 			if self.ctrl.connection_id == 0:
-				self.ctrl.zmq_dealer_socket.send_json(
+				self.ctrl.sendZmqMessage(
 					{ 
 						"type": "ontick", 
 						"message": {
@@ -267,30 +298,26 @@ class Chart(object):
 							'period': 'all',
 							'items': result
 						}
-					},
-					zmq.NOBLOCK
+					}
 				)
 
-				self.ctrl.emit(
-					'ontick', 
-					{
-						'broker': self.broker.name,
-						'product': self.product,
-						'period': 'all',
-						'items': result
-					}, 
-					namespace='/admin'
-				)
+				self.ctrl.tick_broadcaster.update(result)
 
 			for res in result:
 				period = res.get('period')
 
+				# Completed bars replace the cached tail
+				if res.get('bar_end'):
+					self.ctrl.price_cache.invalidate(
+						self.broker.name, self.product, period, res['timestamp']
+					)
+
 				if self._subscriptions.get(period) is not None:
 					for s in copy(list(self._subscriptions[period].keys())):
 						try:
 							for sub_id in copy(self._subscriptions[period][s]):
 								func = self._subscriptions[period][s][sub_id]
-								Thread(target=func, args=(res,)).start()
+								self._dispatcher.dispatch((period, s, sub_id), func, res)
 						except Exception as e:
 							pass
 				
@@ -302,25 +329,15 @@ class Chart(object):
 				# 	zmq.NOBLOCK
 				# )
 
-				if self.ctrl.connection_id == 0:
-					self.ctrl.emit(
-						'ontick', res, 
-						namespace='/admin'
-					)
-
 		except Exception:
 			print(traceback.format_exc(), flush=True)
 
 		finally:
-			del self._tick_queue[queue_idx]
+			self._tick_lock.release()
 
 
 	def getNextTimestamp(self, period, ts):
-		new_ts = ts + tl.period.getPeriodOffsetSeconds(period)
-		dt = tl.convertTimestampToTime(new_ts)
-		if tl.isWeekend(dt):
-			new_ts = tl.convertTimeToTimestamp(tl.getWeekstartDate(dt))
-		return new_ts
+		return tl.utils.getTradingCalendar().getNextTimestamp(period, ts)
 
 
 	def isNewBar(self, period, ts):
@@ -333,31 +350,47 @@ class Chart(object):
 
 
 	def getLatestTimestamp(self, period):
+		self.waitReady(period)
 		return self.lastTs[period]
 
 
 	def getLatestAsk(self, period):
+		self.waitReady(period)
 		# return self.ask[period]
 		return self.mid[period]
 
 
 	def getLatestBid(self, period):
+		self.waitReady(period)
 		# return self.bid[period]
 		return self.mid[period]
 
 
 	def subscribe(self, period, strategy_id, sub_id, func):
-		# Wait for chart to initialize
-		while not isinstance(self._subscriptions.get(period), dict):
-			pass
+		'''Subscribe `func` to `period` ticks.
+
+		Subscriptions made before `period` has loaded are queued and added once
+		it is live, so this never blocks.
+		'''
+
+		if period not in self._ready:
+			return False
 
+		with self._sub_lock:
+			if self._ready[period].is_set():
+				self._add_subscription(period, strategy_id, sub_id, func)
+			else:
+				self._pending_subscriptions.append((period, strategy_id, sub_id, func))
+
+		return True
+
+
+	def _add_subscription(self, period, strategy_id, sub_id, func):
 		if not self._subscriptions[period].get(strategy_id):
 			self._subscriptions[period][strategy_id] = {sub_id: func}
 		else:
 			self._subscriptions[period][strategy_id][sub_id] = func
 
-		return True
-
 
 	def unsubscribe(self, period, strategy_id, sub_id):
 		self._unsubscriptions.append((period, strategy_id, sub_id))
@@ -366,15 +399,23 @@ class Chart(object):
 	def handle_unsubscriptions(self):
 		for i in range(len(self._unsubscriptions)-1,-1,-1):
 			unsub = self._unsubscriptions[i]
-			try:
-				sub = self._subscriptions[unsub[0]][unsub[1]]
-				if unsub[2] in sub:
-					del sub[unsub[2]]
-			except ValueError:
-				pass
+			with self._sub_lock:
+				self._pending_subscriptions = [
+					j for j in self._pending_subscriptions if j[:3] != unsub
+				]
+				try:
+					sub = self._subscriptions[unsub[0]][unsub[1]]
+					if unsub[2] in sub:
+						del sub[unsub[2]]
+				except (KeyError, TypeError):
+					pass
 			del self._unsubscriptions[i]
 
 
+	def getDispatchStats(self):
+		return self._dispatcher.getStats()
+
+
 	def isChart(self, broker, product):
 		return (
 			broker.name == self.broker.name and
@@ -2,12 +2,14 @@ import os
 import pandas as pd
 import numpy as np
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from app import tradelib as tl
 from app import ROOT_DIR
 from threading import Thread
 
 SAVE_DELAY = 60 * 60
+# Room for a day of M1 bars before a save is forced
+BAR_CAPACITY = 60 * 24
 
 class DataSaver(object):
 
@@ -16,6 +18,7 @@ class DataSaver(object):
 		self.data = {}
 		self._price_queue = []
 		self._save_periods = [tl.period.ONE_MINUTE]
+		self.store = tl.PriceStore(self.broker.name)
 
 		self.timer = time.time()
 		# t = Thread(target=self._handle_price_data)
@@ -27,6 +30,11 @@ class DataSaver(object):
 			if not os.path.exists(os.path.join(ROOT_DIR, f'data/{self.broker.name}/{chart.product}/{period}')):
 				os.makedirs(os.path.join(ROOT_DIR, f'data/{self.broker.name}/{chart.product}/{period}'))
 
+			# Convert any legacy daily CSV files and repair/re-index saved months,
+			# writes made meanwhile wait on the store lock
+			if self.broker.ctrl.connection_id == 0:
+				Thread(target=self.store.compact, args=(chart.product, period)).start()
+
 
 	def _create_empty_df(self, period):
 		if period == tl.period.TICK:
@@ -40,6 +48,14 @@ class DataSaver(object):
 			], dtype=float).set_index('timestamp')
 
 
+	def _create_bars(self, period):
+		''' Live bars held in memory between saves '''
+		if period == tl.period.TICK:
+			return tl.BarSeries(capacity=BAR_CAPACITY, columns=['ask', 'bid'])
+		else:
+			return tl.BarSeries(capacity=BAR_CAPACITY)
+
+
 	def subscribe(self, chart, periods):
 		# Subscribe to live updates
 		if not chart.product in self.data:
@@ -47,7 +63,7 @@ class DataSaver(object):
 
 		for period in periods:
 			self._init_data_csv(chart, period)
-			self.data[chart.product][period] = self._create_empty_df(period)
+			self.data[chart.product][period] = self._create_bars(period)
 			sub_id = self.broker.generateReference()
 			chart.subscribe(period, self.broker.brokerId, sub_id, self._handle_price_data)
 
@@ -61,45 +77,18 @@ class DataSaver(object):
 		else:
 			load_period = tl.period.TICK
 
-		frags = []
-		c_dt = start.replace(hour=0, minute=0, second=0, microsecond=0)
-		while c_dt < end + timedelta(days=1):
-			path = os.path.join(ROOT_DIR, f'data/{self.broker.name}/{product}/{load_period}/{c_dt.strftime("%Y%m%d")}.csv.gz')
-
-			if os.path.exists(path):
-				if period == tl.period.TICK:
-					old_data = pd.read_csv(
-						path, sep=',', 
-						names=['timestamp', 'ask', 'bid'], 
-						index_col='timestamp', compression='gzip',
-						dtype=float
-					).round(decimals=5)
-				else:
-					old_data = pd.read_csv(
-						path, sep=',', 
-						names=[
-							'timestamp', 
-							'ask_open', 'ask_high', 'ask_low', 'ask_close',
-							'mid_open', 'mid_high', 'mid_low', 'mid_close',
-							'bid_open', 'bid_high', 'bid_low', 'bid_close'
-						], 
-						index_col='timestamp', compression='gzip',
-						dtype=float
-					).round(decimals=5)
-
-				frags.append(old_data.loc[
-					(old_data.index >= tl.convertTimeToTimestamp(start)) & 
-					(old_data.index < tl.convertTimeToTimestamp(end))
-				])
-
-			c_dt += timedelta(days=1)
+		frags = [self.store.read(
+			product, load_period,
+			start_ts=tl.convertTimeToTimestamp(start),
+			end_ts=tl.convertTimeToTimestamp(end)
+		)]
 
 		# Add any current relevant memory data
 		if product in self.data and load_period in self.data[product]:
-			frags.append(self.data[product][load_period].loc[
-				(self.data[product][load_period].index >= tl.convertTimeToTimestamp(start)) & 
-				(self.data[product][load_period].index < tl.convertTimeToTimestamp(end))
-			])
+			frags.append(self.data[product][load_period].toDataFrame(
+				start_ts=tl.convertTimeToTimestamp(start),
+				end_ts=tl.convertTimeToTimestamp(end)
+			))
 
 		if len(frags):
 			result = pd.concat(frags)
@@ -150,63 +139,70 @@ class DataSaver(object):
 			]
 		).set_index('timestamp')
 
-		c_dt = datetime.utcnow()
-		temp_data = pd.DataFrame(
-			columns=[
-				'timestamp',
-				'ask_open', 'ask_high', 'ask_low', 'ask_close',
-				'mid_open', 'mid_high', 'mid_low', 'mid_close',
-				'bid_open', 'bid_high', 'bid_low', 'bid_close'
-			]
-		).set_index('timestamp')
-
 		print(f'COUNT: {product}, {period}, {count}')
-		while result.shape[0] < count:
-			path = os.path.join(ROOT_DIR, f'data/{self.broker.name}/{product}/{load_period}/{c_dt.strftime("%Y%m%d")}.csv.gz')
-
-			if os.path.exists(path):
+		calendar = tl.utils.getTradingCalendar()
+		months = self.store.getMonths(product, load_period)
+		end_ts = self.store.getLastTimestamp(product, load_period)
+
+		if period in (tl.period.TICK, tl.period.ONE_MINUTE):
+			frags = [result]
+			size = 0
+			while size < count and len(months) and end_ts is not None:
 				if period == tl.period.TICK:
-					old_data = pd.read_csv(
-						path, sep=',', 
-						names=['timestamp', 'ask', 'bid'], 
-						index_col='timestamp', compression='gzip',
-						dtype=float
-					).round(decimals=5)
+					start_month = months[-1]
 				else:
-					temp_data = pd.concat((
-						pd.read_csv(
-							path, sep=',', 
-							names=[
-								'timestamp', 
-								'ask_open', 'ask_high', 'ask_low', 'ask_close',
-								'mid_open', 'mid_high', 'mid_low', 'mid_close',
-								'bid_open', 'bid_high', 'bid_low', 'bid_close'
-							], 
-							index_col='timestamp', compression='gzip',
-							dtype=float
-						).round(decimals=5),
-						temp_data
-					))
-
-				# construction_data = pd.concat((
-				# 	temp_data, pd.DataFrame(
-				# 		index=temp_data.index, 
-				# 		columns=['mid_open', 'mid_high', 'mid_low', 'mid_close'],
-				# 		data=np.around((temp_data.values[:, :4] + temp_data.values[:, 4:])/2, decimals=5),
-				# 		dtype=float
-				# 	)
-				# ), axis=1)[[
-				# 	'ask_open', 'ask_high', 'ask_low', 'ask_close',
-				# 	'mid_open', 'mid_high', 'mid_low', 'mid_close',
-				# 	'bid_open', 'bid_high', 'bid_low', 'bid_close'
-				# ]]
-
-				complete_data = self._construct_bars(period, temp_data)
-				result = pd.concat((complete_data, result))
-				if complete_data.size > 0:
-					temp_data = temp_data.loc[temp_data.index < complete_data.index.values[0]]
-
-			c_dt -= timedelta(days=1)
+					start_month = min(
+						self.store.getMonth(calendar.getCountTimestamp(period, count - size, end_ts)),
+						months[-1]
+					)
+
+				batch = []
+				while len(months) and months[-1] >= start_month:
+					batch.insert(0, months.pop())
+
+				data = self.store.read(product, load_period, months=batch)
+				if data.shape[0] > 0:
+					end_ts = int(data.index.values[0])
+					frags.insert(1, data)
+					size += data.shape[0]
+
+			result = pd.concat(frags)
+			return result.iloc[-count:]
+
+		# M1 rows of every month read so far, resampled together so bars spanning
+		# a month boundary stay whole and keep the calendar's week anchoring
+		rows = []
+		first_ts = end_ts
+		remaining = count
+		while len(months) and first_ts is not None:
+			# Estimate the months holding the remaining bars from the trading calendar
+			start_month = min(
+				self.store.getMonth(calendar.getCountTimestamp(period, remaining, first_ts)),
+				months[-1]
+			)
+
+			batch = []
+			while len(months) and months[-1] >= start_month:
+				batch.insert(0, months.pop())
+
+			rows.insert(0, self.store.readMonths(product, load_period, batch)[0])
+			m1 = np.concatenate(rows)
+			if m1.shape[0] == 0:
+				continue
+
+			timestamps = m1['timestamp'].astype(float)
+			result = tl.resampler.toDataFrame(*tl.resampler.constructBars(
+				period, timestamps, np.ascontiguousarray(m1['prices']),
+				starts=calendar.getBarStarts(
+					period, calendar.getPrevWeekstart(timestamps[0]), timestamps[-1]
+				)
+			))
+
+			# The oldest bar may be missing rows from before the months read
+			if result.shape[0] > count:
+				break
+			first_ts = int(result.index.values[0])
+			remaining = count - result.shape[0] + 1
 
 		return result.iloc[-count:]
 
@@ -255,16 +251,8 @@ class DataSaver(object):
 		# else:
 		if item['period'] == tl.period.ONE_MINUTE:
 			if item['bar_end']:
-				self.data[item['product']][item['period']] = data.append(pd.DataFrame(
-					index=pd.Index(data=[item['timestamp']], name='timestamp'),
-					columns=[
-						'ask_open', 'ask_high', 'ask_low', 'ask_close',
-						'mid_open', 'mid_high', 'mid_low', 'mid_close',
-						'bid_open', 'bid_high', 'bid_low', 'bid_close'
-					],
-					data=[np.concatenate(
-						(item['item']['ask'], item['item']['mid'], item['item']['bid'])
-					)]
+				data.append(item['timestamp'], np.concatenate(
+					(item['item']['ask'], item['item']['mid'], item['item']['bid'])
 				))
 
 			# elif self.data[item['product']][item['period']].shape[0] == 0:
@@ -286,12 +274,13 @@ class DataSaver(object):
 			# 		(item['item']['ask'], item['item']['bid'])
 			# 	)
 
-			if time.time() - self.timer >= SAVE_DELAY:
+			if time.time() - self.timer >= SAVE_DELAY or data.isFull():
 				self.timer = time.time()
-				# Reset DF
-				self.data[item['product']][item['period']] = self._create_empty_df(item['period'])
+				# Export and reset bars
+				df = data.toDataFrame()
+				data.clear()
 				# Save Data
-				self._save_data(item['product'], item['period'], data.copy())
+				self._save_data(item['product'], item['period'], df)
 
 		# 	if item['bar_end']:
 		# 		data.loc[item['timestamp']] = np.concatenate(
@@ -366,13 +355,10 @@ class DataSaver(object):
 
 	def _remove_weekend_data(self, df):
 		if df.size > 0:
-			ts = df.index.values[0] - timedelta(days=7).total_seconds()
-			while ts < df.index.values[-1]:
-				weekend_start = tl.utils.getWeekstartDate(datetime.utcfromtimestamp(ts))
-				weekend_end = tl.utils.getWeekendDate(datetime.utcfromtimestamp(ts))
-
-				df = df.loc[(df.index < tl.convertTimeToTimestamp(weekend_end)) | (df.index > tl.convertTimeToTimestamp(weekend_start))]
-				ts += timedelta(days=7).total_seconds()
+			is_weekend = tl.utils.getTradingCalendar().isWeekend(
+				df.index.values, include_bounds=True
+			)
+			df = df.loc[~is_weekend]
 
 		return df
 
@@ -380,69 +366,27 @@ class DataSaver(object):
 	def _construct_bars(self, period, data, smooth=True):
 		''' Construct other period bars from appropriate saved data '''
 		if data.size > 0 and period != tl.period.ONE_MINUTE:
-			first_data_ts = tl.convertTimeToTimestamp(datetime.utcfromtimestamp(data.index.values[0]).replace(
-				hour=0, minute=0, second=0, microsecond=0
-			))
-			first_ts = data.index.values[0] - ((data.index.values[0] - first_data_ts) % tl.period.getPeriodOffsetSeconds(period))
-			next_ts = tl.utils.getNextTimestamp(period, first_ts, now=data.index.values[0])
-			data = data.loc[data.index >= first_ts]
-			timestamps = np.zeros((data.shape[0],), dtype=float)
-			result = np.zeros(data.shape, dtype=float)
-
-			idx = 0
-			passed_count = 1
-			for i in range(1, data.shape[0]+1):
-				# idx = indicies[i]
-				# passed_count = indicies[i] - indicies[i-1]
-				if i == data.shape[0]:
-					ts = tl.utils.getNextTimestamp(period, data.index.values[i-1], now=data.index.values[i-1])
-				else:
-					ts = data.index.values[i]
-
-				if ts >= next_ts:
-					timestamps[idx] = next_ts - tl.period.getPeriodOffsetSeconds(period)
-					next_ts = tl.utils.getNextTimestamp(period, next_ts, now=ts)
-
-					if i - passed_count == 0:
-						result[idx] = [
-							data.values[i-passed_count, 0], np.amax(data.values[i-passed_count:i, 1]), 
-							np.amin(data.values[i-passed_count:i, 2]), data.values[i-1, 3],
-							data.values[i-passed_count, 4], np.amax(data.values[i-passed_count:i, 5]), 
-							np.amin(data.values[i-passed_count:i, 6]), data.values[i-1, 7],
-							data.values[i-passed_count, 8], np.amax(data.values[i-passed_count:i, 9]), 
-							np.amin(data.values[i-passed_count:i, 10]), data.values[i-1, 11]
-						]
-					else:
-						result[idx] = [
-							data.values[i-passed_count-1, 3], np.amax(data.values[i-passed_count:i, 1]), 
-							np.amin(data.values[i-passed_count:i, 2]), data.values[i-1, 3],
-							data.values[i-passed_count-1, 7], np.amax(data.values[i-passed_count:i, 5]), 
-							np.amin(data.values[i-passed_count:i, 6]), data.values[i-1, 7],
-							data.values[i-passed_count-1, 11], np.amax(data.values[i-passed_count:i, 9]), 
-							np.amin(data.values[i-passed_count:i, 10]), data.values[i-1, 11]
-						]
-
-					idx += 1
-					passed_count = 1
-				else:
-					passed_count += 1
+			timestamps, result = tl.resampler.constructBars(
+				period, data.index.values, data.values
+			)
+			return tl.resampler.toDataFrame(timestamps, result)
 
+		else:
+			return data
 
-			timestamps = timestamps[:idx]
-			result = result[:idx]
 
-			return pd.DataFrame(
-				index=pd.Index(data=timestamps, name='timestamp'),
-				data=result, 
-				columns=[ 
-					'ask_open', 'ask_high', 'ask_low', 'ask_close',
-					'mid_open', 'mid_high', 'mid_low', 'mid_close',
-					'bid_open', 'bid_high', 'bid_low', 'bid_close'
-				]
-			)
+	def constructAllBars(self, periods, data):
+		''' Construct every period in `periods` from the same M1 data '''
+		if data.size > 0:
+			return {
+				period: tl.resampler.toDataFrame(*bars)
+				for period, bars in tl.resampler.constructAllBars(
+					periods, data.index.values, data.values
+				).items()
+			}
 
 		else:
-			return data
+			return { period: data for period in periods }
 
 
 	def fill_all_missing_data(self):
@@ -454,40 +398,15 @@ class DataSaver(object):
 	def _fill_missing_data(self, product, period):
 		''' Fill any data that was missed '''
 
-		# Retrieve saved data
-		path = os.path.join(ROOT_DIR, f'data/{self.broker.name}/{product}/{period}')
-
-		if len(os.listdir(path)) > 0:
-			# Get last saved file
-			last_file = sorted(
-				os.listdir(path), 
-				key=lambda x: datetime.strptime(x.replace('.csv.gz', ''), '%Y%m%d'), 
-				reverse=True
-			)[0]
-
-			# Get last saved timestamp
-			if period == tl.period.TICK:
-				old_data = pd.read_csv(
-					os.path.join(path, last_file), sep=',', 
-					names=['timestamp', 'ask', 'bid'], 
-					compression='gzip'
-				).set_index('timestamp')
-				last_ts = old_data.index.values[-1]
-			else:
-				old_data = pd.read_csv(
-					os.path.join(path, last_file), sep=',', 
-					names=[
-						'timestamp', 
-						'ask_open', 'ask_high', 'ask_low', 'ask_close',
-						'mid_open', 'mid_high', 'mid_low', 'mid_close',
-						'bid_open', 'bid_high', 'bid_low', 'bid_close'
-					], 
-					compression='gzip'
-				).set_index('timestamp')
-				last_ts = old_data.index.values[-1]
+		# Get last saved timestamp
+		last_ts = self.store.getLastTimestamp(product, period)
 
+		if last_ts is not None:
 			# Retrieve new data
-			current_ts = self.broker.getChart(product).lastTs[period]
+			chart = self.broker.getChart(product)
+			if not chart.waitReady(period):
+				return
+			current_ts = chart.lastTs[period]
 
 			data = self.broker._download_historical_data_broker(
 				product, period,
@@ -499,8 +418,7 @@ class DataSaver(object):
 			if data.shape[0] > 0:
 				# Delete duplicate memory data
 				if product in self.data and period in self.data[product]:
-					mem_data = self.data[product][period]
-					self.data[product][period] = mem_data.loc[mem_data.index > data.index.values[-1]]
+					self.data[product][period].discard(data.index.values[-1])
 
 				# Save new data
 				self._save_data(
@@ -511,26 +429,8 @@ class DataSaver(object):
 	def _save_data(self, product, period, data):
 		''' Save data to storage '''
 		if data.size > 0 and self.broker.ctrl.connection_id == 0:
-			start_ts = data.index.values[0]
-			start_dt = tl.convertTimestampToTime(start_ts)
-			end_ts = data.index.values[-1]
-			end_dt = tl.convertTimestampToTime(end_ts)
-
 			if period in (tl.period.TICK, tl.period.ONE_MINUTE):
-				c_dt = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-				while c_dt < end_dt + timedelta(days=1):
-					path = os.path.join(ROOT_DIR, f'data/{self.broker.name}/{product}/{period}/{c_dt.strftime("%Y%m%d")}.csv.gz')
-
-					# Append data to existing file
-					c_data = data.loc[
-						(data.index >= tl.convertTimeToTimestamp(c_dt)) & 
-						(data.index < tl.convertTimeToTimestamp(c_dt + timedelta(days=1)))
-					]
-					if c_data.shape[0] > 0:
-						c_data.to_csv(path, sep=',', mode='a', header=False, compression='gzip')
-
-					c_dt += timedelta(days=1)
-
+				self.store.write(product, period, data)
 
 			elif period in (tl.period.ONE_HOUR, tl.period.DAILY):
 				pass
@@ -0,0 +1,112 @@
+import time
+import traceback
+from collections import deque
+from queue import Queue
+from threading import Thread, Lock
+
+class TickDispatcher(object):
+	'''Delivers chart ticks to subscriber callbacks on a fixed pool of worker threads.
+
+	Each subscriber has its own mailbox. A subscriber is queued for the workers at
+	most once at a time, so its ticks are delivered in order and never
+	concurrently. While a subscriber is behind, a new tick replaces its
+	pending tick unless either one ends a bar, so completed bars are
+	always delivered.
+	'''
+
+	def __init__(self, workers=2, name='dispatcher'):
+		self.name = name
+
+		# Maps subscriber key to [func, pending items]
+		self._mailboxes = {}
+		self._ready = Queue()
+		self._lock = Lock()
+
+		self.pending = 0
+		self.max_pending = 0
+		self.dispatched = 0
+		self.delivered = 0
+		self.coalesced = 0
+		self.errors = 0
+		self.latency_total = 0.0
+		self.latency_max = 0.0
+
+		self._workers = [
+			Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+			for i in range(workers)
+		]
+		for t in self._workers:
+			t.start()
+
+
+	def dispatch(self, key, func, item):
+		''' Queue `item` for the subscriber `key`, calling `func` with it on a worker '''
+
+		now = time.time()
+		with self._lock:
+			self.dispatched += 1
+			mailbox = self._mailboxes.get(key)
+			if mailbox is None:
+				self._mailboxes[key] = [func, deque([(item, now)])]
+				self.pending += 1
+				self.max_pending = max(self.max_pending, self.pending)
+				self._ready.put(key)
+				return
+
+			mailbox[0] = func
+			pending = mailbox[1]
+			if len(pending) and not pending[-1][0].get('bar_end') and not item.get('bar_end'):
+				# Keep the enqueue time of the tick being replaced
+				pending[-1] = (item, pending[-1][1])
+				self.coalesced += 1
+			else:
+				pending.append((item, now))
+				self.pending += 1
+				self.max_pending = max(self.max_pending, self.pending)
+
+
+	def _run(self):
+		while True:
+			key = self._ready.get()
+			with self._lock:
+				func, pending = self._mailboxes[key]
+				items = list(pending)
+				pending.clear()
+				self.pending -= len(items)
+
+			for item, ts in items:
+				latency = time.time() - ts
+				failed = False
+				try:
+					func(item)
+				except Exception:
+					failed = True
+					print(traceback.format_exc(), flush=True)
+
+				with self._lock:
+					self.errors += failed
+					self.delivered += 1
+					self.latency_total += latency
+					self.latency_max = max(self.latency_max, latency)
+
+			with self._lock:
+				if len(pending):
+					self._ready.put(key)
+				else:
+					del self._mailboxes[key]
+
+
+	def getStats(self):
+		with self._lock:
+			return {
+				'workers': len(self._workers),
+				'subscribers': len(self._mailboxes),
+				'pending': self.pending,
+				'max_pending': self.max_pending,
+				'dispatched': self.dispatched,
+				'delivered': self.delivered,
+				'coalesced': self.coalesced,
+				'errors': self.errors,
+				'latency_avg': self.latency_total / self.delivered if self.delivered else 0.0,
+				'latency_max': self.latency_max
+			}
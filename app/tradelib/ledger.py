@@ -0,0 +1,411 @@
+import json
+import gzip
+import numpy as np
+import pandas as pd
+from threading import Lock
+
+# Column name and dtype, `object` columns are stored as JSON
+COLUMNS = [
+	('reference_id', object), ('timestamp', np.float64), ('type', object), ('accepted', np.int8),
+	('order_id', object), ('account_id', object), ('product', object), ('order_type', object),
+	('direction', object), ('lotsize', np.float64), ('entry_price', np.float64),
+	('close_price', np.float64), ('sl', np.float64), ('tp', np.float64),
+	('open_time', np.float64), ('close_time', np.float64)
+]
+MANIFEST = 'manifest.json.gz'
+
+
+def _to_float(value):
+	try:
+		return np.nan if value is None else float(value)
+	except (TypeError, ValueError):
+		return np.nan
+
+
+def _to_flag(value):
+	if value is None or (isinstance(value, float) and np.isnan(value)):
+		return -1
+	return int(bool(value))
+
+
+def encodeSegment(columns):
+	'''Serialise a dict of column arrays to a gzipped segment.
+
+	The segment is a 4 byte header length, a JSON header describing each
+	column, then each column's raw bytes (JSON for `object` columns).
+	'''
+
+	header = { 'rows': len(columns['reference_id']), 'columns': [] }
+	blobs = []
+	for name, dtype in COLUMNS:
+		if dtype is object:
+			blob = json.dumps(list(columns[name])).encode('utf-8')
+			dtype_name = 'json'
+		else:
+			blob = np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+			dtype_name = np.dtype(dtype).str
+		header['columns'].append({ 'name': name, 'dtype': dtype_name, 'size': len(blob) })
+		blobs.append(blob)
+
+	header = json.dumps(header).encode('utf-8')
+	return gzip.compress(len(header).to_bytes(4, 'little') + header + b''.join(blobs))
+
+
+def decodeSegment(body):
+	''' Inverse of `encodeSegment`, returns a dict of column arrays '''
+
+	data = gzip.decompress(body)
+	size = int.from_bytes(data[:4], 'little')
+	header = json.loads(data[4:4+size].decode('utf-8'))
+
+	columns = {}
+	offset = 4 + size
+	for column in header['columns']:
+		blob = data[offset:offset+column['size']]
+		offset += column['size']
+		if column['dtype'] == 'json':
+			columns[column['name']] = np.array(json.loads(blob.decode('utf-8')), dtype=object)
+		else:
+			columns[column['name']] = np.frombuffer(blob, dtype=np.dtype(column['dtype']))
+	return columns
+
+
+def toDataFrame(columns):
+	''' Column arrays to the transactions DataFrame layout, indexed by reference_id '''
+
+	data = {}
+	for name, dtype in COLUMNS[1:]:
+		values = columns[name]
+		if name == 'accepted':
+			values = np.array([None if i < 0 else bool(i) for i in values], dtype=object)
+		data[name] = values
+	return pd.DataFrame(
+		data, index=pd.Index(columns['reference_id'], name='reference_id')
+	)
+
+
+class DbStorage(object):
+	''' Ledger objects under `<user_id>/<strategy_id>/transactions/` in the strategy bucket '''
+
+	def __init__(self, db, user_id, strategy_id):
+		self.db = db
+		self.user_id = user_id
+		self.strategy_id = strategy_id
+
+	def get(self, name):
+		return self.db.getStrategyTransactionObject(self.user_id, self.strategy_id, name)
+
+	def put(self, name, body):
+		self.db.updateStrategyTransactionObject(self.user_id, self.strategy_id, name, body)
+
+	def delete(self, names):
+		self.db.deleteStrategyTransactionObjects(self.user_id, self.strategy_id, names)
+
+	def getLegacy(self):
+		''' Transactions saved as a single CSV before the ledger '''
+		return self.db.getStrategyTransactions(self.user_id, self.strategy_id)
+
+
+class TransactionLedger(object):
+	'''Append-only transaction history of a broker.
+
+	New rows go into a typed columnar buffer, numeric columns are preallocated
+	arrays that double when full. `flush` seals the buffer into one immutable
+	segment per account (`<account_id>/<seq>.bin.gz`) and records each segment's
+	row count and time range in the manifest. Persisting therefore costs
+	O(new rows) however long the history is.
+
+	When more than `merge_count` small segments (under `merge_rows` rows) trail an
+	account, they are merged into one so the manifest stays short. `read` only
+	downloads the segments whose time range overlaps the query.
+
+	Flushes from different workers are serialised by `lock` (e.g. a Redis lock)
+	while the manifest is updated.
+	'''
+
+	def __init__(self, storage=None, lock=None, capacity=64, merge_count=16, merge_rows=5000):
+		self.storage = storage
+		self.merge_count = merge_count
+		self.merge_rows = merge_rows
+
+		self._lock = Lock()
+		self._flush_lock = Lock()
+		self._storage_lock = lock
+		self._capacity = capacity
+		self._reset_buffer()
+
+
+	def _reset_buffer(self):
+		self._size = 0
+		self._refs = set()
+		self._buffer = {
+			name: [] if dtype is object else np.empty((self._capacity,), dtype=dtype)
+			for name, dtype in COLUMNS
+		}
+
+
+	def _grow(self):
+		self._capacity *= 2
+		for name, dtype in COLUMNS:
+			if dtype is not object:
+				values = np.empty((self._capacity,), dtype=dtype)
+				values[:self._size] = self._buffer[name][:self._size]
+				self._buffer[name] = values
+
+
+	def __len__(self):
+		return self._size
+
+
+	def __contains__(self, reference_id):
+		return reference_id in self._refs
+
+
+	def append(self, reference_id, row):
+		'''Buffer a transaction row, ignoring keys that are not ledger columns.
+
+		Returns:
+			False if `reference_id` is already buffered.
+		'''
+
+		with self._lock:
+			if reference_id in self._refs:
+				return False
+			if self._size == self._capacity:
+				self._grow()
+
+			i = self._size
+			self._buffer['reference_id'].append(reference_id)
+			for name, dtype in COLUMNS[1:]:
+				value = row.get(name)
+				if dtype is object:
+					self._buffer[name].append(value)
+				elif dtype is np.int8:
+					self._buffer[name][i] = _to_flag(value)
+				else:
+					self._buffer[name][i] = _to_float(value)
+
+			self._refs.add(reference_id)
+			self._size += 1
+			return True
+
+
+	def _take_buffer(self):
+		with self._lock:
+			size = self._size
+			columns = {
+				name: np.array(self._buffer[name], dtype=object) if dtype is object else self._buffer[name][:size].copy()
+				for name, dtype in COLUMNS
+			}
+			self._reset_buffer()
+		return size, columns
+
+
+	def _restore_buffer(self, columns):
+		''' Put rows that failed to flush back in front of newer rows '''
+
+		with self._lock:
+			pending = self._take_rows()
+			size = len(columns['reference_id']) + self._size
+			while self._capacity < size:
+				self._capacity *= 2
+			self._reset_buffer()
+
+			for name, dtype in COLUMNS:
+				values = list(columns[name]) + pending[name]
+				if dtype is object:
+					self._buffer[name] = values
+				else:
+					self._buffer[name][:size] = values
+			self._size = size
+			self._refs = set(self._buffer['reference_id'])
+
+
+	def _take_rows(self):
+		return {
+			name: list(self._buffer[name][:self._size])
+			for name, _ in COLUMNS
+		}
+
+
+	def _get_manifest(self):
+		body = self.storage.get(MANIFEST)
+		if body is None:
+			legacy = self.storage.getLegacy()
+			return {
+				'next_seq': 0,
+				'legacy': legacy is not None and legacy.size > 0,
+				'segments': []
+			}
+		return json.loads(gzip.decompress(body))
+
+
+	def _put_manifest(self, manifest):
+		self.storage.put(MANIFEST, gzip.compress(json.dumps(manifest).encode('utf-8')))
+
+
+	def getManifest(self):
+		if self.storage is None:
+			return { 'next_seq': 0, 'legacy': False, 'segments': [] }
+		return self._get_manifest()
+
+
+	def _add_segment(self, manifest, account_id, columns):
+		seq = manifest['next_seq']
+		manifest['next_seq'] += 1
+		name = f'{account_id}/{seq}.bin.gz'
+		self.storage.put(name, encodeSegment(columns))
+
+		timestamps = columns['timestamp']
+		manifest['segments'].append({
+			'name': name,
+			'account_id': account_id,
+			'seq': seq,
+			'rows': len(timestamps),
+			'start_ts': float(np.nanmin(timestamps)) if len(timestamps) else None,
+			'end_ts': float(np.nanmax(timestamps)) if len(timestamps) else None
+		})
+
+
+	def _merge_trailing(self, manifest, account_id):
+		''' Merge the account's trailing small segments into one '''
+
+		trailing = []
+		for segment in reversed(manifest['segments']):
+			if segment['account_id'] != account_id:
+				continue
+			if segment['rows'] >= self.merge_rows:
+				break
+			trailing.append(segment)
+
+		if len(trailing) <= self.merge_count:
+			return []
+
+		trailing.reverse()
+		parts = [decodeSegment(self.storage.get(segment['name'])) for segment in trailing]
+		columns = { name: np.concatenate([part[name] for part in parts]) for name, _ in COLUMNS }
+
+		names = set(segment['name'] for segment in trailing)
+		manifest['segments'] = [i for i in manifest['segments'] if i['name'] not in names]
+		self._add_segment(manifest, account_id, columns)
+		return list(names)
+
+
+	def flush(self):
+		'''Persist buffered rows as new segments.
+
+		Returns:
+			The number of rows written.
+		'''
+
+		if self.storage is None or not self._size:
+			return 0
+
+		with self._flush_lock:
+			size, columns = self._take_buffer()
+			if not size:
+				return 0
+
+			try:
+				merged = []
+				if self._storage_lock is not None:
+					self._storage_lock.acquire()
+				try:
+					manifest = self._get_manifest()
+					accounts = columns['account_id']
+					for account_id in dict.fromkeys(accounts):
+						mask = accounts == account_id
+						self._add_segment(
+							manifest, account_id,
+							{ name: values[mask] for name, values in columns.items() }
+						)
+						merged += self._merge_trailing(manifest, account_id)
+					self._put_manifest(manifest)
+				finally:
+					if self._storage_lock is not None:
+						self._storage_lock.release()
+
+			except Exception:
+				self._restore_buffer(columns)
+				raise
+
+			# Merged segments are no longer referenced by the manifest
+			if len(merged):
+				self.storage.delete(merged)
+			return size
+
+
+	def iterSegments(self, start=None, end=None, account_id=None):
+		'''Yield the saved transactions as DataFrames one segment at a time.
+
+		Only segments overlapping [`start`, `end`) are downloaded. Transactions
+		saved before the ledger come first, as one DataFrame.
+		'''
+
+		if self.storage is None:
+			return
+
+		manifest = self._get_manifest()
+		if manifest.get('legacy'):
+			legacy = self.storage.getLegacy()
+			if legacy is not None and legacy.size > 0:
+				yield self._filter(legacy, start, end, account_id)
+
+		for segment in manifest['segments']:
+			if account_id is not None and segment['account_id'] != account_id:
+				continue
+			if segment['end_ts'] is not None and start is not None and segment['end_ts'] < start:
+				continue
+			if segment['start_ts'] is not None and end is not None and segment['start_ts'] >= end:
+				continue
+
+			df = toDataFrame(decodeSegment(self.storage.get(segment['name'])))
+			yield self._filter(df, start, end, account_id)
+
+
+	def _filter(self, df, start, end, account_id):
+		if start is not None:
+			df = df.loc[df['timestamp'] >= start]
+		if end is not None:
+			df = df.loc[df['timestamp'] < end]
+		if account_id is not None:
+			df = df.loc[df['account_id'] == account_id]
+		return df
+
+
+	def getBuffered(self):
+		with self._lock:
+			rows = self._take_rows()
+		return toDataFrame({
+			name: np.array(rows[name], dtype=dtype) for name, dtype in COLUMNS
+		})
+
+
+	def read(self, start=None, end=None, account_id=None):
+		''' Saved and buffered transactions in [`start`, `end`), sorted by timestamp '''
+
+		frames = list(self.iterSegments(start=start, end=end, account_id=account_id))
+		frames.append(self._filter(self.getBuffered(), start, end, account_id))
+		df = pd.concat(frames)
+		return df.loc[~df.index.duplicated(keep='last')].sort_values(by=['timestamp'], kind='stable')
+
+
+	def getLastTimestamp(self):
+		''' Latest transaction timestamp, from the manifest where possible '''
+
+		last = None
+		with self._lock:
+			if self._size:
+				last = float(np.nanmax(self._buffer['timestamp'][:self._size]))
+
+		if self.storage is not None:
+			manifest = self._get_manifest()
+			ends = [i['end_ts'] for i in manifest['segments'] if i['end_ts'] is not None]
+			if len(ends):
+				last = max(ends + ([last] if last is not None else []))
+			elif last is None and manifest.get('legacy'):
+				legacy = self.storage.getLegacy()
+				if legacy is not None and legacy.size > 0:
+					last = legacy[['timestamp']].values[-1][0]
+
+		return last
@@ -0,0 +1,295 @@
+import numpy as np
+from app import tradelib as tl
+
+ASK = 0
+MID = 1
+BID = 2
+
+class LiveBars(object):
+	'''Current bar of every chart period, updated in place by broker price updates.
+
+	Bars are held in one preallocated (periods x 3 x 4) block of ask/mid/bid OHLC.
+	Each update is applied to every period at once with `np.maximum`/`np.minimum`,
+	and bar ends are found by comparing the update time against each period's
+	precomputed next bar timestamp.
+
+	The `ask`, `mid`, `bid` and `last_ts` dicts are shared with the Chart. Once a
+	period's bar is set they map it to row views of the block, so readers always see
+	the live values. The TICK period holds scalars.
+	'''
+
+	def __init__(self, broker, product, periods):
+		self.broker = broker
+		self.product = product
+		self.periods = list(periods)
+		self._idx = { period: i for i, period in enumerate(self.periods) }
+
+		size = len(self.periods)
+		self.values = np.full((size, 3, 4), np.nan, dtype=np.float64)
+		self.offsets = np.array([
+			tl.period.getPeriodOffsetSeconds(period) or np.nan for period in self.periods
+		], dtype=np.float64)
+		self.next_ts = np.full((size,), np.nan, dtype=np.float64)
+		self.volume = np.zeros((size,), dtype=np.int64)
+		self.ready = np.zeros((size,), dtype=bool)
+		# Candle updates replace the whole bar after a bar end
+		self.reset = np.zeros((size,), dtype=bool)
+
+		self.ask = { period: None for period in self.periods }
+		self.mid = { period: None for period in self.periods }
+		self.bid = { period: None for period in self.periods }
+		self.last_ts = { period: None for period in self.periods }
+
+
+	def setBar(self, period, ts, ask, mid, bid):
+		''' Load the current `period` bar, starting at `ts` '''
+
+		i = self._idx[period]
+		self.values[i, ASK] = ask
+		self.values[i, MID] = mid
+		self.values[i, BID] = bid
+		self.next_ts[i] = ts + self.offsets[i]
+		self.volume[i] = 0
+		self.reset[i] = False
+
+		self.ask[period] = self.values[i, ASK]
+		self.mid[period] = self.values[i, MID]
+		self.bid[period] = self.values[i, BID]
+		self.last_ts[period] = ts
+		self.ready[i] = True
+
+
+	def _set_tick(self, ask, bid, partial_mid=True):
+		''' With `partial_mid`, a tick with only one side updates mid from the other side's last price '''
+
+		if tl.period.TICK not in self.ask:
+			return
+		if ask is not None:
+			self.ask[tl.period.TICK] = ask
+		if bid is not None:
+			self.bid[tl.period.TICK] = bid
+		if not partial_mid and (ask is None or bid is None):
+			return
+		if self.ask[tl.period.TICK] is not None and self.bid[tl.period.TICK] is not None:
+			self.mid[tl.period.TICK] = np.around(
+				(self.ask[tl.period.TICK] + self.bid[tl.period.TICK])/2, decimals=5
+			)
+
+
+	def _roll(self, i, ts):
+		''' Start the next bar of period `i` from the last close '''
+
+		period = self.periods[i]
+		last_ts = tl.getNextTimestamp(period, self.last_ts[period], now=ts - self.offsets[i])
+		self.last_ts[period] = last_ts
+		self.next_ts[i] = last_ts + self.offsets[i]
+		self.volume[i] = 0
+
+		bar = self.values[i]
+		bar[ASK] = bar[ASK, 3]
+		bar[BID] = bar[BID, 3]
+		bar[MID] = np.around((bar[ASK, 3] + bar[BID, 3])/2, decimals=5)
+
+
+	def _update_mid(self):
+		values = self.values
+		high = np.around((values[:, ASK, 1] + values[:, BID, 1])/2, decimals=5)
+		low = np.around((values[:, ASK, 2] + values[:, BID, 2])/2, decimals=5)
+		np.maximum(values[:, MID, 1], high, out=high)
+		np.minimum(values[:, MID, 2], low, out=low)
+		values[:, MID, 1] = high
+		values[:, MID, 2] = low
+		values[:, MID, 3] = np.around((values[:, ASK, 3] + values[:, BID, 3])/2, decimals=5)
+
+
+	def _item(self, bar):
+		return { 'ask': bar[ASK], 'mid': bar[MID], 'bid': bar[BID] }
+
+
+	def _bar_end(self, i):
+		period = self.periods[i]
+		bar = self.values[i].tolist()
+		return {
+			'broker': self.broker,
+			'product': self.product,
+			'period': period,
+			'bar_end': True,
+			'timestamp': self.last_ts[period],
+			'item': self._item(bar)
+		}
+
+
+	def _get_result(self, ts, ended, skip_empty):
+		''' Result payload for the updated periods, bar ends first per period '''
+
+		bars = self.values.tolist()
+		result = []
+		for i in np.flatnonzero(self.ready):
+			period = self.periods[i]
+			if i in ended:
+				result.append(ended[i])
+			result.append({
+				'broker': self.broker,
+				'product': self.product,
+				'period': period,
+				'bar_end': False,
+				'timestamp': max(ts, self.last_ts[period]) if skip_empty else ts,
+				'item': self._item(bars[i])
+			})
+
+		return result
+
+
+	def _get_tick_result(self, ts):
+		if tl.period.TICK not in self.ask:
+			return []
+
+		return [{
+			'broker': self.broker,
+			'product': self.product,
+			'period': tl.period.TICK,
+			'bar_end': False,
+			'timestamp': ts,
+			'item': {
+				'ask': self.ask[tl.period.TICK],
+				'mid': self.mid[tl.period.TICK],
+				'bid': self.bid[tl.period.TICK]
+			}
+		}]
+
+
+	def tick(self, ts, ask, bid, skip_empty=False):
+		'''Apply a price tick to every period.
+
+		Bars whose end `ts` has passed are closed and rolled over first. The two
+		tick loops the adapters used before keep their differences:
+
+		- Without `skip_empty` (oanda) every bar end is reported, mid is only
+		  updated by ticks holding both ask and bid and bars are reported at `ts`.
+		- With `skip_empty` (fxopen, fxcm, dukascopy) bars that received no ticks
+		  are rolled over without being reported, mid is updated by every tick and
+		  bars are reported no earlier than their start.
+
+		In both, the TICK period's mid is only updated by ticks holding both sides.
+
+		Returns:
+			The chart result payload for `Chart.handleTick`.
+		'''
+
+		ended = {}
+		for i in np.flatnonzero(self.ready & (ts >= self.next_ts)):
+			if not skip_empty or self.volume[i] > 0:
+				ended[i] = self._bar_end(i)
+			self._roll(i, ts)
+
+		self.volume[self.ready] += 1
+
+		values = self.values
+		if ask is not None:
+			np.maximum(values[:, ASK, 1], ask, out=values[:, ASK, 1])
+			np.minimum(values[:, ASK, 2], ask, out=values[:, ASK, 2])
+			values[:, ASK, 3] = ask
+		if bid is not None:
+			np.maximum(values[:, BID, 1], bid, out=values[:, BID, 1])
+			np.minimum(values[:, BID, 2], bid, out=values[:, BID, 2])
+			values[:, BID, 3] = bid
+		if skip_empty or (ask is not None and bid is not None):
+			self._update_mid()
+
+		self._set_tick(ask, bid, partial_mid=False)
+		return self._get_result(ts, ended, skip_empty) + self._get_tick_result(ts)
+
+
+	def candle(self, ts, ask, bid, bar_end=False):
+		'''Apply a broker candle update (ask/bid OHLC of the current M1 bar) to every period.
+
+		When the candle is final (`bar_end`) each period whose end it reaches is
+		reported as ended, and its next candle replaces the whole bar.
+		'''
+
+		ask = np.asarray(ask, dtype=np.float64)
+		bid = np.asarray(bid, dtype=np.float64)
+		mid = np.around((ask + bid)/2, decimals=5)
+		self._set_tick(ask[3], bid[3])
+
+		ready = self.ready
+		values = self.values
+		reset = ready & self.reset
+		values[reset] = (ask, mid, bid)
+
+		update = ready & ~self.reset
+		for side, ohlc in ((ASK, ask), (MID, mid), (BID, bid)):
+			values[update, side, 1] = np.maximum(values[update, side, 1], ohlc[1])
+			values[update, side, 2] = np.minimum(values[update, side, 2], ohlc[2])
+			values[update, side, 3] = ohlc[3]
+		self.reset[ready] = False
+
+		ended = ready & (ts + self.offsets >= self.next_ts) if bar_end else np.zeros_like(ready)
+		for i in np.flatnonzero(ended):
+			self.last_ts[self.periods[i]] = ts
+			self.next_ts[i] = ts + self.offsets[i]
+		self.reset[ended] = True
+
+		bars = values.tolist()
+		result = []
+		for i in np.flatnonzero(ready):
+			period = self.periods[i]
+			result.append({
+				'broker': self.broker,
+				'product': self.product,
+				'period': period,
+				'bar_end': bool(ended[i]),
+				'timestamp': self.last_ts[period],
+				'item': self._item(bars[i])
+			})
+
+		return result + self._get_tick_result(ts)
+
+
+	def setTick(self, ts, ask, bid):
+		''' Update the TICK period only '''
+
+		self._set_tick(ask, bid)
+		return self._get_tick_result(ts)
+
+
+	def setCandle(self, period, ts, ohlc):
+		'''Replace the current `period` bar with a broker bar starting at `ts`.
+
+		A bar starting later than the current one ends it.
+		'''
+
+		i = self._idx.get(period)
+		if i is None or not self.ready[i]:
+			return []
+
+		result = []
+		last_ts = self.last_ts[period]
+		if last_ts is None or np.isnan(last_ts):
+			self.last_ts[period] = ts
+		elif ts > last_ts:
+			result.append(self._bar_end(i))
+			self.last_ts[period] = ts
+		self.next_ts[i] = self.last_ts[period] + self.offsets[i]
+
+		self.values[i] = ohlc
+		result.append({
+			'broker': self.broker,
+			'product': self.product,
+			'period': period,
+			'bar_end': False,
+			'timestamp': self.last_ts[period],
+			'item': self._item(self.values[i].tolist())
+		})
+		return result
+
+
+	def close(self, ts):
+		''' End bars that received ticks and whose end `ts` has passed, without a new price '''
+
+		result = []
+		for i in np.flatnonzero(self.ready & (self.volume > 0) & (ts >= self.next_ts)):
+			result.append(self._bar_end(i))
+			self._roll(i, ts)
+
+		return result
@@ -0,0 +1,246 @@
+import time
+import pandas as pd
+from collections import OrderedDict
+from threading import Lock
+from app import tradelib as tl
+
+WINDOW_BARS = 1000
+
+class PriceCache(object):
+	'''Bounded LRU/TTL cache of historical price DataFrames.
+
+	Prices are held in windows of `window_bars` bars aligned to the epoch and keyed
+	by (broker, product, period, window start). Each window records the closed
+	timestamp range it has been downloaded for, so a request is answered by
+	stitching cached slices together and downloading only the uncovered part.
+
+	One cache exists per worker, `getStats` reports its hit rate and size.
+	'''
+
+	def __init__(self, max_bytes=256*1024*1024, ttl=60*60, window_bars=WINDOW_BARS):
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		self.window_bars = window_bars
+
+		# Maps window key to [data, covered_start, covered_end, expiry]
+		self._windows = OrderedDict()
+		self._lock = Lock()
+
+		self.bytes = 0
+		self.hits = 0
+		self.partial_hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+
+	def _get_window_size(self, period):
+		return tl.period.getPeriodOffsetSeconds(period) * self.window_bars
+
+
+	def _get_keys(self, broker, product, period, start_ts, end_ts):
+		size = self._get_window_size(period)
+		first = int(start_ts - (start_ts % size))
+		return [
+			(broker, product, period, window)
+			for window in range(first, int(end_ts) + 1, size)
+		]
+
+
+	def _get_entry(self, key, now):
+		entry = self._windows.get(key)
+		if entry is None:
+			return None
+
+		if entry[3] <= now:
+			self._remove(key)
+			self.evictions += 1
+			return None
+
+		self._windows.move_to_end(key)
+		return entry
+
+
+	def _remove(self, key):
+		entry = self._windows.pop(key)
+		self.bytes -= entry[0].memory_usage(index=True).sum()
+
+
+	def _put(self, key, data, start_ts, end_ts, now):
+		size = self._get_window_size(key[2])
+		start_ts = max(start_ts, key[3])
+		end_ts = min(end_ts, key[3] + size)
+		data = data.loc[(data.index >= start_ts) & (data.index <= end_ts)]
+
+		entry = self._windows.get(key)
+		if entry is not None:
+			self._remove(key)
+			# Stitch onto the cached range if they overlap, new rows take precedence
+			if entry[1] <= end_ts and entry[2] >= start_ts:
+				data = pd.concat((entry[0], data))
+				data = data[~data.index.duplicated(keep='last')].sort_index()
+				start_ts = min(start_ts, entry[1])
+				end_ts = max(end_ts, entry[2])
+
+		self._windows[key] = [data, start_ts, end_ts, now + self.ttl]
+		self.bytes += data.memory_usage(index=True).sum()
+
+		while self.bytes > self.max_bytes and len(self._windows) > 1:
+			self._remove(next(iter(self._windows)))
+			self.evictions += 1
+
+
+	def _to_timestamp(self, dt):
+		if dt is None or isinstance(dt, (int, float)):
+			return dt
+		return tl.convertTimeToTimestamp(dt)
+
+
+	def _estimate_range(self, period, start_ts, end_ts, count, now):
+		calendar = tl.utils.getTradingCalendar()
+		if start_ts is not None:
+			return start_ts, calendar.getCountTimestamp(period, count, start_ts, direction=1)
+		else:
+			if end_ts is None:
+				end_ts = now
+			return calendar.getCountTimestamp(period, count, end_ts, direction=-1), end_ts
+
+
+	def get(self, broker, product, period, download,
+		start=None, end=None, count=None, force_download=False
+	):
+		'''Retrieve prices for `start`/`end`/`count`, calling `download` for uncached ranges.
+
+		`download` has the signature of `Broker._download_historical_data`.
+		'''
+
+		if force_download or period == tl.period.TICK:
+			return download(
+				product, period, start=start, end=end,
+				count=count, force_download=force_download
+			)
+
+		now = time.time()
+		start_ts = self._to_timestamp(start)
+		end_ts = self._to_timestamp(end)
+		if count is not None:
+			start_ts, end_ts = self._estimate_range(period, start_ts, end_ts, count, now)
+		elif start_ts is None:
+			return download(product, period, start=start, end=end, count=count)
+		elif end_ts is None:
+			end_ts = now
+
+		keys = self._get_keys(broker, product, period, start_ts, end_ts)
+		size = self._get_window_size(period)
+
+		# Collect cached slices and the bounds of the range still missing
+		frags = []
+		dl_start = None
+		dl_end = None
+		with self._lock:
+			for key in keys:
+				need_start = max(start_ts, key[3])
+				need_end = min(end_ts, key[3] + size)
+				entry = self._get_entry(key, now)
+
+				if entry is not None:
+					frags.append(entry[0].loc[
+						(entry[0].index >= need_start) & (entry[0].index <= need_end)
+					])
+					if entry[1] <= need_start and entry[2] >= need_end:
+						continue
+
+				missing_start = need_start
+				missing_end = need_end
+				if entry is not None and entry[1] <= need_start and entry[2] >= need_start:
+					missing_start = entry[2]
+				if entry is not None and entry[2] >= need_end and entry[1] <= need_end:
+					missing_end = entry[1]
+
+				if dl_start is None:
+					dl_start = missing_start
+				dl_end = missing_end
+
+			if dl_start is None:
+				self.hits += 1
+			elif len(frags):
+				self.partial_hits += 1
+			else:
+				self.misses += 1
+
+		if dl_start is not None:
+			data = download(
+				product, period,
+				start=tl.convertTimestampToTime(dl_start),
+				end=tl.convertTimestampToTime(dl_end)
+			)
+			if data.size > 0:
+				# The last bar of a live range may still be forming
+				if dl_end >= now - tl.period.getPeriodOffsetSeconds(period):
+					dl_end = min(dl_end, data.index.values[-1] - 1)
+
+				if dl_end >= dl_start:
+					with self._lock:
+						for key in self._get_keys(broker, product, period, dl_start, dl_end):
+							self._put(key, data, dl_start, dl_end, now)
+				frags.append(data)
+
+			elif not len(frags):
+				return data
+
+		result = pd.concat(frags)
+		result = result[~result.index.duplicated(keep='last')].sort_index()
+		result = result.loc[(result.index >= start_ts) & (result.index <= end_ts)]
+
+		if count is not None:
+			if result.shape[0] < count:
+				# Calendar estimate fell short (holidays, gaps), ask the broker directly
+				with self._lock:
+					self.misses += 1
+				return download(
+					product, period, start=start, end=end, count=count
+				)
+			elif start is not None:
+				result = result.iloc[:count]
+			else:
+				result = result.iloc[-count:]
+
+		return result
+
+
+	def invalidate(self, broker, product, period, ts):
+		''' Drop cached bars at or after `ts` so the tail is downloaded again '''
+
+		size = self._get_window_size(period)
+		window = int(ts - (ts % size))
+		with self._lock:
+			for key in ((broker, product, period, window), (broker, product, period, window + size)):
+				entry = self._windows.get(key)
+				if entry is None or entry[2] < ts:
+					continue
+
+				self._remove(key)
+				if entry[1] < ts:
+					data = entry[0].loc[entry[0].index < ts]
+					self._windows[key] = [data, entry[1], ts - 1, entry[3]]
+					self.bytes += data.memory_usage(index=True).sum()
+
+
+	def clear(self):
+		with self._lock:
+			self._windows.clear()
+			self.bytes = 0
+
+
+	def getStats(self):
+		with self._lock:
+			requests = self.hits + self.partial_hits + self.misses
+			return {
+				'entries': len(self._windows),
+				'bytes': int(self.bytes),
+				'max_bytes': self.max_bytes,
+				'hits': self.hits,
+				'partial_hits': self.partial_hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'hit_rate': (self.hits + self.partial_hits) / requests if requests else 0.0
+			}
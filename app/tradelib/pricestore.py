@@ -0,0 +1,419 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from threading import RLock
+from app import tradelib as tl
+from app import ROOT_DIR
+
+OHLC_COLUMNS = [
+	'ask_open', 'ask_high', 'ask_low', 'ask_close',
+	'mid_open', 'mid_high', 'mid_low', 'mid_close',
+	'bid_open', 'bid_high', 'bid_low', 'bid_close'
+]
+TICK_COLUMNS = ['ask', 'bid']
+
+STORE_EXT = '.bin'
+CSV_EXT = '.csv.gz'
+MANIFEST_FILE = 'manifest.json'
+
+class PriceStore(object):
+	'''Columnar price store memory-mapped by month.
+
+	Each month of a (product, period) series is a flat binary file of fixed-width
+	rows, an int64 timestamp followed by a float64 price block, kept sorted by
+	timestamp. Range reads binary search the timestamp column and copy the slice.
+
+	Files are laid out as `data/{broker}/{product}/{period}/YYYYMM.bin`, next to a
+	`manifest.json` recording the first/last timestamp and row count of each month.
+	'''
+
+	def __init__(self, broker_name, data_dir=None):
+		self.broker_name = broker_name
+		if data_dir is None:
+			data_dir = os.path.join(ROOT_DIR, 'data')
+		self.data_dir = data_dir
+		self._lock = RLock()
+
+
+	def getColumns(self, period):
+		if period == tl.period.TICK:
+			return TICK_COLUMNS
+		else:
+			return OHLC_COLUMNS
+
+
+	def getDtype(self, period):
+		return np.dtype([
+			('timestamp', '<i8'),
+			('prices', '<f8', (len(self.getColumns(period)),))
+		])
+
+
+	def getDir(self, product, period):
+		return os.path.join(self.data_dir, self.broker_name, product, period)
+
+
+	def _get_path(self, product, period, month):
+		return os.path.join(self.getDir(product, period), f'{month}{STORE_EXT}')
+
+
+	def getMonth(self, ts):
+		''' `YYYYMM` key of the month file holding `ts` '''
+		return datetime.utcfromtimestamp(ts).strftime('%Y%m')
+
+
+	def getMonths(self, product, period):
+		''' Sorted list of `YYYYMM` month keys saved for series '''
+
+		manifest = self.getManifest(product, period)
+		if len(manifest):
+			return sorted(manifest)
+
+		return self._list_months(product, period)
+
+
+	def _list_months(self, product, period):
+		path = self.getDir(product, period)
+		if not os.path.exists(path):
+			return []
+
+		return sorted(
+			x.replace(STORE_EXT, '') for x in os.listdir(path)
+			if x.endswith(STORE_EXT)
+		)
+
+
+	def _map_month(self, product, period, month):
+		path = self._get_path(product, period, month)
+		dtype = self.getDtype(period)
+		if not os.path.exists(path):
+			return np.zeros((0,), dtype=dtype)
+
+		# Only map whole rows in case an append is in progress
+		count = os.path.getsize(path) // dtype.itemsize
+		if count == 0:
+			return np.zeros((0,), dtype=dtype)
+
+		return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+	def _slice(self, rows, start_ts=None, end_ts=None):
+		start_idx = 0
+		end_idx = rows.shape[0]
+		if start_ts is not None:
+			start_idx = np.searchsorted(rows['timestamp'], start_ts, side='left')
+		if end_ts is not None:
+			end_idx = np.searchsorted(rows['timestamp'], end_ts, side='left')
+
+		return rows[start_idx:end_idx]
+
+
+	def _to_df(self, period, rows):
+		return pd.DataFrame(
+			index=pd.Index(data=rows['timestamp'].astype(float), name='timestamp'),
+			data=rows['prices'],
+			columns=self.getColumns(period)
+		)
+
+
+	def readRows(self, product, period, start_ts=None, end_ts=None, months=None):
+		''' Copy rows in [start_ts, end_ts) into a single structured array '''
+
+		if months is None:
+			months = self.getMonths(product, period)
+
+		if start_ts is not None:
+			start_month = self.getMonth(start_ts)
+			months = [m for m in months if m >= start_month]
+		if end_ts is not None:
+			end_month = self.getMonth(end_ts)
+			months = [m for m in months if m <= end_month]
+
+		frags = [
+			self._slice(self._map_month(product, period, m), start_ts, end_ts)
+			for m in months
+		]
+
+		# Concatenating copies the mapped slices out in one pass
+		if len(frags):
+			return np.concatenate(frags)
+		else:
+			return np.zeros((0,), dtype=self.getDtype(period))
+
+
+	def readMonths(self, product, period, months):
+		''' Copy whole `months` into a single structured array with each month's first row index '''
+
+		frags = [self._map_month(product, period, m) for m in months]
+		offsets = np.cumsum([0] + [x.shape[0] for x in frags[:-1]], dtype=np.int64)
+		if len(frags):
+			return np.concatenate(frags), offsets
+		else:
+			return np.zeros((0,), dtype=self.getDtype(period)), offsets
+
+
+	def read(self, product, period, start_ts=None, end_ts=None, months=None):
+		''' Retrieve DataFrame for rows in [start_ts, end_ts) '''
+
+		return self._to_df(
+			period, self.readRows(product, period, start_ts, end_ts, months=months)
+		)
+
+
+	def getLastTimestamp(self, product, period):
+		manifest = self.getManifest(product, period)
+		if len(manifest):
+			return manifest[max(manifest)]['end']
+
+		for month in reversed(self._list_months(product, period)):
+			rows = self._map_month(product, period, month)
+			if rows.shape[0] > 0:
+				return int(rows['timestamp'][-1])
+
+		return None
+
+
+	def _to_rows(self, period, data):
+		rows = np.zeros((data.shape[0],), dtype=self.getDtype(period))
+		rows['timestamp'] = data.index.values.astype(np.int64)
+		rows['prices'] = np.around(
+			data[self.getColumns(period)].values.astype(float), decimals=5
+		)
+		return rows
+
+
+	def _write_month(self, product, period, month, rows):
+		path = self._get_path(product, period, month)
+		old_rows = self._map_month(product, period, month)
+
+		if old_rows.shape[0] == 0 or rows['timestamp'][0] > old_rows['timestamp'][-1]:
+			# Fast path, append new rows to end of month
+			with open(path, 'ab') as f:
+				# Drop any partially written row
+				f.truncate(old_rows.shape[0] * rows.dtype.itemsize)
+				f.write(rows.tobytes())
+
+		else:
+			# Merge with saved rows, saved rows take precedence
+			rows = np.concatenate((np.array(old_rows), rows))
+			_, idx = np.unique(rows['timestamp'], return_index=True)
+			rows = rows[idx]
+
+			# Replace file atomically so readers never see a partial month
+			tmp_path = path + '.tmp'
+			with open(tmp_path, 'wb') as f:
+				f.write(rows.tobytes())
+			os.replace(tmp_path, path)
+
+
+	def write(self, product, period, data):
+		''' Save DataFrame to its month files '''
+
+		if data.size == 0:
+			return
+
+		path = self.getDir(product, period)
+		if not os.path.exists(path):
+			os.makedirs(path)
+
+		rows = self._to_rows(period, data)
+		# Sort and remove duplicates
+		_, idx = np.unique(rows['timestamp'], return_index=True)
+		rows = rows[idx]
+
+		months = pd.to_datetime(rows['timestamp'], unit='s').strftime('%Y%m').values
+		bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+		month_keys = months[np.concatenate(([0], bounds))]
+		with self._lock:
+			for c_rows, month in zip(np.split(rows, bounds), month_keys):
+				self._write_month(product, period, month, c_rows)
+
+			self._update_manifest(product, period, month_keys)
+
+
+	def _get_manifest_path(self, product, period):
+		return os.path.join(self.getDir(product, period), MANIFEST_FILE)
+
+
+	def getManifest(self, product, period):
+		''' Map of month key to the `start`/`end` timestamps and `rows` saved in it '''
+
+		path = self._get_manifest_path(product, period)
+		if not os.path.exists(path):
+			return {}
+
+		try:
+			with open(path, 'r') as f:
+				return json.load(f)
+		except (ValueError, OSError):
+			return {}
+
+
+	def _get_manifest_entry(self, product, period, month):
+		rows = self._map_month(product, period, month)
+		if rows.shape[0] == 0:
+			return None
+
+		return {
+			'start': int(rows['timestamp'][0]),
+			'end': int(rows['timestamp'][-1]),
+			'rows': int(rows.shape[0])
+		}
+
+
+	def _save_manifest(self, product, period, manifest):
+		path = self._get_manifest_path(product, period)
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'w') as f:
+			json.dump(manifest, f, sort_keys=True)
+		os.replace(tmp_path, path)
+
+
+	def _update_manifest(self, product, period, months):
+		manifest = self.getManifest(product, period)
+		if not len(manifest):
+			# Month files written before the manifest existed are indexed first
+			months = self._list_months(product, period)
+
+		for month in months:
+			entry = self._get_manifest_entry(product, period, month)
+			if entry is None:
+				manifest.pop(month, None)
+			else:
+				manifest[month] = entry
+
+		self._save_manifest(product, period, manifest)
+
+
+	def _compact_month(self, product, period, month):
+		path = self._get_path(product, period, month)
+		itemsize = self.getDtype(period).itemsize
+
+		# Drop any partially written row
+		size = os.path.getsize(path)
+		repaired = size % itemsize != 0
+		if repaired:
+			with open(path, 'ab') as f:
+				f.truncate(size - size % itemsize)
+
+		rows = self._map_month(product, period, month)
+		if rows.shape[0] == 0:
+			os.remove(path)
+			return True
+
+		# Sort and remove duplicates, earliest saved rows take precedence
+		if np.any(np.diff(rows['timestamp']) <= 0):
+			_, idx = np.unique(rows['timestamp'], return_index=True)
+			rows = np.array(rows)[idx]
+
+			tmp_path = path + '.tmp'
+			with open(tmp_path, 'wb') as f:
+				f.write(rows.tobytes())
+			os.replace(tmp_path, path)
+			repaired = True
+
+		return repaired
+
+
+	def compact(self, product, period):
+		'''Repair and re-index every month file saved for a series.
+
+		Converts any daily CSV files left over, truncates partially written rows,
+		re-sorts and dedupes months that are out of order, removes stale temporary
+		files and rebuilds the manifest.
+
+		Returns:
+			A tuple of the number of months checked and the number repaired.
+		'''
+
+		path = self.getDir(product, period)
+		if not os.path.exists(path):
+			return 0, 0
+
+		with self._lock:
+			self.migrateCsv(product, period)
+
+			for x in os.listdir(path):
+				if x.endswith('.tmp'):
+					os.remove(os.path.join(path, x))
+
+			months = self._list_months(product, period)
+			repaired = 0
+			for month in months:
+				if self._compact_month(product, period, month):
+					repaired += 1
+
+			manifest = {}
+			for month in self._list_months(product, period):
+				entry = self._get_manifest_entry(product, period, month)
+				if entry is not None:
+					manifest[month] = entry
+			self._save_manifest(product, period, manifest)
+
+		if repaired:
+			print(f'[PriceStore] Repaired {repaired}/{len(months)} months for {self.broker_name} {product} {period}')
+		return len(months), repaired
+
+
+	def compactTree(self):
+		''' Compact every series saved for broker '''
+
+		path = os.path.join(self.data_dir, self.broker_name)
+		if not os.path.exists(path):
+			return
+
+		for product in sorted(os.listdir(path)):
+			if not os.path.isdir(os.path.join(path, product)):
+				continue
+			for period in sorted(os.listdir(os.path.join(path, product))):
+				self.compact(product, period)
+
+
+	def migrateCsv(self, product, period, remove=True):
+		''' Convert daily `YYYYMMDD.csv.gz` files into month files '''
+
+		path = self.getDir(product, period)
+		if not os.path.exists(path):
+			return 0
+
+		files = sorted(x for x in os.listdir(path) if x.endswith(CSV_EXT))
+		if not len(files):
+			return 0
+
+		count = 0
+		for i in range(0, len(files), 31):
+			frags = [
+				pd.read_csv(
+					os.path.join(path, f), sep=',',
+					names=['timestamp'] + self.getColumns(period),
+					index_col='timestamp', compression='gzip',
+					dtype=float
+				)
+				for f in files[i:i+31]
+			]
+			data = pd.concat(frags)
+			self.write(product, period, data)
+			count += data.shape[0]
+
+		if remove:
+			for f in files:
+				os.remove(os.path.join(path, f))
+
+		print(f'[PriceStore] Migrated {len(files)} files ({count} rows) for {self.broker_name} {product} {period}')
+		return count
+
+
+	def migrateCsvTree(self, remove=True):
+		''' Convert all daily CSV files saved for broker '''
+
+		path = os.path.join(self.data_dir, self.broker_name)
+		if not os.path.exists(path):
+			return
+
+		for product in sorted(os.listdir(path)):
+			if not os.path.isdir(os.path.join(path, product)):
+				continue
+			for period in sorted(os.listdir(os.path.join(path, product))):
+				self.migrateCsv(product, period, remove=remove)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from app import tradelib as tl
+
+'''
+Bar Resampling
+'''
+
+ONE_DAY = 60*60*24
+
+def getFirstBarTimestamp(period, ts):
+	''' Start of the bar containing `ts`, aligned to the UTC day '''
+
+	off = tl.period.getPeriodOffsetSeconds(period)
+	day_ts = ts - (ts % ONE_DAY)
+	return ts - ((ts - day_ts) % off)
+
+
+def getBarStarts(period, first_ts, last_ts):
+	'''Generate sorted bar start timestamps covering `first_ts` to `last_ts`.
+
+	Bars are aligned to the UTC day until the first weekend, after which each week
+	is anchored to its Sunday 17:00 (New York) open and runs to the Friday close.
+	'''
+
+	return tl.utils.getTradingCalendar().getBarStarts(period, first_ts, last_ts)
+
+
+def constructBars(period, timestamps, values, starts=None):
+	'''Resample sorted M1 rows into `period` bars in one pass.
+
+	`values` holds groups of open/high/low/close columns (ask, mid, bid). Each bar
+	opens on the close of the row preceding it so consecutive bars join up, the
+	first bar opens on the first row.
+
+	`starts` optionally gives the bar start timestamps, by default they are
+	anchored from the first row.
+
+	Returns:
+		A tuple of the bar timestamps and the (bars x columns) OHLC array.
+	'''
+
+	if timestamps.size == 0:
+		return np.zeros((0,), dtype=float), np.zeros((0, values.shape[1]), dtype=float)
+
+	if starts is None:
+		starts = getBarStarts(
+			period, getFirstBarTimestamp(period, timestamps[0]), timestamps[-1]
+		)
+
+	# Bucket every row by the bar it falls in
+	bucket = np.searchsorted(starts, timestamps, side='right') - 1
+	bar_idx = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+	end_idx = np.concatenate((bar_idx[1:], [timestamps.size])) - 1
+
+	result = np.empty((bar_idx.size, values.shape[1]), dtype=float)
+	result[:, 0::4] = values[np.maximum(bar_idx - 1, 0), 3::4]
+	result[0, 0::4] = values[0, 0::4]
+	result[:, 1::4] = np.maximum.reduceat(values[:, 1::4], bar_idx, axis=0)
+	result[:, 2::4] = np.minimum.reduceat(values[:, 2::4], bar_idx, axis=0)
+	result[:, 3::4] = values[end_idx, 3::4]
+
+	return starts[bucket[bar_idx]].astype(float), result
+
+
+def constructAllBars(periods, timestamps, values):
+	''' Resample the same M1 rows into every period in `periods` '''
+
+	result = {}
+	for period in periods:
+		if period == tl.period.ONE_MINUTE:
+			result[period] = (timestamps, values)
+		else:
+			result[period] = constructBars(period, timestamps, values)
+
+	return result
+
+
+def toDataFrame(timestamps, values):
+	return pd.DataFrame(
+		index=pd.Index(data=timestamps, name='timestamp'),
+		data=values,
+		columns=[
+			'ask_open', 'ask_high', 'ask_low', 'ask_close',
+			'mid_open', 'mid_high', 'mid_low', 'mid_close',
+			'bid_open', 'bid_high', 'bid_low', 'bid_close'
+		]
+	)
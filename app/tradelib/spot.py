@@ -61,7 +61,7 @@ class Spot(object):
 		spotware = self.ctrl.brokers.get('spotware')
 		if spotware is not None:
 			pair = self._get_pair()
-			df = spotware._download_historical_data(
+			df = spotware.getHistoricalData(
 				pair, tl.period.ONE_MINUTE, count=5
 			)
 
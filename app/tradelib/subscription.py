@@ -0,0 +1,93 @@
+import json
+from collections import deque
+from threading import Condition
+
+HEARTBEAT = b'\n'
+
+class Subscription(object):
+	'''Bounded mailbox between a publisher callback and a streaming response.
+
+	`put` is handed to a publisher (e.g. `Chart.subscribe`) and never blocks. `stream`
+	is the response generator, it sleeps until items arrive and yields a heartbeat
+	line after `heartbeat` idle seconds so dead connections are noticed. When more
+	than `max_size` items are waiting the oldest are dropped. `on_close` is called
+	once when the stream ends or the client disconnects.
+	'''
+
+	def __init__(self, on_close=None, heartbeat=15, max_size=1000):
+		self.on_close = on_close
+		self.heartbeat = heartbeat
+
+		self._items = deque(maxlen=max_size)
+		self._cond = Condition()
+		self._closed = False
+
+		self.received = 0
+		self.sent = 0
+		self.dropped = 0
+		self.heartbeats = 0
+
+
+	def put(self, item):
+		''' Queue `item` as a JSON line '''
+
+		line = (json.dumps(item) + '\n').encode('utf-8')
+		with self._cond:
+			if self._closed:
+				return
+			if len(self._items) == self._items.maxlen:
+				self.dropped += 1
+			self._items.append(line)
+			self.received += 1
+			self._cond.notify()
+
+
+	def close(self):
+		with self._cond:
+			if self._closed:
+				return
+			self._closed = True
+			self._cond.notify_all()
+
+		if self.on_close is not None:
+			self.on_close()
+
+
+	def isClosed(self):
+		return self._closed
+
+
+	def stream(self):
+		''' Yield queued lines until closed, blocking while idle '''
+
+		try:
+			while True:
+				with self._cond:
+					if not len(self._items) and not self._closed:
+						self._cond.wait(self.heartbeat)
+					if self._closed:
+						break
+					items = list(self._items)
+					self._items.clear()
+
+				if len(items):
+					self.sent += len(items)
+					yield b''.join(items)
+				else:
+					self.heartbeats += 1
+					yield HEARTBEAT
+
+		finally:
+			self.close()
+
+
+	def getStats(self):
+		with self._cond:
+			return {
+				'pending': len(self._items),
+				'received': self.received,
+				'sent': self.sent,
+				'dropped': self.dropped,
+				'heartbeats': self.heartbeats,
+				'closed': self._closed
+			}
@@ -0,0 +1,334 @@
+import json
+from threading import Lock
+from redis import WatchError
+
+# KEYS: items, versions, ids, seq, accounts
+# ARGV: item id, item json, account id, 'append' or 'replace', expected version or ''
+PUT_SCRIPT = '''
+local id = ARGV[1]
+local version = tonumber(redis.call('HGET', KEYS[2], id) or '0')
+if ARGV[4] == 'replace' and version == 0 then
+	return 0
+end
+if ARGV[5] ~= '' and tonumber(ARGV[5]) ~= version then
+	return -1
+end
+
+local seq = redis.call('INCR', KEYS[4])
+if version == 0 then
+	redis.call('ZADD', KEYS[3], seq, id)
+	redis.call('ZADD', KEYS[3] .. ':' .. ARGV[3], seq, id)
+	redis.call('SADD', KEYS[5], ARGV[3])
+else
+	-- Move the item to its new account's index, keeping its insertion order
+	local account_id = cjson.decode(redis.call('HGET', KEYS[1], id))['account_id']
+	if account_id == nil or account_id == cjson.null then
+		account_id = 'None'
+	end
+	account_id = tostring(account_id)
+	if account_id ~= ARGV[3] then
+		local score = redis.call('ZSCORE', KEYS[3], id)
+		redis.call('ZREM', KEYS[3] .. ':' .. account_id, id)
+		redis.call('ZADD', KEYS[3] .. ':' .. ARGV[3], score, id)
+		redis.call('SADD', KEYS[5], ARGV[3])
+	end
+end
+redis.call('HSET', KEYS[1], id, ARGV[2])
+redis.call('HSET', KEYS[2], id, seq)
+return seq
+'''
+
+# KEYS: items, versions, ids, seq
+# ARGV: item id
+DELETE_SCRIPT = '''
+local item = redis.call('HGET', KEYS[1], ARGV[1])
+if not item then
+	return 0
+end
+
+local account_id = cjson.decode(item)['account_id']
+if account_id == nil or account_id == cjson.null then
+	account_id = 'None'
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[3] .. ':' .. tostring(account_id), ARGV[1])
+return redis.call('INCR', KEYS[4])
+'''
+
+class TradeStore(object):
+	'''Positions or orders of one broker in Redis, one hash field per item.
+
+	Items are stored by `order_id` in the `<key>` hash, alongside their version
+	in `<key>:versions`. The ids are kept in insertion order in `<key>:ids`, and
+	per account in `<key>:ids:<account_id>`. Single item writes are applied by
+	Lua scripts, so they only touch that item and its indexes. Every write also
+	bumps the `<key>:seq` counter, and an item's version is the counter value of
+	its last write. `replace` can be made conditional on the version read, and
+	`setAll` swaps the whole collection under WATCH/MULTI.
+
+	`getCached` keeps decoded items in memory and only fetches the items whose
+	version changed.
+	'''
+
+	def __init__(self, redis_client, key):
+		self.redis_client = redis_client
+		self.key = key
+		self.versions_key = f'{key}:versions'
+		self.ids_key = f'{key}:ids'
+		self.seq_key = f'{key}:seq'
+		self.accounts_key = f'{key}:accounts'
+
+		self._put_script = redis_client.register_script(PUT_SCRIPT)
+		self._delete_script = redis_client.register_script(DELETE_SCRIPT)
+
+		# Maps item id to (version, decoded item) for `getCached`
+		self._cache = {}
+		self._cache_items = []
+		self._cache_seq = None
+		self._cache_lock = Lock()
+
+
+	def _account_key(self, account_id):
+		return f'{self.ids_key}:{account_id}'
+
+
+	def _put(self, item, mode, version=None):
+		return int(self._put_script(
+			keys=[self.key, self.versions_key, self.ids_key, self.seq_key, self.accounts_key],
+			args=[
+				item['order_id'], json.dumps(item), str(item.get('account_id')),
+				mode, '' if version is None else version
+			]
+		))
+
+
+	def writeMany(self, pipe, items, deleted=(), versions=None):
+		'''Queue writes of `items` and deletes of the ids in `deleted` on `pipe`.
+
+		Used to apply a batch of changes in the caller's transaction. Items with an
+		entry in `versions` are conditional replaces at that version, the others
+		are appends. Each queued write returns as `append`, `replace` or `delete`.
+		'''
+
+		if versions is None:
+			versions = {}
+		for item in items:
+			version = versions.get(item['order_id'])
+			self._put_script(
+				keys=[self.key, self.versions_key, self.ids_key, self.seq_key, self.accounts_key],
+				args=[
+					item['order_id'], json.dumps(item), str(item.get('account_id')),
+					'append' if version is None else 'replace', '' if version is None else version
+				],
+				client=pipe
+			)
+		for order_id in deleted:
+			self._delete_script(
+				keys=[self.key, self.versions_key, self.ids_key, self.seq_key],
+				args=[order_id],
+				client=pipe
+			)
+
+
+	def append(self, item):
+		''' Add `item`, or overwrite the item with the same `order_id`. Returns its version '''
+
+		return self._put(item, 'append')
+
+
+	def replace(self, item, version=None):
+		'''Overwrite the stored item with the same `order_id`.
+
+		With `version`, the write only happens if the stored item is still at that
+		version.
+
+		Returns:
+			The new version, 0 if the item does not exist or -1 on a version conflict.
+		'''
+
+		return self._put(item, 'replace', version)
+
+
+	def delete(self, order_id):
+		''' Returns True if the item existed '''
+
+		return bool(self._delete_script(
+			keys=[self.key, self.versions_key, self.ids_key, self.seq_key],
+			args=[order_id]
+		))
+
+
+	def get(self, order_id):
+		item = self.redis_client.hget(self.key, order_id)
+		if item is None:
+			return None
+		return json.loads(item)
+
+
+	def getVersion(self, order_id):
+		version = self.redis_client.hget(self.versions_key, order_id)
+		if version is None:
+			return None
+		return int(version)
+
+
+	def getAll(self, account_id=None):
+		''' Items in insertion order, only those of `account_id` if given '''
+
+		ids_key = self.ids_key if account_id is None else self._account_key(account_id)
+		ids = self.redis_client.zrange(ids_key, 0, -1)
+		if not len(ids):
+			return []
+
+		return [json.loads(item) for item in self.redis_client.hmget(self.key, ids) if item is not None]
+
+
+	def getAllVersioned(self):
+		'''Items in insertion order with their versions, read in one transaction.
+
+		Returns:
+			A tuple of the raw `<key>:seq` value, the items and { order_id: version }.
+		'''
+
+		pipe = self.redis_client.pipeline(transaction=True)
+		pipe.get(self.seq_key)
+		pipe.zrange(self.ids_key, 0, -1)
+		pipe.hgetall(self.key)
+		pipe.hgetall(self.versions_key)
+		seq, ids, items, versions = pipe.execute()
+
+		return (
+			seq,
+			[json.loads(items[i]) for i in ids if i in items],
+			{ i.decode(): int(v) for i, v in versions.items() }
+		)
+
+
+	def _queue_set_all(self, pipe, items, seq, accounts):
+		pipe.delete(
+			self.key, self.versions_key, self.ids_key, self.accounts_key,
+			*[self._account_key(i) for i in accounts]
+		)
+		for item in items:
+			seq += 1
+			order_id = item['order_id']
+			account_id = str(item.get('account_id'))
+			pipe.hset(self.key, order_id, json.dumps(item))
+			pipe.hset(self.versions_key, order_id, seq)
+			pipe.zadd(self.ids_key, { order_id: seq })
+			pipe.zadd(self._account_key(account_id), { order_id: seq })
+			pipe.sadd(self.accounts_key, account_id)
+		pipe.set(self.seq_key, seq + 1)
+
+
+	def setAll(self, items):
+		''' Replace every stored item with `items` in one transaction '''
+
+		with self.redis_client.pipeline() as pipe:
+			while True:
+				try:
+					pipe.watch(self.seq_key, self.accounts_key)
+					seq = int(pipe.get(self.seq_key) or 0)
+					accounts = [i.decode() for i in pipe.smembers(self.accounts_key)]
+
+					pipe.multi()
+					self._queue_set_all(pipe, items, seq, accounts)
+					pipe.execute()
+					return
+
+				except WatchError:
+					continue
+
+
+	def migrate(self, legacy_key, field):
+		'''Import items saved as one JSON list in the `field` of the `legacy_key` hash.
+
+		The items are only imported into an empty store, and the legacy field is
+		removed in the same transaction, so it happens once across workers.
+
+		Returns:
+			The number of items imported.
+		'''
+
+		with self.redis_client.pipeline() as pipe:
+			while True:
+				try:
+					pipe.watch(legacy_key, self.seq_key, self.ids_key, self.accounts_key)
+					legacy = pipe.hget(legacy_key, field)
+					if legacy is None:
+						pipe.unwatch()
+						return 0
+
+					items = []
+					if not pipe.zcard(self.ids_key):
+						items = json.loads(legacy)
+					seq = int(pipe.get(self.seq_key) or 0)
+					accounts = [i.decode() for i in pipe.smembers(self.accounts_key)]
+
+					pipe.multi()
+					if len(items):
+						self._queue_set_all(pipe, items, seq, accounts)
+					pipe.hdel(legacy_key, field)
+					pipe.execute()
+					return len(items)
+
+				except WatchError:
+					continue
+
+
+	def getCached(self, convert=None):
+		'''Decoded items in insertion order, refetching only items written since the last call.
+
+		When nothing was written since the last call this costs a single `GET`.
+		Items are passed through `convert` once per version, and the same list
+		is returned until something changes, so it must not be modified.
+		'''
+
+		seq = self.redis_client.get(self.seq_key)
+		with self._cache_lock:
+			if seq is None:
+				if self._cache_seq is not None:
+					self._cache = {}
+					self._cache_items = []
+					self._cache_seq = None
+				return self._cache_items
+			if seq == self._cache_seq:
+				return self._cache_items
+
+			pipe = self.redis_client.pipeline()
+			pipe.get(self.seq_key)
+			pipe.hgetall(self.versions_key)
+			pipe.zrange(self.ids_key, 0, -1)
+			seq, versions, ids = pipe.execute()
+
+			changed = [i for i in ids if i not in self._cache or self._cache[i][0] != versions.get(i)]
+			fetched = self.redis_client.hmget(self.key, changed) if len(changed) else []
+
+			cache = {}
+			for order_id in ids:
+				if order_id in self._cache and self._cache[order_id][0] == versions.get(order_id):
+					cache[order_id] = self._cache[order_id]
+			for order_id, item in zip(changed, fetched):
+				if item is not None:
+					item = json.loads(item)
+					cache[order_id] = (versions.get(order_id), convert(item) if convert else item)
+
+			# Keep insertion order
+			self._cache = { i: cache[i] for i in ids if i in cache }
+			self._cache_items = [item for _, item in self._cache.values()]
+			self._cache_seq = seq
+			return self._cache_items
+
+
+	def clear(self):
+		accounts = [i.decode() for i in self.redis_client.smembers(self.accounts_key)]
+		self.redis_client.delete(
+			self.key, self.versions_key, self.ids_key, self.seq_key, self.accounts_key,
+			*[self._account_key(i) for i in accounts]
+		)
+		with self._cache_lock:
+			self._cache = {}
+			self._cache_items = []
+			self._cache_seq = None
@@ -0,0 +1,253 @@
+import math
+import numpy as np
+import pendulum
+from app import tradelib as tl
+
+ONE_DAY = 60*60*24
+
+class TradingCalendar(object):
+	'''Sorted weekend close/open epochs for closed-form bar arithmetic.
+
+	The market closes every Friday at `close_hour` and reopens the following Sunday
+	at `open_hour` in `tz`. Weekend `k` spans `closes[k] + close_grace` up to (but not
+	including) `opens[k]`, so every lookup is a binary search on these arrays rather
+	than a datetime conversion per step.
+	'''
+
+	def __init__(self, tz='America/New_York', close_hour=17, open_hour=17, close_grace=60,
+					start_year=1999, end_year=2050):
+		self.tz = tz
+		self.close_grace = close_grace
+
+		closes = []
+		opens = []
+		dt = pendulum.datetime(start_year, 1, 1, tz=tz)
+		friday = dt.add(days=(4 - dt.weekday()) % 7)
+		while friday.year < end_year:
+			closes.append(friday.set(hour=close_hour).int_timestamp)
+			opens.append(friday.add(days=2).set(hour=open_hour).int_timestamp)
+			friday = friday.add(weeks=1)
+
+		self.closes = np.array(closes, dtype=np.int64)
+		self.opens = np.array(opens, dtype=np.int64)
+		self._weekend_starts = self.closes + close_grace
+
+
+	def _result(self, ts, result):
+		if np.ndim(ts) == 0:
+			return result.item()
+		return result
+
+
+	def isWeekend(self, ts, include_bounds=False):
+		''' Check if `ts` falls inside a weekend, `include_bounds` includes the exact close/open '''
+
+		ts = np.asarray(ts)
+		if include_bounds:
+			idx = np.searchsorted(self.closes, ts, side='right') - 1
+			result = (idx >= 0) & (ts <= self.opens[np.maximum(idx, 0)])
+		else:
+			idx = np.searchsorted(self._weekend_starts, ts, side='right') - 1
+			result = (idx >= 0) & (ts < self.opens[np.maximum(idx, 0)])
+		return self._result(ts, result)
+
+
+	def getWeekstart(self, ts):
+		''' First market open after `ts` '''
+
+		ts = np.asarray(ts)
+		return self._result(ts, self.opens[np.searchsorted(self.opens, ts, side='right')])
+
+
+	def getWeekend(self, ts):
+		''' Market close of the trading week containing `ts` '''
+
+		ts = np.asarray(ts)
+		return self._result(ts, self.closes[np.searchsorted(self.opens, ts, side='right')])
+
+
+	def getPrevWeekstart(self, ts):
+		''' Last market open at or before `ts` '''
+
+		ts = np.asarray(ts)
+		return self._result(ts, self.opens[np.searchsorted(self.opens, ts, side='right') - 1])
+
+
+	def getPrevWeekend(self, ts):
+		''' Last market close at or before `ts` '''
+
+		ts = np.asarray(ts)
+		return self._result(ts, self.closes[np.searchsorted(self.closes, ts, side='right') - 1])
+
+
+	def getNextTimestamp(self, period, ts, now=None):
+		'''Step `ts` forward one bar, skipping weekends.
+
+		If `now` is given, keep stepping until the result is at or after `now`.
+		'''
+
+		off = tl.period.getPeriodOffsetSeconds(period)
+		new_ts = ts + off
+		if self.isWeekend(new_ts):
+			new_ts = self.getWeekstart(new_ts)
+
+		if now is None or new_ts >= now:
+			return new_ts
+
+		if off > ONE_DAY:
+			while new_ts < now:
+				new_ts += off
+				if self.isWeekend(new_ts):
+					new_ts = self.getWeekstart(new_ts)
+			return new_ts
+
+		# Bars keep their current alignment until the end of the week
+		result = new_ts + math.ceil((now - new_ts) / off) * off
+		week_start = self.getWeekstart(new_ts)
+		if result < week_start and not self.isWeekend(result):
+			return result
+		elif now <= week_start:
+			return week_start
+
+		# After which they are aligned to the week open
+		week_start = self.getPrevWeekstart(now)
+		result = week_start + math.ceil((now - week_start) / off) * off
+		if self.isWeekend(result):
+			result = self.getWeekstart(result)
+		return result
+
+
+	def getPrevTimestamp(self, period, ts, now=None):
+		'''Step `ts` back one bar, skipping weekends.
+
+		If `now` is given, keep stepping until the result is at or before `now`.
+		'''
+
+		off = tl.period.getPeriodOffsetSeconds(period)
+		new_ts = ts - off
+		if self.isWeekend(new_ts):
+			new_ts = self.getPrevWeekend(new_ts)
+
+		if now is None or new_ts <= now:
+			return new_ts
+
+		if off > ONE_DAY:
+			while new_ts > now:
+				new_ts -= off
+				if self.isWeekend(new_ts):
+					new_ts = self.getPrevWeekend(new_ts)
+			return new_ts
+
+		# Bars keep their current alignment until the start of the week
+		result = new_ts - math.ceil((new_ts - now) / off) * off
+		week_start = self.getPrevWeekstart(new_ts)
+		if result >= week_start:
+			return result
+
+		week_end = self.getPrevWeekend(week_start)
+		if now >= week_end:
+			return week_end
+
+		# After which they are aligned to the week close
+		week_end = self.getWeekend(now)
+		if now >= week_end:
+			return week_end
+		result = week_end - math.ceil((week_end - now) / off) * off
+		if self.isWeekend(result):
+			result = self.getPrevWeekend(result)
+		return result
+
+
+	def _count_trading(self, first, step, count):
+		''' Count samples `first + i*step` for `i` in [0, count) outside of weekends '''
+
+		if count <= 0:
+			return 0
+		last = first + (count-1) * step
+
+		# Only weekends overlapping the sampled range matter
+		lo = np.searchsorted(self.opens, first, side='right')
+		hi = np.searchsorted(self._weekend_starts, last, side='right')
+		if hi <= lo:
+			return count
+
+		starts = self._weekend_starts[lo:hi]
+		ends = self.opens[lo:hi]
+		in_weekend = (
+			np.clip(np.ceil((ends - first) / step), 0, count) -
+			np.clip(np.ceil((starts - first) / step), 0, count)
+		)
+		return count - int(np.sum(in_weekend))
+
+
+	def getTradingSeconds(self, start, end, step=60):
+		''' Seconds between `start` and `end` outside of weekends, sampled every `step` seconds '''
+
+		count = int((end - start) / step)
+		return self._count_trading(start, step, count) * step
+
+
+	def getCountTimestamp(self, period, count, ts, direction=-1):
+		'''Timestamp `count` trading bars away from `ts`.
+
+		Walks `ts + i*off*direction` and returns the position after the `count`th
+		sample outside of a weekend.
+		'''
+
+		off = tl.period.getPeriodOffsetSeconds(period)
+		if count <= 0:
+			return ts
+		if off >= tl.period.getPeriodOffsetSeconds(tl.period.WEEKLY):
+			return ts + off*count*direction
+
+		def counted(n):
+			if direction > 0:
+				return self._count_trading(ts, off, n)
+			else:
+				return self._count_trading(ts - (n-1)*off, off, n)
+
+		# Find smallest number of steps containing `count` trading samples
+		lo = count
+		hi = count
+		while counted(hi) < count:
+			lo = hi
+			hi *= 2
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if counted(mid) < count:
+				lo = mid + 1
+			else:
+				hi = mid
+
+		return ts + off*lo*direction
+
+
+	def getBarStarts(self, period, first_ts, last_ts):
+		'''Generate sorted bar start timestamps covering `first_ts` to `last_ts`.
+
+		Bars keep the alignment of `first_ts` until the first weekend, after which each
+		week is anchored to its open and runs to its close.
+		'''
+
+		off = tl.period.getPeriodOffsetSeconds(period)
+		first_ts = int(first_ts)
+		last_ts = int(last_ts)
+
+		if off > ONE_DAY:
+			starts = []
+			ts = first_ts
+			while ts <= last_ts:
+				starts.append(ts)
+				ts = int(self.getNextTimestamp(period, ts))
+			return np.array(starts, dtype=np.int64)
+
+		lo = np.searchsorted(self.opens, first_ts + off, side='right')
+		hi = np.searchsorted(self.opens, last_ts, side='right')
+		frags = [
+			np.array([first_ts], dtype=np.int64),
+			np.arange(first_ts, min(self.closes[lo], last_ts) + 1, off, dtype=np.int64)
+		]
+		for week_start, week_end in zip(self.opens[lo:hi], self.closes[lo+1:hi+1]):
+			frags.append(np.arange(week_start, min(week_end, last_ts) + 1, off, dtype=np.int64))
+
+		return np.unique(np.concatenate(frags))
@@ -0,0 +1,154 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+from app import tradelib as tl
+
+ASK = 'ask'
+BID = 'bid'
+# Triggered when the bar's low reaches down to the level
+BELOW = 'below'
+# Triggered when the bar's high reaches up to the level
+ABOVE = 'above'
+
+
+def getStopLossTrigger(pos):
+	if not pos.get('sl'):
+		return None
+	if pos['direction'] == tl.LONG:
+		return BID, BELOW, pos['sl']
+	else:
+		return ASK, ABOVE, pos['sl']
+
+
+def getTakeProfitTrigger(pos):
+	if not pos.get('tp'):
+		return None
+	if pos['direction'] == tl.LONG:
+		return BID, ABOVE, pos['tp']
+	else:
+		return ASK, BELOW, pos['tp']
+
+
+def getEntryTrigger(order):
+	if order.get('entry_price') is None:
+		return None
+	if order['order_type'] == tl.LIMIT_ORDER:
+		if order['direction'] == tl.LONG:
+			return ASK, BELOW, order['entry_price']
+		else:
+			return BID, ABOVE, order['entry_price']
+	elif order['order_type'] == tl.STOP_ORDER:
+		if order['direction'] == tl.LONG:
+			return ASK, ABOVE, order['entry_price']
+		else:
+			return BID, BELOW, order['entry_price']
+	return None
+
+
+class TriggerBook(object):
+	'''Trigger prices of open positions or orders, sorted per (product, price, direction).
+
+	Each entry has at most one trigger, given by `get_trigger` as (ask or bid,
+	below or above, level). Levels are kept in sorted lists, so the entries
+	triggered by a bar are found with one bisect per list instead of checking
+	every entry.
+
+	`sync` takes the entries from `TradeStore.getCached`. The book is unchanged
+	while the same list is passed back, otherwise only entries that were added,
+	removed or replaced are moved. Only entries of `account_id` are indexed.
+	'''
+
+	def __init__(self, get_trigger, account_id=None):
+		self.get_trigger = get_trigger
+		self.account_id = account_id
+
+		# Maps (product, side, direction) to a sorted list of (level, rank, order_id)
+		self._books = {}
+		# Maps order_id to (entry, rank, book key, level), key is None when not indexed
+		self._entries = {}
+		self._items = None
+		self._rank = 0
+
+
+	def __len__(self):
+		return len(self._entries)
+
+
+	def add(self, item, rank=None):
+		order_id = item['order_id']
+		if order_id in self._entries:
+			rank = self.remove(order_id)
+		if rank is None:
+			self._rank += 1
+			rank = self._rank
+
+		key = level = None
+		trigger = self.get_trigger(item)
+		if trigger is not None and (self.account_id is None or item.get('account_id') == self.account_id):
+			side, direction, level = trigger
+			key = (item['product'], side, direction)
+			insort(self._books.setdefault(key, []), (level, rank, order_id))
+
+		self._entries[order_id] = (item, rank, key, level)
+
+
+	def remove(self, order_id):
+		''' Returns the removed entry's rank '''
+
+		item, rank, key, level = self._entries.pop(order_id)
+		if key is not None:
+			book = self._books[key]
+			i = bisect_left(book, (level, rank, order_id))
+			del book[i]
+			if not len(book):
+				del self._books[key]
+		return rank
+
+
+	def sync(self, items):
+		''' Match the book to `items`, moving only entries whose object changed '''
+
+		if items is self._items:
+			return
+		self._items = items
+
+		current = {}
+		for item in items:
+			current[item['order_id']] = item
+			entry = self._entries.get(item['order_id'])
+			if entry is None:
+				self.add(item)
+			elif entry[0] is not item:
+				# Replaced entries keep their place in the order
+				self.add(item, entry[1])
+
+		for order_id in [i for i in self._entries if i not in current]:
+			self.remove(order_id)
+
+
+	def _get_range(self, key, low, high):
+		book = self._books.get(key)
+		if book is None:
+			return []
+
+		if key[2] == BELOW:
+			return book[bisect_left(book, (low,)):]
+		else:
+			return book[:bisect_right(book, (high, math.inf))]
+
+
+	def getTriggered(self, product, ask, bid):
+		'''Entries of `product` triggered by an ask and bid OHLC bar.
+
+		Returns:
+			The triggered entries in the order they were added.
+		'''
+
+		triggered = []
+		for side, ohlc in ((ASK, ask), (BID, bid)):
+			if math.isnan(ohlc[1]) or math.isnan(ohlc[2]):
+				continue
+			for direction in (BELOW, ABOVE):
+				triggered += self._get_range((product, side, direction), ohlc[2], ohlc[1])
+
+		triggered.sort(key=lambda x: x[1])
+		return [self._entries[order_id][0] for _, _, order_id in triggered]
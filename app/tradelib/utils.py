@@ -9,6 +9,8 @@ Utilities
 
 TS_START_DATE = datetime(year=2000, month=1, day=1)
 
+_calendar = None
+
 def convertToPips(x):
 	return round(x * 10000, 1)
 
@@ -37,22 +39,14 @@ def convertTimeToTimestamp(dt):
 def convertTimestampToTime(ts):
 	return setTimezone(datetime.utcfromtimestamp(ts), 'UTC')
 
-def isWeekend(dt):
-	if isOffsetAware(dt):
-		dt = convertTimezone(dt, 'America/New_York')
-	else:
-		dt = convertTimezone(setTimezone(dt, 'UTC'), 'America/New_York')
+def getTradingCalendar():
+	global _calendar
+	if _calendar is None:
+		_calendar = tl.TradingCalendar()
+	return _calendar
 
-	FRI = 4
-	SAT = 5
-	SUN = 6
-	
-	return (
-		(dt.weekday() == FRI and dt.hour >= 17 and dt.minute != 0) or
-		(dt.weekday() == FRI and dt.hour > 17) or
-		dt.weekday() == SAT or
-		(dt.weekday() == SUN and dt.hour < 17)
-	)
+def isWeekend(dt):
+	return getTradingCalendar().isWeekend(convertTimeToTimestamp(dt))
 
 def getWeekendDate(dt):
 	if isOffsetAware(dt):
@@ -86,43 +80,35 @@ def getWeekstartDate(dt):
 def getWeekendSecondsOffset(start, end):
 	ONE_MINUTE = 60.0
 	# Get weekend seconds offset
-	return sum(
-		ONE_MINUTE for x in range(int((end-start).total_seconds()/ONE_MINUTE)) 
-		if isWeekend(start + timedelta(seconds=x*ONE_MINUTE))
+	start_ts = convertTimeToTimestamp(start)
+	count = int((end-start).total_seconds()/ONE_MINUTE)
+	return count * ONE_MINUTE - getTradingCalendar().getTradingSeconds(
+		start_ts, start_ts + count * ONE_MINUTE, step=ONE_MINUTE
 	)
 
 def getWeeklySecondsOffset(start, end):
 	ONE_MINUTE = 60.0
-	# Get weekend seconds offset
-	return sum(
-		ONE_MINUTE for x in range(int((end-start).total_seconds()/ONE_MINUTE)) 
-		if not isWeekend(start + timedelta(seconds=x*ONE_MINUTE))
+	# Get weekly seconds offset
+	start_ts = convertTimeToTimestamp(start)
+	count = int((end-start).total_seconds()/ONE_MINUTE)
+	return getTradingCalendar().getTradingSeconds(
+		start_ts, start_ts + count * ONE_MINUTE, step=ONE_MINUTE
 	)
 
 def getCountDate(period, count, start=None, end=None):
-		off = tl.period.getPeriodOffsetSeconds(period)
-
-		if start:
-			date = start
-			direction = 1
-		elif end:
-			date = end
-			direction = -1
-		else:
-			date = datetime.utcnow()
-			direction = -1
-
-		x = 0
-		i = 0
-		while x < count:
-			if (
-				off >= tl.period.getPeriodOffsetSeconds(tl.period.WEEKLY) or
-				not isWeekend(date + timedelta(seconds=off*i*direction))
-			):
-				x += 1
-			i += 1
-
-		return date + timedelta(seconds=off*i*direction)
+	if start:
+		date = start
+		direction = 1
+	elif end:
+		date = end
+		direction = -1
+	else:
+		date = datetime.utcnow()
+		direction = -1
+
+	ts = convertTimeToTimestamp(date)
+	new_ts = getTradingCalendar().getCountTimestamp(period, count, ts, direction=direction)
+	return date + timedelta(seconds=new_ts-ts)
 
 def getDateCount(period, start, end):
 	off = tl.period.getPeriodOffsetSeconds(period)
@@ -141,34 +127,9 @@ def isCurrentBar(period, ts, off=1):
 
 
 def getNextTimestamp(period, ts, now=None):
-	new_ts = ts + tl.period.getPeriodOffsetSeconds(period)
-	dt = convertTimestampToTime(new_ts)
-	if isWeekend(dt):
-		new_ts = convertTimeToTimestamp(getWeekstartDate(dt))
-
-	if now is not None:
-		while new_ts < now:
-			new_ts += tl.period.getPeriodOffsetSeconds(period)
-			dt = convertTimestampToTime(new_ts)
-			if isWeekend(dt):
-				new_ts = convertTimeToTimestamp(getWeekstartDate(dt))
-		
-	return new_ts
+	return getTradingCalendar().getNextTimestamp(period, ts, now=now)
 
 
 def getPrevTimestamp(period, ts, now=None):
-	new_ts = ts - tl.period.getPeriodOffsetSeconds(period)
-	dt = convertTimestampToTime(new_ts)
-	if isWeekend(dt):
-		new_ts = convertTimeToTimestamp(getWeekendDate(dt - timedelta(days=7)))
-
-	if now is not None:
-		while new_ts > now:
-			new_ts -= tl.period.getPeriodOffsetSeconds(period)
-			dt = convertTimestampToTime(new_ts)
-			if isWeekend(dt):
-				new_ts = convertTimeToTimestamp(getWeekendDate(dt - timedelta(days=7)))
-		
-	return new_ts
-
+	return getTradingCalendar().getPrevTimestamp(period, ts, now=now)
 
@@ -8,6 +8,8 @@ import re, string, random
 import requests
 import shortuuid
 import traceback
+import struct
+import numpy as np
 import pandas as pd
 import stripe
 from stripe.error import CardError
@@ -1289,6 +1291,53 @@ def get_transaction_info_ept(strategy_id, broker_id, account_id):
 	)
 
 
+PRICES_PAGE_SIZE = 5000
+PRICES_MAX_PAGE_SIZE = 100000
+PRICES_ROW_GROUP = 2000
+PRICES_FORMATS = {
+	'application/json': 'json',
+	'application/x-ndjson': 'ndjson',
+	'application/octet-stream': 'binary'
+}
+
+def _stream_prices_json(product, period, ts, mids, cursor):
+	yield f'{{"product": {json.dumps(product)}, "period": {json.dumps(period)}, "ohlc": {{"timestamps": ['.encode('utf-8')
+	for i in range(0, ts.size, PRICES_ROW_GROUP):
+		sep = ', ' if i else ''
+		yield (sep + json.dumps(ts[i:i+PRICES_ROW_GROUP].tolist())[1:-1]).encode('utf-8')
+
+	yield '], "mids": ['.encode('utf-8')
+	for i in range(0, ts.size, PRICES_ROW_GROUP):
+		sep = ', ' if i else ''
+		yield (sep + json.dumps(mids[i:i+PRICES_ROW_GROUP].tolist())[1:-1]).encode('utf-8')
+
+	yield f']}}, "next": {json.dumps(cursor)}}}'.encode('utf-8')
+
+
+def _stream_prices_ndjson(ts, mids):
+	''' One `[timestamp, open, high, low, close]` array per line '''
+
+	for i in range(0, ts.size, PRICES_ROW_GROUP):
+		rows = np.column_stack((ts[i:i+PRICES_ROW_GROUP], mids[i:i+PRICES_ROW_GROUP]))
+		yield ''.join(json.dumps(x) + '\n' for x in rows.tolist()).encode('utf-8')
+
+
+def _stream_prices_binary(ts, mids):
+	'''Little-endian row groups of columnar data.
+
+	Each group is a uint32 row count `n`, `n` int64 timestamps then the open, high,
+	low and close columns as `n` float32 values each.
+	'''
+
+	for i in range(0, ts.size, PRICES_ROW_GROUP):
+		group_ts = ts[i:i+PRICES_ROW_GROUP]
+		yield (
+			struct.pack('<I', group_ts.size) +
+			group_ts.astype('<i8').tobytes() +
+			np.ascontiguousarray(mids[i:i+PRICES_ROW_GROUP].T, dtype='<f4').tobytes()
+		)
+
+
 # `/prices` ept
 @bp.route('/prices/<broker>/<product>/<period>', methods=('GET',))
 def get_historical_prices_ept(broker, product, period):
@@ -1309,40 +1358,51 @@ def get_historical_prices_ept(broker, product, period):
 			status=404, content_type='application/json'
 		)
 
-	# Convert time to datetime
-	if count or (_from and to):
-		try:
-			if count:
-				count = int(count)
-			if _from:
-				_from = tl.utils.setTimezone(
-					datetime.strptime(_from, '%Y-%m-%dT%H:%M:%SZ'), tz
-				)
-			if to:
-				to = tl.utils.setTimezone(
-					datetime.strptime(to, '%Y-%m-%dT%H:%M:%SZ'), tz
-				)
+	if not (count or (_from and to)):
+		res = {
+			'error': 'ValueError',
+			'message': 'Insufficient parameters. Use `from` and `to` or `count`.'
+		}
+		return Response(
+			json.dumps(res, indent=2), 
+			status=400,
+			content_type='application/json'
+		)
 
-		except ValueError as e:
-			res = {
-				'error': 'Value Error',
-				'message': 'Unrecognisable date format, use `%Y-%m-%dT%H:%M:%SZ`.'
-			}
-			return Response(
-				json.dumps(res, indent=2), 
-				status=400,
-				content_type='application/json'
+	# Convert time to datetime
+	try:
+		if count:
+			count = int(count)
+		if _from:
+			_from = tl.utils.setTimezone(
+				datetime.strptime(_from, '%Y-%m-%dT%H:%M:%SZ'), tz
+			)
+		if to:
+			to = tl.utils.setTimezone(
+				datetime.strptime(to, '%Y-%m-%dT%H:%M:%SZ'), tz
 			)
 
-		prices = broker._download_historical_data(
-			product, period, start=_from, end=to,
-			count=count, force_download=False
+	except ValueError as e:
+		res = {
+			'error': 'Value Error',
+			'message': 'Unrecognisable date format, use `%Y-%m-%dT%H:%M:%SZ`.'
+		}
+		return Response(
+			json.dumps(res, indent=2), 
+			status=400,
+			content_type='application/json'
 		)
-		
-	else:
+
+	# Resume after the last page
+	try:
+		limit = min(int(request.args.get('limit', PRICES_PAGE_SIZE)), PRICES_MAX_PAGE_SIZE)
+		cursor = request.args.get('cursor')
+		if cursor is not None:
+			cursor = float(cursor)
+	except ValueError:
 		res = {
 			'error': 'ValueError',
-			'message': 'Insufficient parameters. Use `from` and `to` or `count`.'
+			'message': '`limit` and `cursor` must be numbers.'
 		}
 		return Response(
 			json.dumps(res, indent=2), 
@@ -1350,51 +1410,87 @@ def get_historical_prices_ept(broker, product, period):
 			content_type='application/json'
 		)
 
-	page_count = 5000
-
-	# Get historical prices 
-	ts = prices.index.values[:page_count]
-	# asks = prices.values[:page_count, :4]
-	mids = prices.values[:page_count, 4:8]
-	# bids = prices.values[:page_count, 8:]
-	res = {
-		'product': product,
-		'period': period,
-		'ohlc': {
-			'timestamps': ts.tolist(),
-			# 'asks': asks.tolist(),
-			'mids': mids.tolist()
-			# 'bids': bids.tolist()
+	if limit < 1:
+		res = {
+			'error': 'ValueError',
+			'message': '`limit` must be at least 1.'
 		}
-	}
+		return Response(
+			json.dumps(res, indent=2), 
+			status=400,
+			content_type='application/json'
+		)
 
-	def data_stream(data):
-		data = json.dumps(data).encode('utf-8')
+	headers = {}
+	if period == tl.period.TICK or (cursor is None and count and count <= limit):
+		# Fits in one page
+		prices = broker.getHistoricalData(
+			product, period, start=_from, end=to,
+			count=count, force_download=False
+		)
+		if cursor is not None:
+			prices = prices.loc[prices.index >= cursor]
 
-		blocksize = 512
-		chunkindex = 0
-		chunkbyteoffest = 0
-		totalfilesize = len(data)
-		totalchunkcount = math.ceil(totalfilesize / blocksize)
+	else:
+		# Only load the bars of this page, `[page_start, page_end)`
+		calendar = tl.utils.getTradingCalendar()
+		start_ts = tl.convertTimeToTimestamp(_from) if _from else None
+		end_ts = tl.convertTimeToTimestamp(to) if to else None
+		if count and start_ts is None:
+			if end_ts is None:
+				end_ts = time.time()
+			# Step forward from the position before the `count`th bar
+			start_ts = (
+				calendar.getCountTimestamp(period, count, end_ts) +
+				tl.period.getPeriodOffsetSeconds(period)
+			)
+		elif count and end_ts is None:
+			end_ts = calendar.getCountTimestamp(period, count, start_ts, direction=1)
+
+		page_start = start_ts if cursor is None else cursor
+		page_end = calendar.getCountTimestamp(period, limit, page_start, direction=1)
+		prices = broker.getHistoricalData(
+			product, period,
+			start=tl.convertTimestampToTime(page_start),
+			end=tl.convertTimestampToTime(max(page_start, min(page_end, end_ts))),
+			force_download=False
+		)
 
-		while chunkindex < totalchunkcount:
-			t_data = data[chunkbyteoffest:chunkbyteoffest+blocksize]
-			yield(t_data)
+		if page_end <= end_ts:
+			prices = prices.loc[(prices.index >= page_start) & (prices.index < page_end)]
+			headers['X-Next-Cursor'] = str(int(page_end))
+		else:
+			prices = prices.loc[(prices.index >= page_start) & (prices.index <= end_ts)]
 
-			chunkindex += 1
-			chunkbyteoffest += blocksize
+	if prices.shape[0] > limit:
+		headers['X-Next-Cursor'] = str(int(prices.index.values[limit]))
+		prices = prices.iloc[:limit]
+
+	# Get historical prices 
+	ts = prices.index.values
+	mids = prices.values[:, 4:8]
+
+	fmt = request.args.get('format')
+	if fmt is None:
+		fmt = PRICES_FORMATS.get(request.accept_mimetypes.best_match(list(PRICES_FORMATS)), 'json')
+
+	if fmt == 'binary':
+		data_stream = _stream_prices_binary(ts, mids)
+		content_type = 'application/octet-stream'
+	elif fmt == 'ndjson':
+		data_stream = _stream_prices_ndjson(ts, mids)
+		content_type = 'application/x-ndjson'
+	else:
+		data_stream = _stream_prices_json(product, period, ts, mids, headers.get('X-Next-Cursor'))
+		content_type = 'application/json'
 
 	return Response(
-		stream_with_context(data_stream(res)),
+		stream_with_context(data_stream),
 		status=200,
-		content_type='application/json'
+		content_type=content_type,
+		headers=headers
 	)
 
-	# return Response(
-	# 	res, 
-	# 	status=200,
-	# 	content_type='application/json'
-	# )
 
 # `/gui` ept
 @bp.route('/strategy/<strategy_id>/gui', methods=('GET',))
@@ -1844,35 +1940,27 @@ def ontick_ept(strategy_id):
 	account = ctrl.accounts.getAccount(user_id)
 	broker = account.getStrategyBroker(strategy_id)
 
-	s_buffer = []
-	def append_buffer(item):
-		item = json.dumps(item) + '\n'
-		print(item)
-		s_buffer.append(item.encode('utf-8'))
-
-	def data_stream(subs):
-		try:
-			while True:
-				for i in range(len(s_buffer)-1,-1,-1):
-					yield(s_buffer.pop(i))
-				greenthread.sleep(0)
-		except GeneratorExit:
-			for sub in subs:
-				sub[0].unsubscribe(sub[1], sub[2], sub[3])
-
 	# Schema: { $product: [$periods] }
 	charts_req = getJson()
 	subs = []
+	def unsubscribe():
+		for sub in subs:
+			sub[0].unsubscribe(sub[1], sub[2], sub[3])
+
+	subscription = tl.Subscription(
+		on_close=unsubscribe,
+		heartbeat=ctrl.app.config.get('STREAM_HEARTBEAT', 15)
+	)
 	for product, v in charts_req.items():
-		chart = ctrl.charts.getChart(broker.name, product)
+		chart = ctrl.charts.getChart(broker, product)
 		for period in v:
 			# TODO: Validation
 			sub_id = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
-			chart.subscribe(period, strategy_id, sub_id, append_buffer)
+			chart.subscribe(period, strategy_id, sub_id, subscription.put)
 			subs.append((chart, period, strategy_id, sub_id))
 
 	return Response(
-		stream_with_context(data_stream(subs)),
+		stream_with_context(subscription.stream()),
 		status=200,
 		content_type='application/json'
 	)
@@ -1884,24 +1972,15 @@ def ontrade_ept(strategy_id):
 	account = ctrl.accounts.getAccount(user_id)
 	broker = account.getStrategyBroker(strategy_id)
 
-	s_buffer = []
-	def append_buffer(item):
-		s_buffer.append(json.dumps(item).encode('utf-8'))
-
-	def data_stream(sub_id):
-		try:
-			while True:
-				for i in range(len(s_buffer)-1,-1,-1):
-					yield(s_buffer.pop(i))
-
-		except GeneratorExit:
-			broker.unsubscribeOnTrade(sub_id)
-
 	sub_id = ''.join(random.choice(string.ascii_lowercase) for i in range(10))
-	broker.subscribeOnTrade(append_buffer, sub_id)
+	subscription = tl.Subscription(
+		on_close=lambda: broker.unsubscribeOnTrade(sub_id),
+		heartbeat=ctrl.app.config.get('STREAM_HEARTBEAT', 15)
+	)
+	broker.subscribeOnTrade(subscription.put, sub_id)
 
 	return Response(
-		stream_with_context(data_stream(sub_id)),
+		stream_with_context(subscription.stream()),
 		status=200,
 		content_type='application/json'
 	)
@@ -0,0 +1,74 @@
+'''
+Paper trading fill latency: tl.AccountState serving reads from memory and
+journaling each write before it returns, against writing straight to the
+TradeStore. Needs a running redis-server.
+
+Each fill deletes an order, appends a position and reads the positions back
+for the next tick check.
+
+Usage: python benchmarks/accountstate.py [--fills 1000] [--positions 100] [--host localhost] [--port 6379]
+'''
+
+import time
+import argparse
+from common import tl, printTable, addRedisArguments, redisClient
+
+NAMES = ('positions', 'orders')
+
+
+def item(i):
+	return {
+		'order_id': str(i), 'account_id': 'papertrader', 'product': 'EUR_USD',
+		'direction': 'long', 'lotsize': 1.0, 'entry_price': 1.1, 'sl': 1.0, 'tp': 1.2
+	}
+
+
+def fill(stores, fills, positions):
+	stores['positions'].setAll([item(i) for i in range(positions)])
+	stores['orders'].setAll([item(i) for i in range(positions, positions + fills)])
+
+	start = time.time()
+	for i in range(positions, positions + fills):
+		stores['orders'].delete(str(i))
+		stores['positions'].append(item(i))
+		stores['positions'].getCached(dict)
+	return (time.time() - start) / fills * 1e6
+
+
+def run(client, fills, positions):
+	key = 'benchmark.account'
+	state = tl.AccountState(client, key, 'benchmark')
+	for view in state.views.values():
+		view.clear()
+	client.delete(state.owner_key, state.journal_key, state.snapshot_key)
+
+	result = { 'fills': fills, 'positions': positions }
+	result['direct_fill_us'] = fill(
+		{ name: tl.TradeStore(client, f'{key}:{name}') for name in NAMES }, fills, positions
+	)
+
+	state.acquire()
+	result['state_fill_us'] = fill(
+		{ name: state.getStore(name) for name in NAMES }, fills, positions
+	)
+
+	start = time.time()
+	state.flush()
+	result['flush_ms'] = (time.time() - start) * 1000
+	state.close()
+
+	for view in state.views.values():
+		view.clear()
+	client.delete(state.owner_key, state.journal_key, state.snapshot_key)
+	return result
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--fills', type=int, default=1000)
+	parser.add_argument('--positions', default='100,1000')
+	addRedisArguments(parser)
+	args = parser.parse_args()
+
+	client = redisClient(args)
+	printTable([run(client, args.fills, int(i)) for i in args.positions.split(',')])
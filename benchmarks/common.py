@@ -0,0 +1,64 @@
+'''
+Helpers shared by the benchmark scripts.
+
+The scripts are run from the repository root inside the app's environment,
+e.g. `python benchmarks/resampler.py`.
+'''
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import tradelib as tl
+
+
+def syntheticM1(days=365, start=1577836800, seed=0):
+	'''Random walk M1 rows with weekends removed and ~5% of minutes missing.
+
+	Returns:
+		A tuple of the float timestamps and the (rows x 12) ask/mid/bid OHLC array.
+	'''
+
+	rng = np.random.default_rng(seed)
+	timestamps = np.arange(start, start + days * 60*60*24, 60)
+	timestamps = timestamps[rng.random(timestamps.size) > 0.05]
+	timestamps = timestamps[~tl.utils.getTradingCalendar().isWeekend(timestamps, include_bounds=True)].astype(float)
+
+	price = 1.1 + np.cumsum(rng.normal(0, 1e-4, timestamps.size))
+	values = np.empty((timestamps.size, 12), dtype=float)
+	for i in range(0, 12, 4):
+		values[:, i] = price
+		values[:, i+1] = price + rng.random(timestamps.size) * 1e-4
+		values[:, i+2] = price - rng.random(timestamps.size) * 1e-4
+		values[:, i+3] = price + rng.normal(0, 3e-5, timestamps.size)
+	return timestamps, np.around(values, decimals=5)
+
+
+def addRedisArguments(parser):
+	''' Connection options for the benchmarks that need a running redis-server '''
+	parser.add_argument('--host', default='localhost')
+	parser.add_argument('--port', type=int, default=6379)
+	parser.add_argument('--password', default=None)
+
+
+def redisClient(args):
+	from redis import Redis
+	return Redis(host=args.host, port=args.port, password=args.password)
+
+
+def printTable(rows):
+	if not len(rows):
+		return
+	columns = list(rows[0].keys())
+	widths = [max(len(str(c)), *[len(_format(r[c])) for r in rows]) for c in columns]
+	print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+	for row in rows:
+		print('  '.join(_format(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _format(value):
+	if isinstance(value, float):
+		return f'{value:.4g}'
+	return str(value)
@@ -0,0 +1,113 @@
+'''
+Count-based history reads, DataSaver._get_count on a temporary PriceStore
+against the previous implementation, kept below as `loopGetCount`.
+
+`loopGetCount` walks back one UTC day at a time and resamples the rows not yet
+in a complete bar with the previous per-row loop on every step. The results
+are not byte-identical, the new reader resamples once with the trading
+calendar's week anchoring:
+
+- M15 and H1 keep every label. The previous reader opened the first bar of
+  each UTC day on that day's first row, the new one opens it on the previous
+  bar's close like every other bar, so those opens differ.
+- H4 bars were aligned to UTC midnight of the earliest pending day, they now
+  start at the 17:00 New York week open, so every label differs.
+- D bars ran from UTC midnight and the previous reader emitted duplicate,
+  Saturday-labelled bars around each weekend. They now run 17:00 to 17:00
+  New York time, one per trading day.
+
+`label_diffs` counts timestamps in only one result, `value_diffs` bars with
+the same timestamp and different prices.
+
+Usage: python benchmarks/datasaver_count.py [--days 730]
+'''
+
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from common import tl, syntheticM1, printTable
+from resampler import loopConstructBars
+
+PRODUCT = 'EUR_USD'
+ONE_DAY = 60*60*24
+
+
+def loopGetCount(store, period, count):
+	''' Previous DataSaver._get_count, reading day by day from the store instead of daily CSV files '''
+
+	load_period = tl.period.ONE_MINUTE
+	first_day = store.readRows(PRODUCT, load_period)['timestamp'][0] // ONE_DAY * ONE_DAY
+	day = store.getLastTimestamp(PRODUCT, load_period) // ONE_DAY * ONE_DAY
+
+	result = tl.resampler.toDataFrame(np.zeros((0,)), np.zeros((0, 12)))
+	temp_data = result
+	while result.shape[0] < count and day >= first_day:
+		data = store.read(PRODUCT, load_period, start_ts=day, end_ts=day + ONE_DAY)
+		if data.shape[0] > 0:
+			temp_data = pd.concat((data, temp_data))
+			complete_data = loopConstructBars(period, temp_data)
+			result = pd.concat((complete_data, result))
+			if complete_data.size > 0:
+				temp_data = temp_data.loc[temp_data.index < complete_data.index.values[0]]
+
+		day -= ONE_DAY
+
+	return result.iloc[-count:]
+
+
+def compare(result, expected):
+	common = expected.index.intersection(result.index)
+	return {
+		'label_diffs': len(expected.index.symmetric_difference(result.index)),
+		'value_diffs': int((~np.isclose(
+			expected.loc[common].values.astype(float), result.loc[common].values.astype(float)
+		)).any(axis=1).sum())
+	}
+
+
+def run(days, counts, periods):
+	data_dir = tempfile.mkdtemp()
+	try:
+		timestamps, values = syntheticM1(days)
+		saver = tl.DataSaver(SimpleNamespace(name='benchmark'))
+		saver.store = tl.PriceStore('benchmark', data_dir=data_dir)
+		saver.store.write(PRODUCT, tl.period.ONE_MINUTE, tl.resampler.toDataFrame(timestamps, values))
+		print(f'{timestamps.size} M1 rows in {len(saver.store.getMonths(PRODUCT, tl.period.ONE_MINUTE))} months')
+
+		results = []
+		for period in periods:
+			for count in counts:
+				start = time.time()
+				result = saver._get_count(PRODUCT, period, count)
+				elapsed = time.time() - start
+
+				start = time.time()
+				expected = loopGetCount(saver.store, period, count)
+				loop_elapsed = time.time() - start
+
+				results.append({
+					'period': period,
+					'count': count,
+					'loop_s': loop_elapsed,
+					'seconds': elapsed,
+					'bars': result.shape[0],
+					**compare(result, expected)
+				})
+
+		printTable(results)
+
+	finally:
+		shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--days', type=int, default=730)
+	parser.add_argument('--counts', default='1000,5000')
+	parser.add_argument('--periods', default='M15,H1,H4,D')
+	args = parser.parse_args()
+	run(args.days, [int(i) for i in args.counts.split(',')], args.periods.split(','))
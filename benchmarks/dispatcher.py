@@ -0,0 +1,104 @@
+'''
+Chart tick fan-out: tl.TickDispatcher against starting a thread per callback,
+as Chart.handleTick did before it.
+
+Usage: python benchmarks/dispatcher.py [--ticks 20000] [--subscribers 50] [--workers 2] [--work 0]
+'''
+
+import time
+import random
+import argparse
+from threading import Thread
+from common import tl, printTable
+
+
+def generateTicks(product, count, period='M1', bar_every=60, seed=None):
+	''' Synthetic chart results as produced by `Broker.onChartUpdate` '''
+
+	rand = random.Random(seed)
+	price = 1.1
+	ts = 1600000000
+	for i in range(count):
+		price += rand.gauss(0, 1e-5)
+		ohlc = [round(price, 5)] * 4
+		bar_end = i % bar_every == bar_every - 1
+		yield [{
+			'broker': 'synthetic',
+			'product': product,
+			'period': period,
+			'bar_end': bar_end,
+			'timestamp': ts,
+			'item': { 'ask': ohlc, 'mid': ohlc, 'bid': ohlc }
+		}]
+		if bar_end:
+			ts += 60
+
+
+def runDispatcher(ticks, subscribers, workers, work):
+	''' Push synthetic ticks through a dispatcher as fast as they are generated '''
+
+	dispatcher = tl.TickDispatcher(workers=workers, name='benchmark')
+	funcs = [lambda x: time.sleep(work) if work else None for _ in range(subscribers)]
+
+	start = time.time()
+	for result in generateTicks('EUR_USD', ticks, seed=0):
+		for res in result:
+			for i, func in enumerate(funcs):
+				dispatcher.dispatch(i, func, res)
+	enqueued = time.time() - start
+
+	while dispatcher.getStats()['subscribers']:
+		time.sleep(0.001)
+
+	stats = dispatcher.getStats()
+	return {
+		'method': 'dispatcher',
+		'dispatches': ticks * subscribers,
+		'dispatch_us': enqueued / (ticks * subscribers) * 1e6,
+		'total_s': time.time() - start,
+		'coalesced': stats['coalesced'],
+		'latency_max_s': stats['latency_max']
+	}
+
+
+def runThreads(ticks, subscribers, work):
+	''' Previous behaviour, one thread started per callback '''
+
+	funcs = [lambda x: time.sleep(work) if work else None for _ in range(subscribers)]
+	threads = []
+
+	start = time.time()
+	for result in generateTicks('EUR_USD', ticks, seed=0):
+		for res in result:
+			for func in funcs:
+				t = Thread(target=func, args=(res,))
+				t.start()
+				threads.append(t)
+	enqueued = time.time() - start
+
+	for t in threads:
+		t.join()
+
+	return {
+		'method': 'thread per callback',
+		'dispatches': ticks * subscribers,
+		'dispatch_us': enqueued / (ticks * subscribers) * 1e6,
+		'total_s': time.time() - start,
+		'coalesced': 0,
+		'latency_max_s': float('nan')
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--ticks', type=int, default=20000)
+	parser.add_argument('--subscribers', type=int, default=50)
+	parser.add_argument('--workers', type=int, default=2)
+	parser.add_argument('--work', type=float, default=0.0)
+	args = parser.parse_args()
+
+	printTable([
+		runDispatcher(args.ticks, args.subscribers, args.workers, args.work),
+		# Starting threads is slow, keep the run short
+		runThreads(max(args.ticks // 20, 1), args.subscribers, args.work)
+	])
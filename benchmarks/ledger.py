@@ -0,0 +1,101 @@
+'''
+Persisting transactions in batches: tl.TransactionLedger against appending to
+a DataFrame with `.loc` and rewriting the whole gzipped CSV on every save.
+
+Usage: python benchmarks/ledger.py [--rows 50000] [--flush-every 100]
+'''
+
+import io
+import time
+import gzip
+import argparse
+import warnings
+import pandas as pd
+from common import tl, printTable
+
+
+class MemoryStorage(object):
+	''' Ledger storage kept in memory, counting the bytes written '''
+
+	def __init__(self):
+		self.objects = {}
+		self.bytes_written = 0
+
+	def get(self, name):
+		return self.objects.get(name)
+
+	def put(self, name, body):
+		self.bytes_written += len(body)
+		self.objects[name] = body
+
+	def delete(self, names):
+		for name in names:
+			self.objects.pop(name, None)
+
+	def getLegacy(self):
+		return None
+
+
+def row(i):
+	return {
+		'timestamp': 1600000000 + i, 'type': 'marketentry', 'accepted': True,
+		'order_id': str(i), 'account_id': 'papertrader', 'product': 'EUR_USD',
+		'order_type': 'market', 'direction': 'long', 'lotsize': 1.0,
+		'entry_price': 1.1, 'close_price': None, 'sl': 1.09, 'tp': 1.11,
+		'open_time': 1600000000 + i, 'close_time': None
+	}
+
+
+def run(rows, flush_every):
+	storage = MemoryStorage()
+	ledger = tl.TransactionLedger(storage)
+	start = time.time()
+	for i in range(rows):
+		ledger.append(str(i), row(i))
+		if i % flush_every == flush_every - 1:
+			ledger.flush()
+	ledger.flush()
+	ledger_elapsed = time.time() - start
+	ledger_bytes = storage.bytes_written
+
+	columns = ['reference_id'] + [name for name, _ in tl.ledger.COLUMNS[1:]]
+	saved = pd.DataFrame(columns=columns).set_index('reference_id')
+	pending = pd.DataFrame(columns=columns).set_index('reference_id')
+	csv_bytes = 0
+	start = time.time()
+	for i in range(rows):
+		pending.loc[str(i)] = row(i)
+		if i % flush_every == flush_every - 1:
+			saved = pd.concat((saved, pending))
+			pending = pd.DataFrame(columns=columns).set_index('reference_id')
+			s_buf = io.StringIO()
+			saved.to_csv(s_buf)
+			csv_bytes += len(gzip.compress(s_buf.getvalue().encode('utf-8')))
+	csv_elapsed = time.time() - start
+
+	start = time.time()
+	count = len(ledger.read())
+	read_elapsed = time.time() - start
+
+	return {
+		'rows': rows,
+		'flush_every': flush_every,
+		'ledger_s': ledger_elapsed,
+		'ledger_bytes_written': ledger_bytes,
+		'csv_s': csv_elapsed,
+		'csv_bytes_written': csv_bytes,
+		'segments': len(ledger.getManifest()['segments']),
+		'read_rows': count,
+		'read_s': read_elapsed
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--rows', type=int, default=50000)
+	parser.add_argument('--flush-every', type=int, default=100)
+	args = parser.parse_args()
+
+	# Newer pandas warns on every concat of the legacy object-dtype frames
+	warnings.simplefilter('ignore', FutureWarning)
+	printTable([run(args.rows, args.flush_every)])
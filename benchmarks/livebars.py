@@ -0,0 +1,44 @@
+'''
+Ticks per second applied to one chart's current bars by tl.LiveBars.
+
+Usage: python benchmarks/livebars.py [--ticks 100000]
+'''
+
+import time
+import argparse
+import numpy as np
+from common import tl, printTable
+
+PERIODS = [
+	tl.period.ONE_MINUTE, tl.period.TWO_MINUTES, tl.period.THREE_MINUTES,
+	tl.period.FIVE_MINUTES, tl.period.TEN_MINUTES, tl.period.FIFTEEN_MINUTES,
+	tl.period.THIRTY_MINUTES, tl.period.ONE_HOUR, tl.period.TWO_HOURS,
+	tl.period.THREE_HOURS, tl.period.FOUR_HOURS, tl.period.DAILY,
+	tl.period.WEEKLY, tl.period.MONTHLY
+]
+
+
+def run(ticks, periods):
+	bars = tl.LiveBars('benchmark', 'EUR_USD', periods)
+	ts = 1600041600
+	for period in periods:
+		bars.setBar(period, ts, [1.1]*4, [1.1]*4, [1.1]*4)
+
+	prices = 1.1 + np.cumsum(np.random.default_rng(0).normal(0, 1e-5, ticks))
+	start = time.time()
+	for i in range(ticks):
+		bars.tick(ts + i * 0.5, prices[i] + 0.0001, prices[i])
+	elapsed = time.time() - start
+
+	return {
+		'ticks': ticks,
+		'periods': len(periods),
+		'ticks_per_s': ticks / elapsed
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--ticks', type=int, default=100000)
+	args = parser.parse_args()
+	printTable([run(args.ticks, PERIODS)])
@@ -0,0 +1,107 @@
+'''
+Bar construction from a year of M1 rows: tl.resampler against the per-row
+loop DataSaver._construct_bars used before it, kept below as `loopConstructBars`.
+
+The loop labels a one-row bar after an empty bar one period early (M2) and the
+last bar of the first, UTC-aligned week with the next Sunday (H4, D), so those
+show up as label differences.
+
+Usage: python benchmarks/resampler.py [--days 365] [--periods M2,M5,M15,H1,H4,D]
+'''
+
+import time
+import argparse
+import numpy as np
+from datetime import datetime
+from common import tl, syntheticM1, printTable
+
+
+def loopConstructBars(period, data):
+	''' Previous DataSaver._construct_bars '''
+
+	if data.size > 0 and period != tl.period.ONE_MINUTE:
+		first_data_ts = tl.convertTimeToTimestamp(datetime.utcfromtimestamp(data.index.values[0]).replace(
+			hour=0, minute=0, second=0, microsecond=0
+		))
+		first_ts = data.index.values[0] - ((data.index.values[0] - first_data_ts) % tl.period.getPeriodOffsetSeconds(period))
+		next_ts = tl.utils.getNextTimestamp(period, first_ts, now=data.index.values[0])
+		data = data.loc[data.index >= first_ts]
+		timestamps = np.zeros((data.shape[0],), dtype=float)
+		result = np.zeros(data.shape, dtype=float)
+
+		idx = 0
+		passed_count = 1
+		for i in range(1, data.shape[0]+1):
+			if i == data.shape[0]:
+				ts = tl.utils.getNextTimestamp(period, data.index.values[i-1], now=data.index.values[i-1])
+			else:
+				ts = data.index.values[i]
+
+			if ts >= next_ts:
+				timestamps[idx] = next_ts - tl.period.getPeriodOffsetSeconds(period)
+				next_ts = tl.utils.getNextTimestamp(period, next_ts, now=ts)
+
+				if i - passed_count == 0:
+					open_idx = (i-passed_count, 0), (i-passed_count, 4), (i-passed_count, 8)
+				else:
+					open_idx = (i-passed_count-1, 3), (i-passed_count-1, 7), (i-passed_count-1, 11)
+
+				rows = data.values[i-passed_count:i]
+				result[idx] = [
+					data.values[open_idx[0]], np.amax(rows[:, 1]), np.amin(rows[:, 2]), data.values[i-1, 3],
+					data.values[open_idx[1]], np.amax(rows[:, 5]), np.amin(rows[:, 6]), data.values[i-1, 7],
+					data.values[open_idx[2]], np.amax(rows[:, 9]), np.amin(rows[:, 10]), data.values[i-1, 11]
+				]
+
+				idx += 1
+				passed_count = 1
+			else:
+				passed_count += 1
+
+		return tl.resampler.toDataFrame(timestamps[:idx], result[:idx])
+
+	else:
+		return data
+
+
+def run(days, periods):
+	timestamps, values = syntheticM1(days)
+	data = tl.resampler.toDataFrame(timestamps, values)
+	print(f'{timestamps.size} M1 rows')
+
+	start = time.time()
+	tl.resampler.constructAllBars(periods, timestamps, values)
+	all_elapsed = time.time() - start
+
+	results = []
+	for period in periods:
+		start = time.time()
+		expected = loopConstructBars(period, data)
+		loop_elapsed = time.time() - start
+
+		start = time.time()
+		bar_ts, bars = tl.resampler.constructBars(period, timestamps, values)
+		vector_elapsed = time.time() - start
+		result = tl.resampler.toDataFrame(bar_ts, bars)
+
+		common = expected.index.intersection(result.index)
+		results.append({
+			'period': period,
+			'loop_s': loop_elapsed,
+			'vector_s': vector_elapsed,
+			'speedup': loop_elapsed / vector_elapsed,
+			'bars': result.shape[0],
+			'label_diffs': len(expected.index.symmetric_difference(result.index)),
+			'value_diffs': int((~np.isclose(expected.loc[common].values, result.loc[common].values)).any(axis=1).sum())
+		})
+
+	printTable(results)
+	print(f'constructAllBars({",".join(periods)}): {all_elapsed:.4f}s')
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--days', type=int, default=365)
+	parser.add_argument('--periods', default='M2,M5,M15,H1,H4,D')
+	args = parser.parse_args()
+	run(args.days, args.periods.split(','))
@@ -0,0 +1,90 @@
+'''
+CPU held by open streaming responses: tl.Subscription against the previous
+buffer loop, which spun on a zero sleep between polls.
+
+Each stream is drained by its own thread, as uWSGI would.
+
+Usage: python benchmarks/subscription.py [--streams 1000] [--idle 5] [--rate 0] [--spinning 4]
+'''
+
+import os
+import time
+import json
+import argparse
+from threading import Thread, Event
+from common import tl, printTable
+
+
+def measure(name, streams, puts, idle, rate, stop):
+	cpu_start = time.process_time()
+	start = time.time()
+	while time.time() - start < idle:
+		if rate > 0:
+			for put in puts:
+				put({ 'timestamp': time.time() })
+			time.sleep(1.0 / rate)
+		else:
+			time.sleep(0.1)
+	elapsed = time.time() - start
+	cpu = time.process_time() - cpu_start
+	stop()
+
+	return {
+		'stream': name,
+		'streams': streams,
+		'cpu_s': cpu,
+		'cpu_pct_per_stream': cpu / elapsed / streams * 100,
+		'cores': os.cpu_count()
+	}
+
+
+def runSubscriptions(streams, idle, rate, heartbeat):
+	subs = [tl.Subscription(heartbeat=heartbeat) for _ in range(streams)]
+
+	def consume(sub):
+		for _ in sub.stream():
+			pass
+
+	for sub in subs:
+		Thread(target=consume, args=(sub,), daemon=True).start()
+
+	def stop():
+		for sub in subs:
+			sub.close()
+
+	return measure('subscription', streams, [sub.put for sub in subs], idle, rate, stop)
+
+
+def runSpinning(streams, idle, rate):
+	''' Previous /stream/ontick loop '''
+
+	done = Event()
+	buffers = [[] for _ in range(streams)]
+
+	def consume(s_buffer):
+		while not done.is_set():
+			for i in range(len(s_buffer)-1, -1, -1):
+				s_buffer.pop(i)
+			time.sleep(0)
+
+	for s_buffer in buffers:
+		Thread(target=consume, args=(s_buffer,), daemon=True).start()
+
+	puts = [lambda item, b=b: b.append((json.dumps(item) + '\n').encode('utf-8')) for b in buffers]
+	return measure('spinning', streams, puts, idle, rate, done.set)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--streams', type=int, default=1000)
+	parser.add_argument('--idle', type=float, default=5.0)
+	parser.add_argument('--rate', type=float, default=0.0)
+	parser.add_argument('--heartbeat', type=float, default=1.0)
+	# Spinning streams each take a core, so only a few are run
+	parser.add_argument('--spinning', type=int, default=4)
+	args = parser.parse_args()
+
+	printTable([
+		runSubscriptions(args.streams, args.idle, args.rate, args.heartbeat),
+		runSpinning(args.spinning, args.idle, args.rate)
+	])
@@ -0,0 +1,62 @@
+'''
+Per-tick stop loss scan cost for one broker holding many open positions:
+tl.TradeStore.getCached against decoding the previous single JSON list on
+every tick. Needs a running redis-server.
+
+Usage: python benchmarks/tradestore.py [--positions 500] [--ticks 1000] [--host localhost] [--port 6379]
+'''
+
+import time
+import json
+import argparse
+from common import tl, printTable, addRedisArguments, redisClient
+
+
+def run(client, positions, ticks):
+	store = tl.TradeStore(client, 'benchmark:positions')
+	store.clear()
+
+	items = [
+		{
+			'order_id': str(i), 'account_id': 'papertrader', 'product': 'EUR_USD',
+			'direction': 'long', 'lotsize': 1.0, 'entry_price': 1.1, 'sl': 1.0, 'tp': 1.2
+		}
+		for i in range(positions)
+	]
+	store.setAll(items)
+	client.hset('benchmark:broker', 'positions', json.dumps(items))
+
+	start = time.time()
+	for i in range(ticks):
+		for pos in store.getCached(dict):
+			pos['sl']
+		if i % 100 == 0:
+			store.replace(dict(items[i % positions], sl=0.9))
+	cached_elapsed = time.time() - start
+
+	start = time.time()
+	for i in range(ticks):
+		for pos in json.loads(client.hget('benchmark:broker', 'positions')):
+			dict(pos)['sl']
+	list_elapsed = time.time() - start
+
+	store.clear()
+	client.delete('benchmark:broker')
+
+	return {
+		'positions': positions,
+		'ticks': ticks,
+		'cached_ticks_per_s': ticks / cached_elapsed,
+		'list_ticks_per_s': ticks / list_elapsed
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--positions', default='100,500,2000')
+	parser.add_argument('--ticks', type=int, default=1000)
+	addRedisArguments(parser)
+	args = parser.parse_args()
+
+	client = redisClient(args)
+	printTable([run(client, int(i), args.ticks) for i in args.positions.split(',')])
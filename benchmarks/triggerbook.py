@@ -0,0 +1,63 @@
+'''
+Stop loss checks per second at each number of open positions:
+tl.TriggerBook.getTriggered against a linear scan of every position.
+
+Usage: python benchmarks/triggerbook.py [--sizes 1,100,10000] [--ticks 10000]
+'''
+
+import time
+import random
+import argparse
+from common import tl, printTable
+
+
+def run(size, ticks, rand):
+	positions = []
+	for i in range(size):
+		direction = tl.LONG if i % 2 else tl.SHORT
+		offset = rand.uniform(0.001, 0.05)
+		positions.append({
+			'order_id': str(i), 'account_id': 'papertrader', 'product': 'EUR_USD',
+			'direction': direction, 'sl': round(1.1 - offset if direction == tl.LONG else 1.1 + offset, 5)
+		})
+
+	book = tl.TriggerBook(tl.triggerbook.getStopLossTrigger)
+	start = time.time()
+	book.sync(positions)
+	build = time.time() - start
+
+	prices = [1.1 + rand.gauss(0, 0.0005) for _ in range(ticks)]
+
+	start = time.time()
+	for price in prices:
+		ohlc = [price]*4
+		book.getTriggered('EUR_USD', ohlc, ohlc)
+	book_elapsed = time.time() - start
+
+	start = time.time()
+	for price in prices:
+		triggered = []
+		for pos in positions:
+			if pos['product'] != 'EUR_USD' or not pos['sl']:
+				continue
+			if ((pos['direction'] == tl.LONG and price <= pos['sl']) or
+				(pos['direction'] == tl.SHORT and price >= pos['sl'])):
+				triggered.append(pos)
+	scan_elapsed = time.time() - start
+
+	return {
+		'entries': size,
+		'build_ms': build * 1000,
+		'book_ticks_per_s': ticks / book_elapsed,
+		'scan_ticks_per_s': ticks / scan_elapsed
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', default='1,100,10000')
+	parser.add_argument('--ticks', type=int, default=10000)
+	args = parser.parse_args()
+
+	rand = random.Random(0)
+	printTable([run(int(i), args.ticks, rand) for i in args.sizes.split(',')])
@@ -0,0 +1,184 @@
+'''
+End-to-end latency of the ZMQ send path against a stand-in broker process.
+
+The stand-in binds a ROUTER socket where the workers' DEALER connects and
+replies to every message on a PUSH socket, like the zmq_broker service
+answering a broker request. Controller.zmq_send_loop is compared against the
+previous loop, which polled a list every 10ms and sent with send_json.
+
+Usage: python benchmarks/zmq_send.py [--requests 300] [--burst 50000]
+'''
+
+import os
+import time
+import json
+import argparse
+import threading
+import multiprocessing as mp
+import zmq
+from collections import deque
+from types import SimpleNamespace
+from common import printTable
+from app.controller import Controller, msgpack
+
+ROUTER_PORT = 15557
+PUSH_PORT = 15555
+
+
+def standInBroker(use_msgpack):
+	context = zmq.Context()
+	router = context.socket(zmq.ROUTER)
+	router.bind(f'tcp://127.0.0.1:{ROUTER_PORT}')
+	push = context.socket(zmq.PUSH)
+	push.bind(f'tcp://127.0.0.1:{PUSH_PORT}')
+
+	while True:
+		frames = router.recv_multipart()
+		# Batched sends carry several messages after the identity frame
+		for frame in frames[1:]:
+			message = msgpack.unpackb(frame) if use_msgpack else json.loads(frame)
+			push.send_json({ 'msg_id': message['message']['msg_id'], 'sent': message['message']['sent'] })
+
+
+class LocalContext(object):
+	''' Connects sockets addressed to the zmq_broker host to the stand-in instead '''
+
+	def __init__(self):
+		self.context = zmq.Context()
+
+	def socket(self, socket_type):
+		sock = self.context.socket(socket_type)
+		connect = sock.connect
+		sock.connect = lambda addr: connect(
+			addr.replace('zmq_broker', '127.0.0.1').replace(':5557', f':{ROUTER_PORT}')
+		)
+		return sock
+
+
+def createController(use_msgpack, batch_size):
+	''' A Controller with only its send path set up '''
+
+	ctrl = Controller.__new__(Controller)
+	ctrl.app = SimpleNamespace(config={ 'ZMQ_BATCH_SIZE': batch_size })
+	ctrl.zmq_context = LocalContext()
+	ctrl._send_queue = deque()
+	ctrl._send_wakeup = os.pipe()
+	os.set_blocking(ctrl._send_wakeup[0], False)
+	os.set_blocking(ctrl._send_wakeup[1], False)
+	ctrl._use_msgpack = use_msgpack
+	startThread(ctrl.zmq_send_loop)
+	return ctrl.sendZmqMessage
+
+
+def createPollingLoop():
+	''' Previous send path, a list drained every 10ms with one send_json per message '''
+
+	queue = []
+	def loop():
+		dealer = LocalContext().socket(zmq.DEALER)
+		dealer.connect('tcp://zmq_broker:5557')
+		while True:
+			if len(queue):
+				item = queue[0]
+				del queue[0]
+				dealer.send_json(item, zmq.NOBLOCK)
+			time.sleep(0.01)
+
+	startThread(loop)
+	return queue.append
+
+
+def startThread(target):
+	t = threading.Thread(target=target, daemon=True)
+	t.start()
+	return t
+
+
+def startBroker(use_msgpack):
+	proc = mp.Process(target=standInBroker, args=(use_msgpack,), daemon=True)
+	proc.start()
+	time.sleep(0.3)
+	return proc
+
+
+def connectReplies():
+	pull = zmq.Context.instance().socket(zmq.PULL)
+	pull.connect(f'tcp://127.0.0.1:{PUSH_PORT}')
+	time.sleep(0.3)
+	return pull
+
+
+def measureLatency(name, send, pull, requests):
+	latencies = []
+	for i in range(requests):
+		send({ 'type': 'oanda', 'message': { 'msg_id': str(i), 'sent': time.time(), 'cmd': 'x', 'args': [1, 2], 'kwargs': {} } })
+		reply = pull.recv_json()
+		latencies.append(time.time() - reply['sent'])
+		time.sleep(0.002)
+
+	latencies.sort()
+	cpu = time.process_time()
+	time.sleep(2)
+	return {
+		'send path': name,
+		'p50_ms': latencies[len(latencies)//2] * 1000,
+		'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+		'idle_cpu_ms_per_2s': (time.process_time() - cpu) * 1000
+	}
+
+
+def measureBurst(send, pull, count):
+	start = time.time()
+	for i in range(count):
+		send({ 'type': 'x', 'message': { 'msg_id': str(i), 'sent': 0 } })
+	for i in range(count):
+		pull.recv()
+	return count / (time.time() - start)
+
+
+def run(mode, requests, burst):
+	use_msgpack = mode == 'msgpack'
+	proc = startBroker(use_msgpack)
+	try:
+		if mode == 'polling':
+			send = createPollingLoop()
+		elif mode.startswith('batch'):
+			send = createController(False, int(mode[5:]))
+		else:
+			send = createController(use_msgpack, 1)
+
+		pull = connectReplies()
+		result = measureLatency(mode, send, pull, requests)
+		result['burst_msg_per_s'] = measureBurst(send, pull, burst) if mode != 'polling' else float('nan')
+		pull.close(linger=0)
+		return result
+
+	finally:
+		proc.terminate()
+		proc.join()
+
+
+def runIsolated(mode, requests, burst, results):
+	# Each mode gets its own process so sockets and threads never overlap
+	results.put(run(mode, requests, burst))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--requests', type=int, default=300)
+	parser.add_argument('--burst', type=int, default=50000)
+	args = parser.parse_args()
+
+	modes = ['polling', 'json', 'batch32']
+	if msgpack is not None:
+		modes.append('msgpack')
+
+	results = []
+	for mode in modes:
+		queue = mp.Queue()
+		proc = mp.Process(target=runIsolated, args=(mode, args.requests, args.burst, queue))
+		proc.start()
+		results.append(queue.get())
+		proc.join()
+
+	printTable(results)
@@ -0,0 +1,16 @@
+import os
+import unittest
+from redis import Redis, RedisError
+
+TEST_REDIS_URL = os.environ.get('TEST_REDIS_URL', 'redis://localhost:6379/15')
+
+
+def redisClient():
+	''' Flushed client for `TEST_REDIS_URL`, skips the test if it can't connect '''
+
+	client = Redis.from_url(TEST_REDIS_URL)
+	try:
+		client.flushdb()
+	except RedisError as e:
+		raise unittest.SkipTest(f'Redis unavailable at {TEST_REDIS_URL}: {e}')
+	return client
@@ -0,0 +1,152 @@
+import unittest
+from app import tradelib as tl
+from tests.helpers import redisClient
+
+KEY = 'test.account'
+
+
+def item(order_id, size=1.0):
+	return { 'order_id': order_id, 'account_id': 'papertrader', 'product': 'EUR_USD', 'lotsize': size }
+
+
+class AccountStateTest(unittest.TestCase):
+
+	def setUp(self):
+		self.redis = redisClient()
+		self.states = []
+
+	def tearDown(self):
+		for state in self.states:
+			tl.accountstate._unregister(state)
+		self.redis.flushdb()
+		self.redis.close()
+
+	def create(self, owner_id='worker-0'):
+		# Snapshots only happen when a test takes one
+		state = tl.AccountState(self.redis, KEY, owner_id, snapshot_interval=3600)
+		state._last_snapshot = float('inf')
+		self.states.append(state)
+		return state
+
+	def crash(self, state):
+		''' Stop writing without a final snapshot, and let the lease go '''
+		tl.accountstate._unregister(state)
+		state._is_owner = False
+		self.redis.delete(state.owner_key)
+
+	def snapshot(self, state):
+		with state._write_lock:
+			state._snapshot()
+
+	def test_single_owner(self):
+		first = self.create('worker-0')
+		second = self.create('worker-1')
+
+		self.assertTrue(first.acquire())
+		self.assertFalse(second.acquire())
+		first.close()
+		self.assertTrue(second.acquire())
+
+	def test_writes_journaled_before_return(self):
+		state = self.create()
+		state.acquire()
+		# Without the writer thread
+		tl.accountstate._unregister(state)
+		state.append('positions', item('a'))
+		state.append('positions', item('b'))
+		state.replace('positions', item('a', size=2.0))
+		state.delete('positions', 'b')
+		state.setAll('orders', [item('c')])
+
+		self.assertEqual(self.redis.llen(state.journal_key), 5)
+		self.assertEqual(state.getStats()['written_seq'], 5)
+		self.crash(state)
+
+		recovered = self.create('worker-1')
+		self.assertTrue(recovered.acquire())
+		self.assertEqual(recovered.getAll('positions'), [item('a', size=2.0)])
+		self.assertEqual(recovered.getAll('orders'), [item('c')])
+		self.assertEqual(recovered.seq, 5)
+
+	def test_replay_after_snapshot(self):
+		state = self.create()
+		state.acquire()
+		state.append('positions', item('a'))
+		state.append('positions', item('b'))
+		self.snapshot(state)
+
+		self.assertEqual(self.redis.llen(state.journal_key), 0)
+		self.assertEqual(int(self.redis.get(state.snapshot_key)), 2)
+		self.assertEqual(state.views['positions'].getAll(), [item('a'), item('b')])
+
+		state.delete('positions', 'a')
+		state.append('positions', item('c'))
+		self.crash(state)
+
+		recovered = self.create('worker-1')
+		recovered.acquire()
+		self.assertEqual(recovered.getAll('positions'), [item('b'), item('c')])
+		self.assertEqual(recovered.seq, 4)
+
+	def test_other_workers_read_snapshot(self):
+		state = self.create()
+		state.acquire()
+		view = tl.TradeStore(self.redis, f'{KEY}:positions')
+
+		state.append('positions', item('a'))
+		# Other workers only see the owner's writes once snapshotted
+		self.assertEqual(view.getAll(), [])
+		self.snapshot(state)
+		self.assertEqual(view.getAll(), [item('a')])
+
+	def test_pull_other_worker_writes(self):
+		state = self.create()
+		state.acquire()
+		state.append('positions', item('a'))
+		self.snapshot(state)
+
+		view = tl.TradeStore(self.redis, f'{KEY}:positions')
+		view.append(item('b'))
+		view.replace(item('a', size=2.0))
+
+		# Pulled into memory after the owner's next snapshot
+		self.assertEqual(state.getAll('positions'), [item('a')])
+		state._pull()
+		self.assertEqual(state.getAll('positions'), [item('a', size=2.0), item('b')])
+
+	def test_conflicting_write_loses(self):
+		state = self.create()
+		state.acquire()
+		state.append('positions', item('a'))
+		self.snapshot(state)
+
+		view = tl.TradeStore(self.redis, f'{KEY}:positions')
+		view.replace(item('a', size=2.0))
+		state.replace('positions', item('a', size=3.0))
+		self.snapshot(state)
+
+		self.assertEqual(view.get('a')['lotsize'], 2.0)
+		state._pull()
+		self.assertEqual(state.get('positions', 'a')['lotsize'], 2.0)
+
+	def test_failed_snapshot_kept_pending(self):
+		state = self.create()
+		state.acquire()
+		state.append('positions', item('a'))
+
+		# The snapshot transaction fails on a key of the wrong type
+		seq_key = state.views['positions'].seq_key
+		self.redis.set(seq_key, 'x')
+		with self.assertRaises(Exception):
+			self.snapshot(state)
+		self.assertEqual(state._dirty['positions'], { 'a' })
+		self.assertEqual(self.redis.llen(state.journal_key), 1)
+
+		self.redis.delete(seq_key)
+		self.snapshot(state)
+		self.assertEqual(state.views['positions'].getAll(), [item('a')])
+		self.assertEqual(self.redis.llen(state.journal_key), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
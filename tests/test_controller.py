@@ -0,0 +1,74 @@
+import time
+import unittest
+from threading import Event, Lock
+from app.controller import KeyedExecutor
+
+
+class KeyedExecutorTest(unittest.TestCase):
+
+	def setUp(self):
+		self.executor = KeyedExecutor(workers=2, queue_size=2, block_timeout=0.05, name='test')
+
+	def wait(self, func, timeout=5):
+		deadline = time.time() + timeout
+		while not func():
+			self.assertLess(time.time(), deadline)
+			time.sleep(0.001)
+
+	def test_order_per_key(self):
+		results = {}
+		lock = Lock()
+		def append(key, i):
+			with lock:
+				results.setdefault(key, []).append(i)
+
+		executor = KeyedExecutor(workers=4, name='test')
+		for i in range(200):
+			for key in range(5):
+				executor.submit(key, append, key, i)
+
+		self.wait(lambda: executor.getStats()['completed'] == 1000)
+		self.assertEqual(results, { key: list(range(200)) for key in range(5) })
+
+	def test_slow_key_does_not_delay_others(self):
+		release = Event()
+		done = Event()
+		self.executor.submit('slow', release.wait, 5)
+
+		start = time.time()
+		for i in range(5):
+			self.executor.submit(f'fast-{i}', lambda: None)
+		self.executor.submit('fast-5', done.set)
+
+		self.assertTrue(done.wait(1))
+		self.assertLess(time.time() - start, 1)
+		self.assertEqual(self.executor.getStats()['running'], 1)
+
+		release.set()
+		self.wait(lambda: self.executor.getStats()['completed'] == 7)
+
+	def test_full_key_drops(self):
+		release = Event()
+		self.executor.submit('slow', release.wait, 5)
+		self.wait(lambda: self.executor.getStats()['running'] == 1)
+
+		self.assertTrue(self.executor.submit('slow', lambda: None))
+		self.assertTrue(self.executor.submit('slow', lambda: None))
+		self.assertFalse(self.executor.submit('slow', lambda: None))
+		# Other keys still accept work
+		self.assertTrue(self.executor.submit('other', lambda: None))
+
+		release.set()
+		self.wait(lambda: self.executor.getStats()['completed'] == 4)
+		stats = self.executor.getStats()
+		self.assertEqual((stats['blocked'], stats['dropped'], stats['keys']), (1, 1, 0))
+
+	def test_errors_counted(self):
+		self.executor.submit('key', lambda: 1 / 0)
+		self.executor.submit('key', lambda: None)
+		self.wait(lambda: self.executor.getStats()['completed'] == 2)
+		self.assertEqual(self.executor.getStats()['errors'], 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,177 @@
+import random
+import unittest
+import numpy as np
+from app import tradelib as tl
+
+PERIODS = [
+	tl.period.ONE_MINUTE, tl.period.FIVE_MINUTES, tl.period.ONE_HOUR,
+	tl.period.FOUR_HOURS, tl.period.TICK
+]
+# 2020-09-14 00:00 UTC
+START = 1600041600
+
+
+class OldChart(object):
+	''' Chart state as used by the per-adapter tick loops before LiveBars '''
+
+	def __init__(self, periods, ts, ohlc):
+		self.periods = periods
+		self.ask = {}
+		self.mid = {}
+		self.bid = {}
+		self.lastTs = {}
+		self.volume = {}
+		for period in periods:
+			if period == tl.period.TICK:
+				self.ask[period] = self.mid[period] = self.bid[period] = None
+			else:
+				self.ask[period] = np.array(ohlc, dtype=np.float64)
+				self.mid[period] = np.array(ohlc, dtype=np.float64)
+				self.bid[period] = np.array(ohlc, dtype=np.float64)
+				self.lastTs[period] = ts
+				self.volume[period] = 0
+
+	def isNewBar(self, period, ts):
+		return ts >= self.lastTs[period] + tl.period.getPeriodOffsetSeconds(period)
+
+
+def oldTick(chart, c_ts, ask, bid, skip_empty):
+	''' The oanda loop, or with `skip_empty` the fxopen/fxcm/dukascopy loop '''
+
+	result = []
+	for period in chart.periods:
+		if period != tl.period.TICK:
+			if chart.isNewBar(period, c_ts):
+				if not skip_empty or chart.volume[period] > 0:
+					chart.volume[period] = 0
+					result.append({
+						'broker': 'test', 'product': 'EUR_USD', 'period': period,
+						'bar_end': True, 'timestamp': chart.lastTs[period],
+						'item': {
+							'ask': chart.ask[period].tolist(),
+							'mid': chart.mid[period].tolist(),
+							'bid': chart.bid[period].tolist()
+						}
+					})
+				chart.lastTs[period] = tl.getNextTimestamp(
+					period, chart.lastTs[period],
+					now=c_ts - tl.period.getPeriodOffsetSeconds(period)
+				)
+				chart.ask[period] = np.array([chart.ask[period][3]]*4, dtype=np.float64)
+				chart.bid[period] = np.array([chart.bid[period][3]]*4, dtype=np.float64)
+				chart.mid[period] = np.array([np.around(
+					(chart.ask[period][3] + chart.bid[period][3])/2, decimals=5
+				)]*4, dtype=np.float64)
+
+			chart.volume[period] += 1
+			if ask is not None:
+				chart.ask[period][1] = max(ask, chart.ask[period][1])
+				chart.ask[period][2] = min(ask, chart.ask[period][2])
+				chart.ask[period][3] = ask
+			if bid is not None:
+				chart.bid[period][1] = max(bid, chart.bid[period][1])
+				chart.bid[period][2] = min(bid, chart.bid[period][2])
+				chart.bid[period][3] = bid
+
+			if skip_empty or (ask is not None and bid is not None):
+				new_high = np.around((chart.ask[period][1] + chart.bid[period][1])/2, decimals=5)
+				new_low = np.around((chart.ask[period][2] + chart.bid[period][2])/2, decimals=5)
+				chart.mid[period][1] = max(new_high, chart.mid[period][1])
+				chart.mid[period][2] = min(new_low, chart.mid[period][2])
+				chart.mid[period][3] = np.around((chart.ask[period][3] + chart.bid[period][3])/2, decimals=5)
+
+			result.append({
+				'broker': 'test', 'product': 'EUR_USD', 'period': period,
+				'bar_end': False,
+				'timestamp': max(c_ts, chart.lastTs[period]) if skip_empty else c_ts,
+				'item': {
+					'ask': chart.ask[period].tolist(),
+					'mid': chart.mid[period].tolist(),
+					'bid': chart.bid[period].tolist()
+				}
+			})
+
+		else:
+			if ask is not None:
+				chart.ask[period] = ask
+			if bid is not None:
+				chart.bid[period] = bid
+			if ask is not None and bid is not None:
+				chart.mid[period] = np.around((ask + bid)/2, decimals=5)
+			result.append({
+				'broker': 'test', 'product': 'EUR_USD', 'period': period,
+				'bar_end': False, 'timestamp': c_ts,
+				'item': {
+					'ask': chart.ask[period],
+					'mid': chart.mid[period],
+					'bid': chart.bid[period]
+				}
+			})
+
+	return result
+
+
+class LiveBarsTest(unittest.TestCase):
+
+	def setUp(self):
+		self.bars = tl.LiveBars('test', 'EUR_USD', PERIODS)
+		for period in PERIODS[:-1]:
+			self.bars.setBar(period, START, [1.1]*4, [1.1]*4, [1.1]*4)
+
+	def compareOld(self, skip_empty):
+		rand = random.Random(0)
+		chart = OldChart(PERIODS, START, [1.1]*4)
+		price = 1.1
+		ts = START
+		for _ in range(5000):
+			price = round(price + rand.gauss(0, 1e-4), 5)
+			# Mostly forward, sometimes skipping bars or arriving late
+			ts += rand.choice([1, 5, 30, 600, -20])
+			side = rand.random()
+			ask = round(price + 0.0001, 5) if side > 0.2 else None
+			bid = price if side < 0.8 else None
+
+			self.assertEqual(
+				self.bars.tick(ts, ask, bid, skip_empty=skip_empty),
+				oldTick(chart, ts, ask, bid, skip_empty)
+			)
+
+	def test_tick_matches_oanda_loop(self):
+		self.compareOld(skip_empty=False)
+
+	def test_tick_matches_fxopen_loop(self):
+		self.compareOld(skip_empty=True)
+
+	def test_partial_tick_keeps_mid(self):
+		result = self.bars.tick(START + 1, 1.2, None)
+		self.assertEqual(result[0]['item']['ask'], [1.1, 1.2, 1.1, 1.2])
+		self.assertEqual(result[0]['item']['mid'], [1.1]*4)
+		self.assertIsNone(result[-1]['item']['mid'])
+
+		result = self.bars.tick(START + 2, 1.2, None, skip_empty=True)
+		self.assertEqual(result[0]['item']['mid'], [1.1, 1.15, 1.1, 1.15])
+
+	def test_late_tick_timestamp(self):
+		# The H1 bar starting at START + 3600 is current
+		self.bars.tick(START + 3600, 1.1, 1.1)
+		result = self.bars.tick(START + 3590, 1.1, 1.1)
+		self.assertEqual(result[2]['period'], tl.period.ONE_HOUR)
+		self.assertEqual(result[2]['timestamp'], START + 3590)
+
+		result = self.bars.tick(START + 3590, 1.1, 1.1, skip_empty=True)
+		self.assertEqual(result[2]['timestamp'], START + 3600)
+
+	def test_bar_end(self):
+		self.bars.tick(START + 30, 1.2, 1.1)
+		result = self.bars.tick(START + 61, 1.3, 1.2)
+
+		self.assertEqual(result[0]['bar_end'], True)
+		self.assertEqual(result[0]['timestamp'], START)
+		self.assertEqual(result[0]['item']['ask'], [1.1, 1.2, 1.1, 1.2])
+		self.assertEqual(result[1]['timestamp'], START + 61)
+		self.assertEqual(result[1]['item']['ask'], [1.2, 1.3, 1.2, 1.3])
+		self.assertEqual(self.bars.last_ts[tl.period.ONE_MINUTE], START + 60)
+
+
+if __name__ == '__main__':
+	unittest.main()
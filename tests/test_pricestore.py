@@ -0,0 +1,140 @@
+import os
+import gzip
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from app import tradelib as tl
+
+PRODUCT = 'EUR_USD'
+PERIOD = tl.period.ONE_MINUTE
+# 2020-01-31 23:57 UTC, so a few rows spill into February
+START = 1580515020
+
+
+def bars(timestamps, price=1.1):
+	return pd.DataFrame(
+		index=pd.Index(np.array(timestamps, dtype=float), name='timestamp'),
+		data=np.full((len(timestamps), 12), price),
+		columns=tl.pricestore.OHLC_COLUMNS
+	)
+
+
+class PriceStoreTest(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.store = tl.PriceStore('test', data_dir=self.tmp.name)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_write_read(self):
+		ts = START + np.arange(6) * 60
+		self.store.write(PRODUCT, PERIOD, bars(ts))
+
+		self.assertEqual(self.store.getMonths(PRODUCT, PERIOD), ['202001', '202002'])
+		result = self.store.read(PRODUCT, PERIOD)
+		np.testing.assert_array_equal(result.index.values, ts)
+		self.assertEqual(list(result.columns), tl.pricestore.OHLC_COLUMNS)
+
+		result = self.store.read(PRODUCT, PERIOD, start_ts=ts[2], end_ts=ts[4])
+		np.testing.assert_array_equal(result.index.values, ts[2:4])
+		self.assertEqual(self.store.getLastTimestamp(PRODUCT, PERIOD), ts[-1])
+
+	def test_merge_keeps_saved_rows(self):
+		ts = START + np.arange(6) * 60
+		self.store.write(PRODUCT, PERIOD, bars(ts[::2], price=1.1))
+		# Overlapping and out of order rows are merged, saved rows win
+		self.store.write(PRODUCT, PERIOD, bars(ts[::-1], price=1.2))
+
+		result = self.store.read(PRODUCT, PERIOD)
+		np.testing.assert_array_equal(result.index.values, ts)
+		np.testing.assert_array_equal(result['ask_close'].values, [1.1, 1.2, 1.1, 1.2, 1.1, 1.2])
+
+	def test_manifest(self):
+		ts = START + np.arange(6) * 60
+		self.store.write(PRODUCT, PERIOD, bars(ts))
+		self.store.write(PRODUCT, PERIOD, bars([ts[-1] + 60]))
+
+		manifest = self.store.getManifest(PRODUCT, PERIOD)
+		self.assertEqual(manifest['202001'], { 'start': int(ts[0]), 'end': int(ts[2]), 'rows': 3 })
+		self.assertEqual(manifest['202002'], { 'start': int(ts[3]), 'end': int(ts[-1]) + 60, 'rows': 4 })
+
+	def test_partial_row_ignored(self):
+		ts = START - 3600 + np.arange(3) * 60
+		self.store.write(PRODUCT, PERIOD, bars(ts))
+		path = self.store._get_path(PRODUCT, PERIOD, '202001')
+		with open(path, 'ab') as f:
+			f.write(b'\x00' * 10)
+
+		np.testing.assert_array_equal(self.store.read(PRODUCT, PERIOD).index.values, ts)
+		# The next append drops the partial row
+		self.store.write(PRODUCT, PERIOD, bars([ts[-1] + 60]))
+		self.assertEqual(os.path.getsize(path), 4 * self.store.getDtype(PERIOD).itemsize)
+
+	def test_tick_columns(self):
+		data = pd.DataFrame(
+			index=pd.Index([START + 0.0, START + 1.0], name='timestamp'),
+			data=[[1.1, 1.0], [1.2, 1.1]], columns=tl.pricestore.TICK_COLUMNS
+		)
+		self.store.write(PRODUCT, tl.period.TICK, data)
+		pd.testing.assert_frame_equal(self.store.read(PRODUCT, tl.period.TICK), data)
+
+	def test_compact_repairs_months(self):
+		ts = START - 3600 + np.arange(4) * 60
+		self.store.write(PRODUCT, PERIOD, bars(ts))
+		path = self.store._get_path(PRODUCT, PERIOD, '202001')
+		dtype = self.store.getDtype(PERIOD)
+
+		# Out of order and duplicate rows followed by a partial row
+		rows = np.array(self.store._map_month(PRODUCT, PERIOD, '202001'))
+		rows = np.concatenate((rows[::-1], rows[:1]))
+		with open(path, 'wb') as f:
+			f.write(rows.tobytes())
+			f.write(b'\x00' * 10)
+		tmp_path = os.path.join(self.store.getDir(PRODUCT, PERIOD), '202001.bin.tmp')
+		with open(tmp_path, 'wb') as f:
+			f.write(b'\x00')
+		os.remove(self.store._get_manifest_path(PRODUCT, PERIOD))
+
+		self.assertEqual(self.store.compact(PRODUCT, PERIOD), (1, 1))
+		self.assertFalse(os.path.exists(tmp_path))
+		self.assertEqual(os.path.getsize(path), 4 * dtype.itemsize)
+		np.testing.assert_array_equal(self.store.read(PRODUCT, PERIOD).index.values, ts)
+		self.assertEqual(
+			self.store.getManifest(PRODUCT, PERIOD),
+			{ '202001': { 'start': int(ts[0]), 'end': int(ts[-1]), 'rows': 4 } }
+		)
+
+		# Nothing left to repair
+		self.assertEqual(self.store.compact(PRODUCT, PERIOD), (1, 0))
+
+	def test_compact_removes_empty_month(self):
+		self.store.write(PRODUCT, PERIOD, bars(START + np.arange(6) * 60))
+		path = self.store._get_path(PRODUCT, PERIOD, '202002')
+		with open(path, 'wb') as f:
+			f.write(b'\x00' * 10)
+
+		self.assertEqual(self.store.compact(PRODUCT, PERIOD), (2, 1))
+		self.assertFalse(os.path.exists(path))
+		self.assertEqual(list(self.store.getManifest(PRODUCT, PERIOD)), ['202001'])
+
+	def test_compact_migrates_csv(self):
+		ts = START + np.arange(6) * 60
+		path = self.store.getDir(PRODUCT, PERIOD)
+		os.makedirs(path)
+		for day, day_ts in (('20200131', ts[:3]), ('20200201', ts[3:])):
+			with gzip.open(os.path.join(path, day + '.csv.gz'), 'wt') as f:
+				for x in day_ts:
+					f.write(','.join([str(int(x))] + ['1.1'] * 12) + '\n')
+
+		self.assertEqual(self.store.compact(PRODUCT, PERIOD), (2, 0))
+		self.assertEqual(sorted(os.listdir(path)), ['202001.bin', '202002.bin', 'manifest.json'])
+		result = self.store.read(PRODUCT, PERIOD)
+		np.testing.assert_array_equal(result.index.values, ts)
+		np.testing.assert_array_equal(result['bid_close'].values, np.full(6, 1.1))
+
+
+if __name__ == '__main__':
+	unittest.main()
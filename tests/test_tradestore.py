@@ -0,0 +1,150 @@
+import json
+import unittest
+from app import tradelib as tl
+from tests.helpers import redisClient
+
+KEY = 'test:positions'
+
+
+def item(order_id, account_id='acc-1', size=1.0):
+	return { 'order_id': order_id, 'account_id': account_id, 'product': 'EUR_USD', 'lotsize': size }
+
+
+class TradeStoreTest(unittest.TestCase):
+
+	def setUp(self):
+		self.redis = redisClient()
+		self.store = tl.TradeStore(self.redis, KEY)
+
+	def tearDown(self):
+		self.redis.flushdb()
+		self.redis.close()
+
+	def ids(self, account_id):
+		return [i.decode() for i in self.redis.zrange(f'{KEY}:ids:{account_id}', 0, -1)]
+
+	def test_append_get(self):
+		v1 = self.store.append(item('a'))
+		v2 = self.store.append(item('b', account_id='acc-2'))
+
+		self.assertLess(v1, v2)
+		self.assertEqual(self.store.getVersion('a'), v1)
+		self.assertEqual(self.store.get('b'), item('b', account_id='acc-2'))
+		self.assertEqual([x['order_id'] for x in self.store.getAll()], ['a', 'b'])
+		self.assertEqual(self.store.getAll('acc-2'), [item('b', account_id='acc-2')])
+
+	def test_replace_missing(self):
+		self.assertEqual(self.store.replace(item('a')), 0)
+		self.assertIsNone(self.store.get('a'))
+
+	def test_replace_version_conflict(self):
+		version = self.store.append(item('a'))
+		new_version = self.store.replace(item('a', size=2.0), version=version)
+		self.assertGreater(new_version, version)
+
+		# A writer still holding the old version loses
+		self.assertEqual(self.store.replace(item('a', size=3.0), version=version), -1)
+		self.assertEqual(self.store.get('a')['lotsize'], 2.0)
+		self.assertEqual(self.store.getVersion('a'), new_version)
+
+		# Unconditional replaces always apply
+		self.assertGreater(self.store.replace(item('a', size=4.0)), new_version)
+		self.assertEqual(self.store.get('a')['lotsize'], 4.0)
+
+	def test_replace_moves_account(self):
+		self.store.append(item('a'))
+		self.store.append(item('b'))
+		self.store.replace(item('a', account_id='acc-2'))
+
+		self.assertEqual(self.ids('acc-1'), ['b'])
+		self.assertEqual(self.ids('acc-2'), ['a'])
+		self.assertEqual(self.redis.smembers(f'{KEY}:accounts'), { b'acc-1', b'acc-2' })
+		# Insertion order is kept
+		self.assertEqual([x['order_id'] for x in self.store.getAll()], ['a', 'b'])
+
+		self.store.replace(item('a', account_id=None))
+		self.assertEqual(self.ids('acc-2'), [])
+		self.assertEqual(self.ids('None'), ['a'])
+
+		self.assertTrue(self.store.delete('a'))
+		self.assertEqual(self.ids('None'), [])
+		self.assertFalse(self.store.delete('a'))
+
+	def test_write_many(self):
+		version = self.store.append(item('a'))
+		self.store.append(item('b'))
+
+		pipe = self.redis.pipeline()
+		self.store.writeMany(
+			pipe, [item('a', size=2.0), item('c')], deleted=['b'], versions={ 'a': version }
+		)
+		put_a, put_c, deleted = pipe.execute()
+		self.assertGreater(put_a, version)
+		self.assertGreater(put_c, put_a)
+		self.assertGreater(deleted, put_c)
+		self.assertEqual([x['order_id'] for x in self.store.getAll()], ['a', 'c'])
+
+		# The same conditional write again conflicts
+		pipe = self.redis.pipeline()
+		self.store.writeMany(pipe, [item('a', size=3.0)], versions={ 'a': version })
+		self.assertEqual(pipe.execute(), [-1])
+		self.assertEqual(self.store.get('a')['lotsize'], 2.0)
+
+	def test_get_all_versioned(self):
+		self.store.append(item('a'))
+		self.store.append(item('b'))
+		seq, items, versions = self.store.getAllVersioned()
+
+		self.assertEqual(int(seq), self.store.getVersion('b'))
+		self.assertEqual(items, [item('a'), item('b')])
+		self.assertEqual(versions, { 'a': self.store.getVersion('a'), 'b': self.store.getVersion('b') })
+
+	def test_set_all(self):
+		self.store.append(item('a'))
+		self.store.setAll([item('b', account_id='acc-2'), item('c')])
+
+		self.assertEqual([x['order_id'] for x in self.store.getAll()], ['b', 'c'])
+		self.assertEqual(self.ids('acc-1'), ['c'])
+		self.assertEqual(self.ids('acc-2'), ['b'])
+		# Versions keep increasing across the swap
+		self.assertGreater(self.store.append(item('d')), self.store.getVersion('c'))
+
+	def test_migrate(self):
+		self.redis.hset('test:legacy', 'positions', json.dumps([item('a'), item('b')]))
+
+		self.assertEqual(self.store.migrate('test:legacy', 'positions'), 2)
+		self.assertIsNone(self.redis.hget('test:legacy', 'positions'))
+		self.assertEqual(self.store.getAll('acc-1'), [item('a'), item('b')])
+		self.assertEqual(self.store.migrate('test:legacy', 'positions'), 0)
+
+	def test_migrate_keeps_existing(self):
+		self.store.append(item('a'))
+		self.redis.hset('test:legacy', 'positions', json.dumps([item('b')]))
+
+		self.assertEqual(self.store.migrate('test:legacy', 'positions'), 0)
+		self.assertIsNone(self.redis.hget('test:legacy', 'positions'))
+		self.assertEqual(self.store.getAll(), [item('a')])
+
+	def test_get_cached(self):
+		self.store.append(item('a'))
+		self.store.append(item('b'))
+		converted = []
+		def convert(x):
+			converted.append(x['order_id'])
+			return x
+
+		first = self.store.getCached(convert)
+		self.assertIs(self.store.getCached(convert), first)
+
+		self.store.replace(item('b', size=2.0))
+		result = self.store.getCached(convert)
+		self.assertEqual([x['lotsize'] for x in result], [1.0, 2.0])
+		# Only the changed item is decoded again
+		self.assertEqual(converted, ['a', 'b', 'b'])
+
+		self.store.clear()
+		self.assertEqual(self.store.getCached(convert), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
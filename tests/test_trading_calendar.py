@@ -0,0 +1,186 @@
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+from app import tradelib as tl
+from app.tradelib import utils
+
+PERIODS = [
+	tl.period.ONE_MINUTE, tl.period.FIVE_MINUTES, tl.period.FIFTEEN_MINUTES,
+	tl.period.ONE_HOUR, tl.period.FOUR_HOURS, tl.period.DAILY
+]
+
+'''
+Previous per-datetime implementations in tl.utils, kept as the reference
+'''
+
+def oldIsWeekend(dt):
+	if utils.isOffsetAware(dt):
+		dt = utils.convertTimezone(dt, 'America/New_York')
+	else:
+		dt = utils.convertTimezone(utils.setTimezone(dt, 'UTC'), 'America/New_York')
+
+	FRI = 4
+	SAT = 5
+	SUN = 6
+
+	return (
+		(dt.weekday() == FRI and dt.hour >= 17 and dt.minute != 0) or
+		(dt.weekday() == FRI and dt.hour > 17) or
+		dt.weekday() == SAT or
+		(dt.weekday() == SUN and dt.hour < 17)
+	)
+
+
+def oldWeeklySecondsOffset(start, end):
+	ONE_MINUTE = 60.0
+	return sum(
+		ONE_MINUTE for x in range(int((end-start).total_seconds()/ONE_MINUTE))
+		if not oldIsWeekend(start + timedelta(seconds=x*ONE_MINUTE))
+	)
+
+
+def oldGetCountDate(period, count, start=None, end=None):
+	off = tl.period.getPeriodOffsetSeconds(period)
+	if start:
+		date = start
+		direction = 1
+	else:
+		date = end
+		direction = -1
+
+	x = 0
+	i = 0
+	while x < count:
+		if (
+			off >= tl.period.getPeriodOffsetSeconds(tl.period.WEEKLY) or
+			not oldIsWeekend(date + timedelta(seconds=off*i*direction))
+		):
+			x += 1
+		i += 1
+
+	return date + timedelta(seconds=off*i*direction)
+
+
+def oldGetNextTimestamp(period, ts, now=None):
+	new_ts = ts + tl.period.getPeriodOffsetSeconds(period)
+	dt = utils.convertTimestampToTime(new_ts)
+	if oldIsWeekend(dt):
+		new_ts = utils.convertTimeToTimestamp(utils.getWeekstartDate(dt))
+
+	if now is not None:
+		while new_ts < now:
+			new_ts += tl.period.getPeriodOffsetSeconds(period)
+			dt = utils.convertTimestampToTime(new_ts)
+			if oldIsWeekend(dt):
+				new_ts = utils.convertTimeToTimestamp(utils.getWeekstartDate(dt))
+
+	return new_ts
+
+
+def oldGetPrevTimestamp(period, ts):
+	new_ts = ts - tl.period.getPeriodOffsetSeconds(period)
+	dt = utils.convertTimestampToTime(new_ts)
+	if oldIsWeekend(dt):
+		new_ts = utils.convertTimeToTimestamp(utils.getWeekendDate(dt - timedelta(days=7)))
+	return new_ts
+
+
+class TradingCalendarTest(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.calendar = tl.TradingCalendar()
+
+		# Random minutes over 2019-2023, plus the minutes around each weekend
+		rng = np.random.default_rng(0)
+		samples = list(rng.integers(1546300800, 1704067200, 300) // 60 * 60)
+		for close, open_ in zip(cls.calendar.closes[1040:1100], cls.calendar.opens[1040:1100]):
+			samples += [close - 60, close, close + 30, close + 60, close + 61, open_ - 60, open_, open_ + 60]
+		cls.samples = [int(i) for i in samples]
+		cls.rng = rng
+
+	def test_is_weekend(self):
+		for ts in self.samples:
+			dt = datetime.utcfromtimestamp(ts)
+			self.assertEqual(self.calendar.isWeekend(ts), oldIsWeekend(dt), ts)
+			self.assertEqual(utils.isWeekend(dt), oldIsWeekend(dt), ts)
+
+		# Vectorised lookups agree with the scalar ones
+		result = self.calendar.isWeekend(np.array(self.samples))
+		self.assertEqual(list(result), [self.calendar.isWeekend(ts) for ts in self.samples])
+
+	def test_weekend_dst(self):
+		# New York switches to EDT on 2021-03-14, the week closes at 22:00 UTC
+		# on Friday 12th and opens at 21:00 UTC on Sunday
+		self.assertFalse(self.calendar.isWeekend(1615586400))
+		self.assertTrue(self.calendar.isWeekend(1615586460))
+		self.assertEqual(self.calendar.getWeekstart(1615586460), 1615755600)
+		self.assertFalse(self.calendar.isWeekend(1615755600))
+
+	def test_next_timestamp(self):
+		for i, ts in enumerate(self.samples):
+			period = PERIODS[i % len(PERIODS)]
+			self.assertEqual(
+				self.calendar.getNextTimestamp(period, ts), oldGetNextTimestamp(period, ts),
+				(period, ts)
+			)
+
+	def test_next_timestamp_now(self):
+		for i, ts in enumerate(self.samples[:150]):
+			period = PERIODS[i % len(PERIODS)]
+			now = ts + int(self.rng.integers(0, 10*24*60*60))
+			self.assertEqual(
+				self.calendar.getNextTimestamp(period, ts, now=now),
+				oldGetNextTimestamp(period, ts, now=now),
+				(period, ts, now)
+			)
+
+	def test_prev_timestamp(self):
+		for i, ts in enumerate(self.samples):
+			period = PERIODS[i % len(PERIODS)]
+			off = tl.period.getPeriodOffsetSeconds(period)
+			if self.calendar.isWeekend(ts - off):
+				# The previous version stepped back to the close a week early
+				self.assertEqual(
+					self.calendar.getPrevTimestamp(period, ts), self.calendar.getPrevWeekend(ts - off)
+				)
+			else:
+				self.assertEqual(
+					self.calendar.getPrevTimestamp(period, ts), oldGetPrevTimestamp(period, ts),
+					(period, ts)
+				)
+
+	def test_count_date(self):
+		for i, ts in enumerate(self.samples[:60]):
+			period = PERIODS[i % len(PERIODS)]
+			dt = datetime.utcfromtimestamp(ts)
+			for count in (1, 7, 500):
+				self.assertEqual(
+					utils.getCountDate(period, count, start=dt), oldGetCountDate(period, count, start=dt),
+					(period, count, ts)
+				)
+				self.assertEqual(
+					utils.getCountDate(period, count, end=dt), oldGetCountDate(period, count, end=dt),
+					(period, count, ts)
+				)
+
+	def test_weekly_seconds_offset(self):
+		for ts in self.samples[:20]:
+			start = datetime.utcfromtimestamp(ts)
+			end = start + timedelta(days=9, minutes=7)
+			self.assertEqual(utils.getWeeklySecondsOffset(start, end), oldWeeklySecondsOffset(start, end))
+
+	def test_bar_starts(self):
+		for period in PERIODS[1:]:
+			first = self.calendar.getPrevWeekstart(self.samples[0])
+			last = first + 30*24*60*60
+			starts = self.calendar.getBarStarts(period, first, last)
+
+			expected = [first]
+			while expected[-1] <= last:
+				expected.append(self.calendar.getNextTimestamp(period, expected[-1]))
+			self.assertEqual(list(starts), expected[:-1], period)
+
+
+if __name__ == '__main__':
+	unittest.main()